@@ -0,0 +1,88 @@
+"""
+Benchmarks of commands and other per-input code.
+"""
+from harness import FakeSession, benchmark, command_runner
+
+
+@benchmark("roll_dice", sized=False)
+def bench_roll_dice(world):
+    from world.dice import roll_dice
+
+    return lambda: roll_dice(3, 6, ("+", 2), conditional=(">=", 10), return_tuple=True)
+
+
+@benchmark("Character.at_say")
+def bench_at_say(world):
+    # fans out to everyone in the crowded center room
+    return lambda: world.looker.at_say("Всем привет!", msg_self=True)
+
+
+@benchmark("CmdHelp.func")
+def bench_help(world):
+    from commands.default.help import CmdHelp
+
+    return command_runner(CmdHelp, world.looker)
+
+
+@benchmark("CmdWho.func", sized=False)
+def bench_who(world):
+    from evennia.utils import create
+    from commands.default.account import CmdWho
+    from world.roster import ROSTER
+
+    account = create.create_account("Смотрящий", "looker@example.com", "Zx8!benchmark")
+    session = FakeSession(1, account, world.looker)
+    ROSTER._keys, ROSTER._rows, ROSTER._synced = [], {}, True
+    ROSTER.add(session)
+
+    class Player(object):
+        def __init__(self, num):
+            self.id = 1000 + num
+            self.key = "Игрок%03i" % num
+
+    # 200 online players; their rows only need a key and an id
+    for num, character in enumerate(world.crowd * 4):
+        ROSTER.add(FakeSession(num + 2, Player(num), character))
+    return command_runner(CmdWho, account, session=session, account=account)
+
+
+@benchmark("get_and_merge_cmdsets")
+def bench_merge_cmdsets(world):
+    # what the command handler does before every command, e.g. a move
+    from harness import merged_cmdset
+
+    return lambda: merged_cmdset(world.looker)
+
+
+def _dispatcher(world, raw_string, cold):
+    from django.conf import settings
+    from evennia.utils.utils import variable_from_module
+    from harness import merged_cmdset
+    from world import cmdset_cache
+
+    parser = variable_from_module(*settings.COMMAND_PARSER.rsplit(".", 1))
+
+    def dispatch():
+        if cold:
+            cmdset_cache.clear()
+        return parser(raw_string, merged_cmdset(world.looker), world.looker)
+
+    return dispatch
+
+
+@benchmark("command dispatch")
+def bench_dispatch(world):
+    # everything the command handler does for a move before calling func()
+    return _dispatcher(world, "север", cold=False)
+
+
+@benchmark("command dispatch (cold merge cache)")
+def bench_dispatch_cold(world):
+    # the same with every merge done from scratch, as without the cache
+    return _dispatcher(world, "север", cold=True)
+
+
+@benchmark("Character.search")
+def bench_search(world):
+    # one of the two swords among the crowd, as in `взять 2-меч`
+    return lambda: world.looker.search("2-меч", quiet=True)
@@ -0,0 +1,32 @@
+"""
+Benchmarks of rooms, the coordinate grid and the map.
+"""
+from harness import benchmark
+
+
+@benchmark("Room.return_appearance")
+def bench_return_appearance(world):
+    return lambda: world.center.return_appearance(world.looker)
+
+
+@benchmark("Map.show_map")
+def bench_show_map(world):
+    from world.map import Map
+
+    return lambda: Map(world.looker).show_map()
+
+
+@benchmark("Room.get_room_at")
+def bench_get_room_at(world):
+    from typeclasses.rooms import Room
+
+    x, y = world.center.x, world.center.y
+    return lambda: Room.get_room_at(x + 1, y - 1, 0)
+
+
+@benchmark("Room.get_rooms_around")
+def bench_get_rooms_around(world):
+    from typeclasses.rooms import Room
+
+    x, y = world.center.x, world.center.y
+    return lambda: Room.get_rooms_around(x, y, 0, 3)
@@ -0,0 +1,189 @@
+"""
+Minimal game clients for the load tests
+
+Both clients have the same interface (`connect`, `send`, `read_some`,
+`drain`, `close`) and need nothing but the standard library:
+
+ - `TelnetClient` talks to the telnet port and ignores all option
+   negotiation;
+ - `WebSocketClient` talks to the webclient websocket port using the
+   webclient's JSON messages (`["text", [line], {}]`).
+
+Both take an optional `source` address to connect from. Against a
+server on the same machine, `source_address()` spreads the clients
+over 127.0.0.0/8 (Linux routes all of it to the loopback interface),
+so the per-IP login throttle sees many addresses instead of one.
+"""
+import asyncio
+import base64
+import json
+import os
+import re
+import struct
+
+_RE_IAC = re.compile(rb"\xff[\xfb-\xfe].|\xff\xfa.*?\xff\xf0|\xff[\xf0-\xfa]", re.DOTALL)
+_RE_ANSI = re.compile(r"\x1b\[[0-9;]*[a-zA-Z]")
+_RE_HTML = re.compile(r"<[^>]*>")
+
+
+def source_address(num, count):
+    """
+    The loopback address client `num` connects from when the clients
+    are spread over `count` addresses, or None for the default one.
+    """
+    if not count:
+        return None
+    index = num % count
+    return "127.0.%i.%i" % (index // 250, index % 250 + 2)
+
+
+def plain(text):
+    """Strip ANSI codes and webclient HTML from received text."""
+    return _RE_HTML.sub("", _RE_ANSI.sub("", text)).replace("&nbsp;", " ")
+
+
+class TelnetClient(object):
+    """A minimal telnet client ignoring all option negotiation."""
+
+    def __init__(self, host, port, source=None):
+        self.host = host
+        self.port = port
+        self.source = source
+        self.reader = self.writer = None
+
+    async def _open(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, local_addr=(self.source, 0) if self.source else None
+        )
+
+    async def connect(self):
+        await self._open()
+        await self.drain(1.0)
+
+    async def send(self, line):
+        self.writer.write(line.encode("utf-8") + b"\r\n")
+        await self.writer.drain()
+
+    async def read_some(self, timeout):
+        data = await asyncio.wait_for(self.reader.read(65536), timeout)
+        if not data:
+            raise ConnectionError("connection closed")
+        return _RE_IAC.sub(b"", data)
+
+    async def drain(self, idle):
+        """Read until the server has been quiet for `idle` seconds."""
+        chunks = []
+        while True:
+            try:
+                chunks.append(await self.read_some(idle))
+            except asyncio.TimeoutError:
+                return b"".join(chunks).decode("utf-8", "replace")
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+class WebSocketClient(TelnetClient):
+    """A minimal websocket client speaking the webclient protocol."""
+
+    def __init__(self, host, port, path="/", source=None):
+        super().__init__(host, port, source)
+        self.path = path
+        self._messages = self._pump_task = None
+
+    async def connect(self):
+        await self._open()
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        self.writer.write(
+            (
+                "GET %s HTTP/1.1\r\nHost: %s:%i\r\nUpgrade: websocket\r\n"
+                "Connection: Upgrade\r\nSec-WebSocket-Key: %s\r\n"
+                "Sec-WebSocket-Version: 13\r\n\r\n" % (self.path, self.host, self.port, key)
+            ).encode("ascii")
+        )
+        await self.writer.drain()
+        response = await asyncio.wait_for(self.reader.readuntil(b"\r\n\r\n"), 10.0)
+        if b" 101 " not in response.split(b"\r\n", 1)[0]:
+            raise ConnectionError("websocket handshake failed")
+        # frames are read by a separate task, so that a timeout in
+        # read_some never leaves half a frame in the stream
+        self._messages = asyncio.Queue()
+        self._pump_task = asyncio.ensure_future(self._pump())
+        await self.drain(1.0)
+
+    async def _send_frame(self, opcode, payload):
+        mask = os.urandom(4)
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, 0x80 | length)
+        elif length < 65536:
+            header = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, length)
+        masked = bytes(byte ^ mask[num % 4] for num, byte in enumerate(payload))
+        self.writer.write(header + mask + masked)
+        await self.writer.drain()
+
+    async def send(self, line):
+        await self._send_frame(0x1, json.dumps(["text", [line], {}]).encode("utf-8"))
+
+    async def _read_frame(self):
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack("!H", await self.reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", await self.reader.readexactly(8))
+        mask = await self.reader.readexactly(4) if second & 0x80 else None
+        payload = await self.reader.readexactly(length)
+        if mask:
+            payload = bytes(byte ^ mask[num % 4] for num, byte in enumerate(payload))
+        return bool(first & 0x80), first & 0x0F, payload
+
+    async def _read_message(self):
+        data = []
+        while True:
+            try:
+                fin, opcode, payload = await self._read_frame()
+            except asyncio.IncompleteReadError:
+                raise ConnectionError("connection closed")
+            if opcode == 0x8:
+                raise ConnectionError("connection closed")
+            if opcode == 0x9:
+                await self._send_frame(0xA, payload)
+                continue
+            if opcode in (0x0, 0x1, 0x2):
+                data.append(payload)
+                # fragmented messages end with a frame that has FIN set
+                if fin:
+                    return b"".join(data)
+
+    async def _pump(self):
+        try:
+            while True:
+                self._messages.put_nowait(await self._read_message())
+        except (ConnectionError, OSError):
+            self._messages.put_nowait(None)
+
+    async def read_some(self, timeout):
+        message = await asyncio.wait_for(self._messages.get(), timeout)
+        if message is None:
+            self._messages.put_nowait(None)
+            raise ConnectionError("connection closed")
+        try:
+            cmdname, args, _ = json.loads(message.decode("utf-8"))
+        except ValueError:
+            return message
+        if cmdname in ("text", "prompt") and args:
+            return str(args[0]).encode("utf-8")
+        return b""
+
+    async def close(self):
+        if self._pump_task:
+            self._pump_task.cancel()
+        await super().close()
@@ -0,0 +1,68 @@
+"""
+Compare two benchmark result files
+
+Works with the JSON of `run.py` (compares `median_us`) and of
+`loadgen.py --output` (compares `p50`, `p95` and `p99`):
+
+    python benchmarks/compare.py before.json after.json
+    python benchmarks/compare.py before.json after.json --threshold 5
+
+Rows that got slower by more than `--threshold` percent are marked, and
+the exit code is 1 if there are any, so the script can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+_FIELDS = ("median_us", "p50", "p95", "p99")
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as fil:
+        data = json.load(fil)
+    return data.get("meta", {}), data["results"]
+
+
+def compare(old, new, threshold):
+    """
+    Returns:
+        rows (list): `(name, field, old, new, change in %, regressed)`
+            for every measurement present in both results.
+
+    """
+    rows = []
+    for name in sorted(set(old) & set(new)):
+        for field in _FIELDS:
+            before, after = old[name].get(field), new[name].get(field)
+            if not before or after is None:
+                continue
+            change = (after - before) * 100.0 / before
+            rows.append((name, field, before, after, change, change > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slower that counts as a regression")
+    args = parser.parse_args()
+
+    old_meta, old = _load(args.old)
+    new_meta, new = _load(args.new)
+    print("old: %s %s" % (old_meta.get("commit", ""), old_meta.get("date", old_meta.get("finished", ""))))
+    print("new: %s %s" % (new_meta.get("commit", ""), new_meta.get("date", new_meta.get("finished", ""))))
+    rows = compare(old, new, args.threshold)
+    for name, field, before, after, change, regressed in rows:
+        print(
+            "%-40s %-9s %12.1f %12.1f %+8.1f%% %s"
+            % (name, field, before, after, change, "SLOWER" if regressed else "")
+        )
+    for name in sorted(set(old) ^ set(new)):
+        print("%-40s only in %s" % (name, "old" if name in old else "new"))
+    sys.exit(1 if any(row[5] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
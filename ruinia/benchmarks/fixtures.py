@@ -0,0 +1,63 @@
+"""
+Synthetic worlds for the micro-benchmarks
+
+`build_world(rooms)` fills the (empty, test) database with a square grid
+of about `rooms` rooms on level 0 made by `world.worldgen`, with every
+pair of neighbours linked by exits and no items or NPCs, so the timings
+depend on the size only.
+
+In the room in the middle of the grid it puts a looking character, a
+crowd of other characters and a few items.
+"""
+import math
+from evennia.utils import create
+
+CROWD = 50
+ITEMS = ("меч", "меч", "щит", "факел", "верёвка")
+
+
+class World(object):
+    """
+    What the benchmarks get: the grid and the objects in its middle.
+    """
+
+    def __init__(self, rooms, side, center, looker, crowd, items):
+        self.rooms = rooms
+        self.side = side
+        self.center = center
+        self.looker = looker
+        self.crowd = crowd
+        self.items = items
+
+
+def build_world(rooms, seed=1):
+    """
+    Build a grid world in the current database.
+
+    Args:
+        rooms (int): About how many rooms; the grid is the nearest square.
+        seed (int): Seed for the sector types.
+
+    Returns:
+        world (World): The built world.
+
+    """
+    from typeclasses.characters import Character
+    from typeclasses.objects import Object
+    from typeclasses.rooms import Room
+    from world import coords, worldgen
+
+    side = max(3, int(round(math.sqrt(rooms))))
+    stats = worldgen.generate(side, side, exit_density=1.0, items=(0, 0), npcs=(0, 0), seed=seed)
+
+    center = Room.objects.get(id=coords.room_id_at(side // 2, side // 2, 0))
+    center.db.desc = "Площадь посреди синтетического мира."
+    looker = create.create_object(Character, key="Смотрящий", location=center, home=center)
+    crowd = [
+        create.create_object(Character, key="Житель%02i" % num, location=center, home=center)
+        for num in range(CROWD)
+    ]
+    items = [
+        create.create_object(Object, key=key, location=center, home=center) for key in ITEMS
+    ]
+    return World(stats["rooms"], side, center, looker, crowd, items)
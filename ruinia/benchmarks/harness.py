@@ -0,0 +1,241 @@
+"""
+Micro-benchmark harness
+
+Runs game code in-process against a throwaway test database (Django's
+`create_test_db`, an in-memory SQLite database with the default
+settings). Benchmarks are registered with the `benchmark` decorator in
+the `bench_*.py` modules of this directory and run by `run.py`.
+
+A benchmark function does its setup and returns the callable to time:
+
+    @benchmark("roll_dice", sized=False)
+    def bench_roll_dice(world):
+        return lambda: roll_dice(3, 6, ("+", 2))
+
+Sized benchmarks run once for each synthetic world built by
+`fixtures.build_world`; unsized ones only once, in the smallest world.
+"""
+import contextlib
+import os
+import sys
+import time
+
+GAME_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARKS = []
+
+
+class Benchmark(object):
+    def __init__(self, name, func, sized):
+        self.name = name
+        self.func = func
+        self.sized = sized
+
+
+def benchmark(name=None, sized=True):
+    """
+    Register a benchmark.
+
+    Args:
+        name (str): Name in the results, the function name by default.
+        sized (bool): If the timing depends on the size of the world.
+
+    """
+
+    def _decorator(func):
+        BENCHMARKS.append(Benchmark(name or func.__name__, func, sized))
+        return func
+
+    return _decorator
+
+
+def setup_evennia():
+    """
+    Load the game settings and initialize Evennia's API.
+    """
+    os.chdir(GAME_DIR)
+    if GAME_DIR not in sys.path:
+        sys.path.insert(0, GAME_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.conf.settings")
+    import django
+
+    django.setup()
+    import evennia
+
+    evennia._init()
+    # what at_server_start does
+    from world import cmdset_cache
+
+    cmdset_cache.install()
+
+
+def create_db():
+    """
+    Create and migrate an empty test database.
+
+    Returns:
+        old_name (str): What to pass to `destroy_db`.
+
+    """
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    return old_name
+
+
+def destroy_db(old_name):
+    """
+    Drop the test database and forget everything cached from it.
+    """
+    from django.db import connection
+    from evennia.utils.idmapper.models import flush_cache
+    from world import charnames, coords
+
+    flush_cache()
+    coords.invalidate()
+    charnames.reset()
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+class QueryCounter(object):
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextlib.contextmanager
+def _quiet():
+    # some game code still prints debug output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(func, repeat=5, min_time=0.2, max_number=100000):
+    """
+    Time a callable.
+
+    The number of calls per repeat is chosen so that one repeat takes
+    about `min_time` seconds.
+
+    Args:
+        func (callable): What to time.
+        repeat (int): Number of timed repeats.
+        min_time (float): Target length of one repeat in seconds.
+        max_number (int): Most calls per repeat.
+
+    Returns:
+        result (dict): Per-call `min_us`, `median_us`, `mean_us` and
+            `stdev_us` over the repeats, `queries` per call and the
+            `number` and `repeat` used.
+
+    """
+    from django.db import connection
+
+    counter = QueryCounter()
+    with _quiet():
+        # the first call fills caches and counts queries of a warm call
+        func()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            func()
+            once = time.perf_counter() - start
+        number = max(1, min(max_number, int(min_time / max(once, 1e-7))))
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((time.perf_counter() - start) / number * 1e6)
+
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    stdev = (sum((t - mean) ** 2 for t in timings) / len(timings)) ** 0.5
+    return {
+        "min_us": timings[0],
+        "median_us": timings[len(timings) // 2],
+        "mean_us": mean,
+        "stdev_us": stdev,
+        "queries": counter.count,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+# ------------------------------------------------------------
+# Running commands outside the command handler
+# ------------------------------------------------------------
+
+
+class FakeSession(object):
+    """
+    Just enough of a ServerSession for commands and the online roster.
+    Output is dropped.
+    """
+
+    protocol_key = "telnet"
+    address = ("127.0.0.1", 4000)
+    cmd_total = 0
+    logged_in = True
+
+    def __init__(self, sessid, account, puppet=None):
+        self.sessid = sessid
+        self.account = account
+        self.puppet = puppet
+        self.conn_time = self.cmd_last_visible = time.time()
+        self.protocol_flags = {"SCREENWIDTH": {0: 78}, "SCREENHEIGHT": {0: 45}}
+
+    def get_account(self):
+        return self.account
+
+    def get_puppet(self):
+        return self.puppet
+
+    def data_out(self, **kwargs):
+        pass
+
+
+def merged_cmdset(caller, session=None, account=None):
+    """
+    The merged cmdset the command handler would use for `caller`.
+    """
+    from evennia.commands.cmdhandler import get_and_merge_cmdsets
+
+    result = []
+    if caller is account:
+        callertype, obj = "account", getattr(session, "puppet", None)
+    else:
+        callertype, obj = "object", caller
+    get_and_merge_cmdsets(caller, session, account, obj, callertype, "").addCallback(
+        result.append
+    )
+    return result[0]
+
+
+def command_runner(cmdclass, caller, args="", session=None, account=None, cmdset=None):
+    """
+    Prepare a command for repeated `parse()` and `func()` calls.
+
+    Returns:
+        run (callable): Runs the command once.
+
+    """
+    cmd = cmdclass()
+    cmd.caller = caller
+    cmd.obj = caller
+    cmd.session = session
+    cmd.account = account
+    cmd.cmdset = cmdset if cmdset is not None else merged_cmdset(caller, session, account)
+    cmd.cmdname = cmd.raw_cmdname = cmd.cmdstring = cmd.key
+    cmd.raw_string = ("%s %s" % (cmd.key, args)).strip()
+
+    def run():
+        cmd.caller = caller
+        cmd.args = (" " + args) if args else ""
+        cmd.parse()
+        cmd.func()
+
+    return run
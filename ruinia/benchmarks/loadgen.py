@@ -0,0 +1,233 @@
+"""
+Load generator
+
+Connects `--players` simulated players to a local server over telnet or
+the webclient websocket, logs them in with `войти` (creating the
+accounts with `создать` first when `--create` is given) and lets each
+of them play a simple script until `--duration` runs out: walk through
+a random exit from the last `смотреть`, look around, talk, read
+`справка` and check `онлайн`, with a random pause between actions.
+
+For every kind of action the round-trip latency (from sending the line
+to the first byte of the reply) is recorded, and a table of
+percentiles is printed at the end. `--output` saves the results as
+JSON, and `--baseline` compares the run with such a file, so a change
+can be measured against the code before it:
+
+    python benchmarks/loadgen.py --create --players 200
+    python benchmarks/loadgen.py --players 200 --output before.json
+    ... apply the change, evennia reload ...
+    python benchmarks/loadgen.py --players 200 --baseline before.json
+
+The players use the same random seed every run, so two runs send the
+same sequence of commands. To stay under the default login throttle
+(`AUTH_THROTTLE_IP`, 10 attempts per minute and address) the players
+connect from `--source-ips` loopback addresses, and `--create` uses one
+address per account because of Evennia's CREATION_THROTTLE_LIMIT. That
+needs the server on the same Linux machine; against a remote server use
+`--source-ips 0` and switch the IP throttle off there:
+
+    AUTH_THROTTLE_IP = None
+
+This script only talks to the server over the network and needs nothing
+but the standard library.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from collections import defaultdict
+from clients import TelnetClient, WebSocketClient, plain, source_address
+
+_RE_EXITS = re.compile(r"Выходы:\s*(.+)")
+_PHRASES = (
+    "Привет всем!",
+    "Кто-нибудь знает дорогу к руинам?",
+    "Здесь довольно тихо.",
+    "Пойду дальше.",
+)
+# action, weight
+SCRIPT = (
+    ("идти", 4),
+    ("смотреть", 3),
+    ("говорить", 2),
+    ("справка", 1),
+    ("онлайн", 1),
+)
+TIMEOUT = 10.0
+
+
+def _name(prefix, num):
+    return "%s%03i" % (prefix, num)
+
+
+def _client(args, source=None):
+    if args.protocol == "websocket":
+        return WebSocketClient(args.host, args.port or 4002, args.ws_path, source)
+    return TelnetClient(args.host, args.port or 4000, source)
+
+
+def parse_exits(text):
+    """Exit names from the `Выходы:` line of a room description."""
+    match = _RE_EXITS.search(plain(text))
+    if not match:
+        return []
+    return [name.strip() for name in re.split(r",| и ", match.group(1)) if name.strip()]
+
+
+async def create_accounts(args):
+    for num in range(args.players):
+        client = _client(args, source_address(num, args.source_ips and args.players))
+        await client.connect()
+        await client.send("создать %s %s" % (_name(args.prefix, num), args.password))
+        print(plain(await client.drain(2.0)).strip().splitlines()[-1:])
+        await client.close()
+
+
+async def roundtrip(client, line):
+    """
+    Send a line and wait for the first part of the reply.
+
+    Returns the latency in seconds and the text read, or `None` on timeout.
+    """
+    # whatever others said in the meantime is not the reply
+    await client.drain(0.02)
+    start = time.perf_counter()
+    await client.send(line)
+    deadline = start + TIMEOUT
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return None, ""
+        try:
+            data = await client.read_some(remaining)
+        except asyncio.TimeoutError:
+            return None, ""
+        if data:
+            elapsed = time.perf_counter() - start
+            # the rest of the reply, for the exits
+            return elapsed, data.decode("utf-8", "replace") + await client.drain(0.05)
+
+
+async def player(args, num, samples, stop):
+    rng = random.Random(args.seed * 100003 + num)
+    actions = [action for action, weight in SCRIPT for _ in range(weight)]
+    client = _client(args, source_address(num, args.source_ips))
+    try:
+        await asyncio.sleep(rng.uniform(0, args.ramp))
+        await client.connect()
+        await client.send("войти %s %s" % (_name(args.prefix, num), args.password))
+        exits = parse_exits(await client.drain(2.0))
+        while not stop.is_set():
+            action = rng.choice(actions)
+            if action == "идти":
+                line = rng.choice(exits) if exits else "смотреть"
+            elif action == "говорить":
+                line = "говорить %s" % rng.choice(_PHRASES)
+            else:
+                line = action
+            elapsed, text = await roundtrip(client, line)
+            samples[action].append(elapsed)
+            if action in ("идти", "смотреть") and elapsed is not None:
+                exits = parse_exits(text) or exits
+            await asyncio.sleep(rng.uniform(*args.think))
+    except (OSError, ConnectionError) as err:
+        samples["errors"].append(None)
+        print("player %i: %s" % (num, err), file=sys.stderr)
+    finally:
+        await client.close()
+
+
+def summarize(samples):
+    """
+    Returns:
+        `{action: {"n", "timeouts", "p50", "p95", "p99", "max"}}`, times in ms.
+    """
+    results = {}
+    for action, values in sorted(samples.items()):
+        done = sorted(value for value in values if value is not None)
+        row = {"n": len(done), "timeouts": len(values) - len(done)}
+        if done:
+            quantiles = statistics.quantiles(done, n=100) if len(done) > 1 else done * 99
+            row.update(
+                p50=quantiles[49] * 1000,
+                p95=quantiles[94] * 1000,
+                p99=quantiles[98] * 1000,
+                max=done[-1] * 1000,
+            )
+        results[action] = row
+    return results
+
+
+def print_report(results, baseline=None):
+    print("%-10s %6s %6s %10s %10s %10s %10s" % ("action", "n", "t/o", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for action, row in results.items():
+        cells = []
+        for field in ("p50", "p95", "p99", "max"):
+            value = row.get(field)
+            if value is None:
+                cells.append("%10s" % "-")
+                continue
+            base = (baseline or {}).get(action, {}).get(field)
+            if base:
+                cells.append("%10s" % ("%.1f%+.0f%%" % (value, (value - base) * 100.0 / base)))
+            else:
+                cells.append("%10.1f" % value)
+        print("%-10s %6i %6i %s" % (action, row["n"], row["timeouts"], " ".join(cells)))
+
+
+async def run(args):
+    if args.create:
+        await create_accounts(args)
+        return
+
+    samples = defaultdict(list)
+    stop = asyncio.Event()
+    players = [
+        asyncio.ensure_future(player(args, num, samples, stop)) for num in range(args.players)
+    ]
+    await asyncio.sleep(args.ramp + args.duration)
+    stop.set()
+    await asyncio.gather(*players)
+
+    results = summarize(samples)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fil:
+            baseline = json.load(fil)["results"]
+    print_report(results, baseline)
+    if args.output:
+        meta = {key: value for key, value in vars(args).items() if key not in ("password", "output", "baseline")}
+        meta["finished"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        with open(args.output, "w", encoding="utf-8") as fil:
+            json.dump({"name": "loadgen", "meta": meta, "results": results}, fil, ensure_ascii=False, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, help="default 4000 for telnet, 4002 for websocket")
+    parser.add_argument("--protocol", choices=("telnet", "websocket"), default="telnet")
+    parser.add_argument("--ws-path", default="/", help="websocket path")
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=120, help="seconds after ramp-up")
+    parser.add_argument("--ramp", type=float, default=20, help="seconds over which players connect")
+    parser.add_argument("--think", type=float, nargs=2, default=(0.5, 2.0), metavar=("MIN", "MAX"),
+                        help="pause between actions, seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--source-ips", type=int, default=100,
+                        help="loopback addresses to connect from, 0 for the default one")
+    parser.add_argument("--prefix", default="нагрузка")
+    parser.add_argument("--password", default="Zx8!loadtest")
+    parser.add_argument("--create", action="store_true", help="create the test accounts")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with results saved by --output")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Login rush load test
+
+Measures command latency of logged-in players while a stream of other
+clients log in over telnet. Each player sends `смотреть` once per second
+and the time until the first byte of the reply is recorded. The test
+runs a quiet phase first and then the same amount of time with logins
+arriving at `--rate` per minute, and prints latency percentiles for
+both phases. With authentication on the worker pool the two should be
+close.
+
+The accounts must exist (run once with `--create`). The test runs
+against the default login throttles (`AUTH_THROTTLE_IP`,
+`AUTH_THROTTLE_ACCOUNT`: 10 and 5 attempts per minute): the rush cycles
+through `--logins` accounts (200, so 2.5 logins per account and minute
+at the default rate) and connects from `--source-ips` loopback addresses
+(100, so 5 per address and minute). `--create` uses one address per
+account, which also keeps under Evennia's own CREATION_THROTTLE_LIMIT.
+This needs the server on the same Linux machine; against a remote
+server use `--source-ips 0` and switch the IP throttle off there:
+
+    AUTH_THROTTLE_IP = None
+
+Usage:
+
+    python benchmarks/login_rush.py --create
+    python benchmarks/login_rush.py --players 20 --rate 500 --duration 60
+
+This script talks to the server over the network only and needs
+nothing but the standard library.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from clients import TelnetClient as Client, source_address
+
+
+def _name(prefix, num):
+    return "%s%03i" % (prefix, num)
+
+
+async def create_accounts(args):
+    total = args.players + args.logins
+    for num in range(total):
+        client = Client(args.host, args.port, source_address(num, args.source_ips and total))
+        await client.connect()
+        await client.send("создать %s %s" % (_name(args.prefix, num), args.password))
+        print((await client.drain(2.0)).strip().splitlines()[-1:])
+        await client.close()
+
+
+async def player(args, num, phase, stop):
+    client = Client(args.host, args.port, source_address(num, args.source_ips))
+    await client.connect()
+    await client.send("войти %s %s" % (_name(args.prefix, num), args.password))
+    await client.drain(2.0)
+    while not stop.is_set():
+        await client.drain(0.05)
+        start = time.perf_counter()
+        await client.send("смотреть")
+        try:
+            await client.read_some(10.0)
+        except asyncio.TimeoutError:
+            phase["samples"].append(10.0)
+        else:
+            phase["samples"].append(time.perf_counter() - start)
+        await asyncio.sleep(1.0)
+    await client.close()
+
+
+async def login_once(args, num, results, source):
+    client = Client(args.host, args.port, source)
+    start = time.perf_counter()
+    try:
+        await client.connect()
+        await client.send("войти %s %s" % (_name(args.prefix, num), args.password))
+        await client.read_some(30.0)
+        results.append(time.perf_counter() - start)
+    except (OSError, asyncio.TimeoutError):
+        results.append(None)
+    finally:
+        await client.close()
+
+
+async def rush(args, results, stop):
+    interval = 60.0 / args.rate
+    tasks = []
+    num = 0
+    while not stop.is_set():
+        account = args.players + num % args.logins
+        source = source_address(num, args.source_ips)
+        tasks.append(asyncio.ensure_future(login_once(args, account, results, source)))
+        num += 1
+        await asyncio.sleep(interval)
+    await asyncio.gather(*tasks)
+
+
+def report(label, samples):
+    samples = sorted(sample for sample in samples if sample is not None)
+    if not samples:
+        print("%-8s no samples" % label)
+        return
+    quantiles = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+    print(
+        "%-8s n=%-5i p50=%7.1fms p95=%7.1fms p99=%7.1fms max=%7.1fms"
+        % (
+            label,
+            len(samples),
+            quantiles[49] * 1000,
+            quantiles[94] * 1000,
+            quantiles[98] * 1000,
+            samples[-1] * 1000,
+        )
+    )
+
+
+async def run(args):
+    if args.create:
+        await create_accounts(args)
+        return
+
+    quiet, busy, logins = [], [], []
+    # players record into whichever phase is current
+    phase = {"samples": quiet}
+    stop_players = asyncio.Event()
+    players = [
+        asyncio.ensure_future(player(args, num, phase, stop_players))
+        for num in range(args.players)
+    ]
+    await asyncio.sleep(args.duration)
+
+    phase["samples"] = busy
+    stop_rush = asyncio.Event()
+    rusher = asyncio.ensure_future(rush(args, logins, stop_rush))
+    await asyncio.sleep(args.duration)
+    stop_rush.set()
+    stop_players.set()
+    await asyncio.gather(rusher, *players)
+
+    report("quiet", quiet)
+    report("rush", busy)
+    report("logins", logins)
+    failed = sum(1 for result in logins if result is None)
+    if failed:
+        print("%i logins failed or timed out" % failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--players", type=int, default=20, help="in-game players measured")
+    parser.add_argument("--logins", type=int, default=200, help="accounts used for the rush")
+    parser.add_argument("--rate", type=float, default=500, help="logins per minute")
+    parser.add_argument("--duration", type=float, default=60, help="seconds per phase")
+    parser.add_argument("--source-ips", type=int, default=100,
+                        help="loopback addresses to connect from, 0 for the default one")
+    parser.add_argument("--prefix", default="нагрузка")
+    parser.add_argument("--password", default="Zx8!loadtest")
+    parser.add_argument("--create", action="store_true", help="create the test accounts")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
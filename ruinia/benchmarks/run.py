@@ -0,0 +1,110 @@
+"""
+Micro-benchmark runner
+
+Builds synthetic worlds of the given sizes in a throwaway test database,
+runs every benchmark of the `bench_*.py` modules in each of them and
+saves the timings as JSON, so that two commits can be compared with
+`compare.py`:
+
+    cd ruinia
+    python benchmarks/run.py
+    python benchmarks/run.py --sizes 1000 10000 --filter Room
+    python benchmarks/compare.py benchmarks/results/A.json benchmarks/results/B.json
+
+Results go to `benchmarks/results/<date>-<commit>.json` unless
+`--output` is given. Needs the game's Python environment (Evennia and
+its dependencies), but not a running server or its database.
+"""
+import argparse
+import glob
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+import harness  # noqa: E402
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _load_benchmarks(pattern):
+    for path in sorted(glob.glob(os.path.join(BENCH_DIR, "bench_*.py"))):
+        importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+    return [bench for bench in harness.BENCHMARKS if not pattern or pattern in bench.name]
+
+
+def run(args):
+    harness.setup_evennia()
+    from fixtures import build_world
+
+    benchmarks = _load_benchmarks(args.filter)
+    sizes = sorted(args.sizes)
+    results = {}
+    for size in sizes:
+        old_name = harness.create_db()
+        try:
+            start = time.time()
+            world = build_world(size, seed=args.seed)
+            print("world of %i rooms built in %.1fs" % (world.rooms, time.time() - start))
+            for bench in benchmarks:
+                if not bench.sized and size != sizes[0]:
+                    continue
+                name = "%s[%i]" % (bench.name, size) if bench.sized else bench.name
+                try:
+                    result = harness.measure(bench.func(world), repeat=args.repeat)
+                except Exception as err:
+                    print("%-40s FAILED: %r" % (name, err))
+                    continue
+                results[name] = result
+                print(
+                    "%-40s %12.1f us  (+-%.1f, %i queries)"
+                    % (name, result["median_us"], result["stdev_us"], result["queries"])
+                )
+        finally:
+            harness.destroy_db(old_name)
+
+    commit = _commit()
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", "%s-%s.json" % (time.strftime("%Y%m%d-%H%M%S"), commit)
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    meta = {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "sizes": sizes,
+        "seed": args.seed,
+    }
+    with open(output, "w", encoding="utf-8") as fil:
+        json.dump({"name": "micro", "meta": meta, "results": results}, fil, ensure_ascii=False, indent=1)
+    print("results saved to %s" % output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=(1000, 10000, 100000),
+                        help="world sizes in rooms")
+    parser.add_argument("--filter", help="only benchmarks with this in the name")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON file for the results")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,8 @@ from codecs import lookup as codecs_lookup
 from django.conf import settings
 from evennia.server.sessionhandler import SESSIONS
 from evennia.utils import utils, create, logger, search
+from world import charnames
+from world.roster import ROSTER
 
 COMMAND_DEFAULT_CLASS = utils.class_from_module(settings.COMMAND_DEFAULT_CLASS)
 
@@ -64,19 +66,12 @@ class MuxAccountLookCommand(COMMAND_DEFAULT_CLASS):
             self.playable = None
             return
 
-        playable = self.account.db._playable_characters
-        if playable is not None:
-            # clean up list if character object was deleted in between
-            if None in playable:
-                playable = [character for character in playable if character]
-                self.account.db._playable_characters = playable
-        # store playable property
+        # store playable property; the handler caches the list and the
+        # name lookup and cleans up deleted characters by itself
         if self.args:
-            self.playable = dict((utils.to_str(char.key.lower()), char) for char in playable).get(
-                self.args.lower(), None
-            )
+            self.playable = self.account.playable.get(self.args)
         else:
-            self.playable = playable
+            self.playable = self.account.playable.all()
 
 
 # Obs - these are all intended to be stored on the Account, and as such,
@@ -153,10 +148,7 @@ class CmdCharCreate(COMMAND_DEFAULT_CLASS):
 
         charmax = _MAX_NR_CHARACTERS
 
-        if not account.is_superuser and (
-            account.db._playable_characters and len(
-                account.db._playable_characters) >= charmax
-        ):
+        if not account.is_superuser and len(account.playable) >= charmax:
             plural = "" if charmax == 1 else "ей"
             self.msg(
                 f"Вы можете создать максимум {charmax} персонаж{plural}.")
@@ -165,7 +157,7 @@ class CmdCharCreate(COMMAND_DEFAULT_CLASS):
 
         typeclass = settings.BASE_CHARACTER_TYPECLASS
 
-        if ObjectDB.objects.filter(db_typeclass_path=typeclass, db_key__iexact=key):
+        if charnames.name_taken(key):
             # check if this Character already exists. Note that we are only
             # searching the base character typeclass here, not any child
             # classes.
@@ -184,7 +176,7 @@ class CmdCharCreate(COMMAND_DEFAULT_CLASS):
             "puppet:id(%i) or pid(%i) or perm(Developer) or pperm(Developer);delete:id(%i) or perm(Admin)"
             % (new_character.id, account.id, account.id)
         )
-        account.db._playable_characters.append(new_character)
+        account.playable.add(new_character)
         if desc:
             new_character.db.desc = desc
         elif not new_character.db.desc:
@@ -222,11 +214,7 @@ class CmdCharDelete(COMMAND_DEFAULT_CLASS):
             return
 
         # use the playable_characters list to search
-        match = [
-            char
-            for char in utils.make_iter(account.db._playable_characters)
-            if char.key.lower() == self.args.lower()
-        ]
+        match = account.playable.search(self.args)
         if not match:
             self.msg("У вас нет подходящего для удаления персонажа.")
             return
@@ -243,9 +231,7 @@ class CmdCharDelete(COMMAND_DEFAULT_CLASS):
                     # only take action
                     delobj = caller.ndb._char_to_delete
                     key = delobj.key
-                    caller.db._playable_characters = [
-                        pc for pc in caller.db._playable_characters if pc != delobj
-                    ]
+                    caller.playable.remove(delobj)
                     delobj.delete()
                     self.msg("Персонаж '%s' удален." % key)
                     logger.log_sec(
@@ -317,12 +303,13 @@ class CmdIC(COMMAND_DEFAULT_CLASS):
         else:
             # argument given
 
-            if account.db._playable_characters:
+            playable = account.playable.all()
+            if playable:
                 # look at the playable_characters list first
                 character_candidates.extend(
                     account.search(
                         self.args,
-                        candidates=account.db._playable_characters,
+                        candidates=playable,
                         search_object=True,
                         quiet=True,
                     )
@@ -343,6 +330,18 @@ class CmdIC(COMMAND_DEFAULT_CLASS):
                         for char in session.puppet.search(self.args, quiet=True)
                         if char.access(account, "puppet")
                     ]
+                if not character_candidates:
+                    # an exact character name is looked up in the name index
+                    # before resorting to a global search
+                    from evennia.objects.models import ObjectDB
+
+                    character_candidates = [
+                        char
+                        for char in ObjectDB.objects.filter(
+                            id__in=charnames.character_ids(self.args)
+                        )
+                        if char.access(account, "puppet")
+                    ]
                 if not character_candidates:
                     # fall back to global search only if Builder+ has no
                     # playable_characers in list and is not standing in a room
@@ -496,13 +495,11 @@ class CmdWho(COMMAND_DEFAULT_CLASS):
 
     def func(self):
         """
-        Get all connected accounts by polling session.
+        Get all connected accounts from the online roster.
         """
 
         account = self.account
-        session_list = SESSIONS.get_sessions()
-
-        session_list = sorted(session_list, key=lambda o: o.account.key)
+        rows = ROSTER.rows()
 
         if self.cmdstring == "всети":
             show_session_data = False
@@ -510,8 +507,10 @@ class CmdWho(COMMAND_DEFAULT_CLASS):
             show_session_data = account.check_permstring("Developer") or account.check_permstring(
                 "Admins"
             )
+        is_builder = account.locks.check_lockstring(account, "perm(Builder)")
 
         naccounts = SESSIONS.account_count()
+        now = time.time()
         if show_session_data:
             # privileged info
             table = self.styled_table(
@@ -524,42 +523,29 @@ class CmdWho(COMMAND_DEFAULT_CLASS):
                 "|wПротокол",
                 "|wХост",
             )
-            for session in session_list:
-                if not session.logged_in:
-                    continue
-                delta_cmd = time.time() - session.cmd_last_visible
-                delta_conn = time.time() - session.conn_time
-                session_account = session.get_account()
-                puppet = session.get_puppet()
-                location = puppet.location.key if puppet and puppet.location else "None"
+            for row in rows:
+                session = row.session
+                puppet, location, cmd_total = row.admin_columns()
                 table.add_row(
-                    utils.crop(session_account.get_display_name(
-                        account), width=25),
-                    utils.time_format(delta_conn, 0),
-                    utils.time_format(delta_cmd, 1),
-                    utils.crop(puppet.get_display_name(account)
-                               if puppet else "None", width=25),
-                    utils.crop(location, width=25),
-                    session.cmd_total,
+                    row.display_name(is_builder),
+                    utils.time_format(now - session.conn_time, 0),
+                    utils.time_format(now - session.cmd_last_visible, 1),
+                    puppet,
+                    location,
+                    cmd_total,
                     session.protocol_key,
-                    isinstance(session.address,
-                               tuple) and session.address[0] or session.address,
+                    row.host,
                 )
         else:
             # unprivileged
             table = self.styled_table(
                 "|wИмя аккаунта", "|wВ сети уже", "|wБездельничает")
-            for session in session_list:
-                if not session.logged_in:
-                    continue
-                delta_cmd = time.time() - session.cmd_last_visible
-                delta_conn = time.time() - session.conn_time
-                session_account = session.get_account()
+            for row in rows:
+                session = row.session
                 table.add_row(
-                    utils.crop(session_account.get_display_name(
-                        account), width=25),
-                    utils.time_format(delta_conn, 0),
-                    utils.time_format(delta_cmd, 1),
+                    row.display_name(is_builder),
+                    utils.time_format(now - session.conn_time, 0),
+                    utils.time_format(now - session.cmd_last_visible, 1),
                 )
         is_one = naccounts == 1
         self.msg(
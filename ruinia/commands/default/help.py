@@ -7,13 +7,14 @@
 """
 
 from django.conf import settings
-from collections import defaultdict
-from evennia.utils.utils import fill, dedent
+from evennia.utils.utils import fill, dedent, crop
 from evennia.commands.command import Command
 from evennia.help.models import HelpEntry
 from evennia.utils import create, evmore
 from evennia.utils.eveditor import EvEditor
-from evennia.utils.utils import string_suggestions, class_from_module
+from evennia.utils.utils import class_from_module
+from world.help_index import get_help_index, invalidate as invalidate_help_index
+from world.lore_search import SEARCH_INDEX
 
 COMMAND_DEFAULT_CLASS = class_from_module(settings.COMMAND_DEFAULT_CLASS)
 HELP_MORE = settings.HELP_MORE
@@ -33,6 +34,10 @@ class CmdHelp(COMMAND_DEFAULT_CLASS):
       справка <тема или команда>
       справка список
       справка все
+      справка/искать <слова>
+
+    Переключатели:
+      искать - полнотекстовый поиск по справке и истории мира.
 
     Это будет искать справку по командам и другим
     темам, связанным с игрой.
@@ -40,8 +45,9 @@ class CmdHelp(COMMAND_DEFAULT_CLASS):
 
     key = "справка"
     aliases = ["?", "помощь", "пом"]
+    switch_options = ("искать",)
     locks = "cmd:all()"
-    arg_regex = r"\s|$"
+    arg_regex = r"/|\s|$"
     help_category = "Общее"
 
     # this is a special cmdhandler flag that makes the cmdhandler also pack
@@ -59,6 +65,9 @@ class CmdHelp(COMMAND_DEFAULT_CLASS):
     # number of suggestions (set to 0 to remove suggestions from help)
     suggestion_maxnum = 5
 
+    # number of full-text search results to show
+    search_maxnum = 10
+
     def msg_help(self, text):
         """
         messages text to the caller, adding an extra oob argument to indicate
@@ -115,28 +124,53 @@ class CmdHelp(COMMAND_DEFAULT_CLASS):
         return string
 
     @staticmethod
-    def format_help_list(hdict_cmds, hdict_db):
+    def format_search_results(query, hits):
+        """
+        Format the results of a full-text search.
+
+        Args:
+            query (str): the search query.
+            hits (list of SearchHit): the found documents, best first.
+
+        Returns the formatted string, ready to be sent.
+
+        """
+        string = _SEP + "\n|CПоиск |w%s|n" % query
+        if not hits:
+            string += "\nНичего не найдено."
+        for num, hit in enumerate(hits):
+            string += "\n |w%i.|n |G%s|n\n   %s" % (
+                num + 1, hit.title, crop(hit.text, width=_DEFAULT_WIDTH * 2))
+        string += "\n" + _SEP
+        return string
+
+    @staticmethod
+    def format_help_list(hdict_cmds, hdict_db, width=None):
         """
         Output a category-ordered list. The input are the
         pre-loaded help files for commands and database-helpfiles
         respectively.  You can override this method to return a
         custom display of the list of commands and topics.
+
+        The `width` is the client screen width to fill the list to.
         """
+        width = width or _DEFAULT_WIDTH
+        sep = "|C" + "-" * width + "|n"
         string = ""
         if hdict_cmds and any(hdict_cmds.values()):
-            string += "\n" + _SEP + "\n   |CСправка содержит|n\n" + _SEP
+            string += "\n" + sep + "\n   |CСправка содержит|n\n" + sep
             for category in sorted(hdict_cmds.keys()):
                 string += "\n  |w%s|n:\n" % (str(category).title())
                 string += "|G" + \
-                    fill("|C, |G".join(sorted(hdict_cmds[category]))) + "|n"
+                    fill("|C, |G".join(sorted(hdict_cmds[category])), width=width) + "|n"
         if hdict_db and any(hdict_db.values()):
-            string += "\n\n" + _SEP + "\n\r  |CТакже содержит|n\n" + _SEP
+            string += "\n\n" + sep + "\n\r  |CТакже содержит|n\n" + sep
             for category in sorted(hdict_db.keys()):
                 string += "\n\r  |w%s|n:\n" % (str(category).title())
                 string += (
                     "|G"
                     + fill(", ".join(sorted([str(topic)
-                           for topic in hdict_db[category]])))
+                           for topic in hdict_db[category]])), width=width)
                     + "|n"
                 )
         return string
@@ -186,6 +220,7 @@ class CmdHelp(COMMAND_DEFAULT_CLASS):
         """
         input is a string containing the command or topic to match.
         """
+        super().parse()
         self.original_args = self.args.strip()
         self.args = self.args.strip().lower()
 
@@ -199,6 +234,14 @@ class CmdHelp(COMMAND_DEFAULT_CLASS):
         suggestion_cutoff = self.suggestion_cutoff
         suggestion_maxnum = self.suggestion_maxnum
 
+        if "искать" in self.switches:
+            if not query:
+                self.msg("Использование: справка/искать <слова>")
+                return
+            hits = SEARCH_INDEX.search(query, caller=caller, limit=self.search_maxnum)
+            self.msg_help(self.format_search_results(self.original_args, hits))
+            return
+
         if not query:
             query = "все"
 
@@ -206,75 +249,36 @@ class CmdHelp(COMMAND_DEFAULT_CLASS):
         # having to allow doublet commands to manage exits etc.
         cmdset.make_unique(caller)
 
-        # retrieve all available commands and database topics
-        all_cmds = [cmd for cmd in cmdset if self.check_show_help(cmd, caller)]
-        all_topics = [
-            topic for topic in HelpEntry.objects.all() if topic.access(caller, "view", default=True)
-        ]
-        all_categories = list(
-            set(
-                [cmd.help_category.lower() for cmd in all_cmds]
-                + [topic.help_category.lower() for topic in all_topics]
-            )
-        )
+        # available commands, database topics and categories are indexed
+        # once per cmdset and permission profile
+        index = get_help_index(self, caller, cmdset, ignore_prefixes=CMD_IGNORE_PREFIXES)
 
         if query in ("список", "все"):
-            # we want to list all available help entries, grouped by category
-            hdict_cmd = defaultdict(list)
-            hdict_topic = defaultdict(list)
-            # create the dictionaries {category:[topic, topic ...]} required by format_help_list
-            # Filter commands that should be reached by the help
-            # system, but not be displayed in the table, or be displayed differently.
-            for cmd in all_cmds:
-                if self.should_list_cmd(cmd, caller):
-                    key = (
-                        cmd.auto_help_display_key
-                        if hasattr(cmd, "auto_help_display_key")
-                        else cmd.key
-                    )
-                    hdict_cmd[cmd.help_category].append(key)
-            [hdict_topic[topic.help_category].append(
-                topic.key) for topic in all_topics]
-            # report back
-            self.msg_help(self.format_help_list(hdict_cmd, hdict_topic))
+            # we want to list all available help entries, grouped by category.
+            # The listing is rendered once per index and screen width, evmore
+            # only has to split the cached text into pages.
+            width = self.client_width()
+            listing = index.get_listing(
+                width,
+                lambda: self.format_help_list(
+                    index.cmd_listing, index.topic_listing, width=width),
+            )
+            self.msg_help(listing)
             return
 
         # Try to access a particular command
 
-        # build vocabulary of suggestions and rate them by string similarity.
+        # rate the indexed vocabulary by string similarity.
         suggestions = None
         if suggestion_maxnum > 0:
-            vocabulary = (
-                [cmd.key for cmd in all_cmds if cmd]
-                + [topic.key for topic in all_topics]
-                + all_categories
-            )
-            [vocabulary.extend(cmd.aliases) for cmd in all_cmds]
-            suggestions = [
-                sugg
-                for sugg in string_suggestions(
-                    query, set(vocabulary), cutoff=suggestion_cutoff, maxnum=suggestion_maxnum
-                )
-                if sugg != query
-            ]
-            if not suggestions:
-                suggestions = [
-                    sugg for sugg in vocabulary if sugg != query and sugg.startswith(query)
-                ]
-
-        # try an exact command auto-help match
-        match = [cmd for cmd in all_cmds if cmd == query]
-
-        if not match:
-            # try an inexact match with prefixes stripped from query and cmds
-            _query = query[1:] if query[0] in CMD_IGNORE_PREFIXES else query
-
-            match = [
-                cmd
-                for cmd in all_cmds
-                for m in cmd._matchset
-                if m == _query or m[0] in CMD_IGNORE_PREFIXES and m[1:] == _query
-            ]
+            suggestions = index.suggest(
+                query, cutoff=suggestion_cutoff, maxnum=suggestion_maxnum)
+
+        # try an exact command auto-help match, then an inexact match
+        # with prefixes stripped from query and cmds
+        _query = query[1:] if query[0] in CMD_IGNORE_PREFIXES else query
+        keys = index.cmd_names.get(query) or index.cmd_names.get(_query) or ()
+        match = [cmd for cmd in cmdset if cmd.key in keys and cmd.auto_help]
 
         if len(match) == 1:
             cmd = match[0]
@@ -287,32 +291,25 @@ class CmdHelp(COMMAND_DEFAULT_CLASS):
             return
 
         # try an exact database help entry match
-        match = list(HelpEntry.objects.find_topicmatch(query, exact=True))
-        if len(match) == 1:
+        topic = index.topics.get(query)
+        if topic:
             formatted = self.format_help_entry(
-                match[0].key,
-                match[0].entrytext,
-                aliases=match[0].aliases.all(),
+                topic.key,
+                topic.entrytext,
+                aliases=topic.aliases.all(),
                 suggested=suggestions,
             )
             self.msg_help(formatted)
             return
 
         # try to see if a category name was entered
-        if query in all_categories:
+        if query in index.categories:
             self.msg_help(
                 self.format_help_list(
-                    {
-                        query: [
-                            cmd.auto_help_display_key
-                            if hasattr(cmd, "auto_help_display_key")
-                            else cmd.key
-                            for cmd in all_cmds
-                            if cmd.help_category == query
-                        ]
-                    },
-                    {query: [
-                        topic.key for topic in all_topics if topic.help_category == query]},
+                    {query: [key for category, keys in index.cmd_listing.items()
+                             if category.lower() == query for key in keys]},
+                    {query: [key for category, keys in index.topic_listing.items()
+                             if category.lower() == query for key in keys]},
                 )
             )
             return
@@ -464,6 +461,7 @@ class CmdSetHelp(COMMAND_DEFAULT_CLASS):
             else:
                 old_entry.entrytext += "\n%s" % self.rhs
             old_entry.aliases.add(aliases)
+            invalidate_help_index()
             self.msg("Запись обновлена:\n%s%s" %
                      (old_entry.entrytext, aliastxt))
             return
@@ -474,6 +472,7 @@ class CmdSetHelp(COMMAND_DEFAULT_CLASS):
                          (topicstr, aliastxt))
                 return
             old_entry.delete()
+            invalidate_help_index()
             self.msg("Удалена запись '%s'%s." % (topicstr, aliastxt))
             return
 
@@ -491,6 +490,7 @@ class CmdSetHelp(COMMAND_DEFAULT_CLASS):
                 old_entry.locks.add(lockstring)
                 old_entry.aliases.add(aliases)
                 old_entry.save()
+                invalidate_help_index()
                 self.msg("Старая справка переопределена '%s'%s." %
                          (topicstr, aliastxt))
             else:
@@ -505,6 +505,7 @@ class CmdSetHelp(COMMAND_DEFAULT_CLASS):
                 topicstr, self.rhs, category=category, locks=lockstring, aliases=aliases
             )
             if new_entry:
+                invalidate_help_index()
                 self.msg("Справка '%s'%s успешно создана." %
                          (topicstr, aliastxt))
                 if "редактировать" in switches:
@@ -0,0 +1,195 @@
+"""
+Системные команды администраторов игры.
+"""
+import time
+from django.conf import settings
+from evennia.utils import utils
+from world.metrics import METRICS, cache_stats
+from world.profiler import PROFILER
+
+COMMAND_DEFAULT_CLASS = utils.class_from_module(settings.COMMAND_DEFAULT_CLASS)
+
+# limit symbol import for API
+__all__ = ("CmdProfiler", "CmdStats")
+
+
+class CmdProfiler(COMMAND_DEFAULT_CLASS):
+    """
+    профилирование команд
+
+    Использование:
+      профайлер [секунд]
+      профайлер/стоп
+      профайлер/отчёт
+
+    Переключатели:
+      стоп  - остановить профилирование раньше срока и показать отчёт.
+      отчёт - показать отчёт последнего (или идущего) профилирования.
+
+    Включает на заданное время (по умолчанию на минуту) замер всех
+    выполняемых команд: число вызовов, время, запросы к базе и объём
+    отправленного текста на вызов. По окончании показывает таблицу,
+    самые затратные команды первыми, и пишет свёрнутые стеки для
+    flamegraph.pl/speedscope в файл на сервере.
+    """
+
+    key = "профайлер"
+    switch_options = ("стоп", "отчёт")
+    locks = "cmd:perm(Developer)"
+    help_category = "Система"
+
+    # this is used by the parent
+    account_caller = True
+
+    def func(self):
+        """Implement function"""
+        if "отчёт" in self.switches:
+            self.msg(self.format_report())
+            return
+        if "стоп" in self.switches:
+            if not PROFILER.active:
+                self.msg("Профилирование не запущено.")
+                return
+            PROFILER.stop()
+            return
+
+        duration = None
+        if self.args:
+            try:
+                duration = float(self.args)
+            except ValueError:
+                self.msg("Использование: профайлер [секунд]")
+                return
+            if duration <= 0:
+                self.msg("Время должно быть больше нуля.")
+                return
+
+        caller = self.caller
+        session = self.session
+
+        def _done(profiler):
+            caller.msg(self.format_report(), session=session)
+
+        if not PROFILER.start(duration, callback=_done):
+            self.msg("Профилирование уже идёт. Используйте профайлер/стоп.")
+            return
+        self.msg(
+            "Профилирование команд запущено на %i сек."
+            % (duration or settings.PROFILER_DEFAULT_DURATION)
+        )
+
+    def format_report(self):
+        """
+        Собрать отчёт профилировщика в таблицу.
+        """
+        if PROFILER.started is None:
+            return "Профилирование ещё не запускалось."
+        rows = PROFILER.report()
+        if not rows:
+            return "За время профилирования команд не выполнялось."
+        table = self.styled_table(
+            "|wкоманда", "|wвызовов", "|wвсего, с", "|wсреднее, мс",
+            "|wмакс, мс", "|wзапросов", "|wбайт",
+        )
+        for key, calls, total, mean, peak, queries, sent in rows:
+            table.add_row(
+                key, calls, "%.3f" % total, "%.2f" % mean, "%.2f" % peak,
+                "%.1f" % queries, "%i" % sent,
+            )
+        state = "идёт" if PROFILER.active else "завершено"
+        text = "|wПрофилирование команд (%s):|n\n%s" % (state, table)
+        if PROFILER.dump_path:
+            text += "\nСтеки: %s" % PROFILER.dump_path
+        return text
+
+
+def _ms(seconds):
+    return "-" if seconds is None else "%.2f" % (seconds * 1000)
+
+
+_CACHE_NAMES = {"render": "вывод", "cmdset_merge": "слияние наборов команд"}
+
+
+def _caches():
+    """Строки с попаданиями кешей для `статистика`."""
+    lines = ["|wКеши:|n"]
+    for name, stats in sorted(cache_stats().items()):
+        lines.append(
+            "  %s: %.0f%% попаданий (%i из %i), записей %i/%i"
+            % (
+                _CACHE_NAMES.get(name, name),
+                stats["hitrate"] * 100,
+                stats["hits"],
+                stats["hits"] + stats["misses"],
+                stats["size"],
+                stats["maxsize"],
+            )
+        )
+    return "\n".join(lines)
+
+
+class CmdStats(COMMAND_DEFAULT_CLASS):
+    """
+    статистика выполнения команд
+
+    Использование:
+      статистика [команда]
+      статистика/сброс
+
+    Переключатели:
+      сброс - обнулить накопленную статистику.
+
+    Показывает для каждой команды с момента запуска сервера (или сброса)
+    число вызовов, время разбора и выполнения (p50/p95/p99 в мс), а
+    также сколько в среднем за вызов сделано запросов к базе и отправлено
+    сообщений. Самые затратные по общему времени команды идут первыми.
+    Ниже - попадания кеша вывода и кеша слияния наборов команд.
+    Те же данные в формате Prometheus отдаются по адресу /metrics.
+    """
+
+    key = "статистика"
+    aliases = ["stats"]
+    switch_options = ("сброс",)
+    locks = "cmd:perm(Developer)"
+    help_category = "Система"
+
+    # this is used by the parent
+    account_caller = True
+
+    def func(self):
+        """Implement function"""
+        if "сброс" in self.switches:
+            METRICS.reset()
+            self.msg("Статистика команд сброшена.")
+            return
+
+        snapshot = METRICS.snapshot()
+        if self.args:
+            snapshot = {key: val for key, val in snapshot.items() if key == self.args.strip()}
+        if not snapshot:
+            self.msg("Нет данных.\n%s" % _caches())
+            return
+
+        table = self.styled_table(
+            "|wкоманда", "|wвызовов", "|wразбор p50/95/99", "|wвыполнение p50/95/99",
+            "|wзапросов", "|wсообщений",
+        )
+        def _total(item):
+            return sum(hist.sum for hist in item[1].phases.values())
+
+        for key, metrics in sorted(snapshot.items(), key=_total, reverse=True):
+            calls = metrics.calls or 1
+            table.add_row(
+                key,
+                metrics.calls,
+                *(
+                    "/".join(_ms(metrics.phases[phase].quantile(q)) for q in (0.5, 0.95, 0.99))
+                    for phase in ("parse", "func")
+                ),
+                "%.1f" % (metrics.queries / calls),
+                "%.1f" % (metrics.messages / calls),
+            )
+        self.msg(
+            "|wСтатистика команд с %s (время в мс):|n\n%s\n%s"
+            % (time.strftime("%d.%m %H:%M", time.localtime(METRICS.started)), table, _caches())
+        )
@@ -10,6 +10,7 @@ from evennia.server.sessionhandler import SESSIONS
 
 from evennia.utils import class_from_module, create, logger, utils, gametime
 from evennia.commands.cmdhandler import CMD_LOGINSTART
+from world import auth, connection_screen
 
 COMMAND_DEFAULT_CLASS = utils.class_from_module(settings.COMMAND_DEFAULT_CLASS)
 
@@ -28,6 +29,18 @@ __all__ = (
 MULTISESSION_MODE = settings.MULTISESSION_MODE
 CONNECTION_SCREEN_MODULE = settings.CONNECTION_SCREEN_MODULE
 
+_THROTTLED_MSG = "|RСлишком много попыток. Попробуйте снова через %i сек.|n"
+_BUSY_MSG = "|RСервер сейчас занят, попробуйте чуть позже.|n"
+
+
+def _auth_errback(failure, session):
+    """
+    Report a crash in the auth worker pool to the log and the session.
+    """
+    logger.log_trace(str(failure))
+    if SESSIONS.session_from_sessid(session.sessid):
+        session.msg("|RПроизошла ошибка, попробуйте ещё раз.|n")
+
 
 def create_guest_account(session):
     """
@@ -127,6 +140,10 @@ class CmdUnconnectedConnect(COMMAND_DEFAULT_CLASS):
 
             # Guest login
             if len(parts) == 1 and parts[0].lower() == "guest":
+                wait = auth.throttled(address)
+                if wait:
+                    session.msg(_THROTTLED_MSG % wait)
+                    return
                 # Get Guest typeclass
                 Guest = class_from_module(settings.BASE_GUEST_TYPECLASS)
 
@@ -146,13 +163,36 @@ class CmdUnconnectedConnect(COMMAND_DEFAULT_CLASS):
         Account = class_from_module(settings.BASE_ACCOUNT_TYPECLASS)
 
         name, password = parts
-        account, errors = Account.authenticate(
-            username=name, password=password, ip=address, session=session
+        wait = auth.throttled(address, name)
+        if wait:
+            session.msg(_THROTTLED_MSG % wait)
+            return
+
+        def _callback(result):
+            account, errors = result
+            if session.logged_in or not SESSIONS.session_from_sessid(session.sessid):
+                # disconnected or logged in some other way in the meantime
+                return
+            if account:
+                session.sessionhandler.login(session, account)
+            else:
+                session.msg("|R%s|n" % "\n".join(errors))
+
+        # password hashing is slow, it is done off the reactor thread
+        # before authenticate() runs
+        deferred = auth.run_auth(
+            Account.authenticate,
+            password,
+            auth.password_hash(name),
+            username=name,
+            ip=address,
+            session=session,
         )
-        if account:
-            session.sessionhandler.login(session, account)
-        else:
-            session.msg("|R%s|n" % "\n".join(errors))
+        if deferred is None:
+            session.msg(_BUSY_MSG)
+            return
+        deferred.addCallback(_callback)
+        deferred.addErrback(_auth_errback, session)
 
 
 class CmdUnconnectedCreate(COMMAND_DEFAULT_CLASS):
@@ -200,11 +240,28 @@ class CmdUnconnectedCreate(COMMAND_DEFAULT_CLASS):
             return
 
         username, password = parts
+        wait = auth.throttled(address, username)
+        if wait:
+            session.msg(_THROTTLED_MSG % wait)
+            return
 
-        # everything's ok. Create the new account account.
-        account, errors = Account.create(
-            username=username, password=password, ip=address, session=session
+        # everything's ok. Create the new account once the password has
+        # been hashed off the reactor thread.
+        deferred = auth.run_auth(
+            Account.create, password, username=username, ip=address, session=session
         )
+        if deferred is None:
+            session.msg(_BUSY_MSG)
+            return
+        deferred.addCallback(self._created, session, username)
+        deferred.addErrback(_auth_errback, session)
+
+    @staticmethod
+    def _created(result, session, username):
+        """Report the outcome of the account creation to the session."""
+        account, errors = result
+        if not SESSIONS.session_from_sessid(session.sessid):
+            return
         if account:
             # tell the caller everything went well.
             string = "Аккаунт '%s' был успешно создан. Добро пожаловать!"
@@ -262,16 +319,7 @@ class CmdUnconnectedLook(COMMAND_DEFAULT_CLASS):
 
     def func(self):
         """Show the connect screen."""
-
-        callables = utils.callables_from_module(CONNECTION_SCREEN_MODULE)
-        if "connection_screen" in callables:
-            connection_screen = callables["connection_screen"]()
-        else:
-            connection_screen = utils.random_string_from_module(
-                CONNECTION_SCREEN_MODULE)
-            if not connection_screen:
-                connection_screen = "No connection screen found. Please contact an admin."
-        self.caller.msg(connection_screen)
+        self.caller.msg(connection_screen.get_screen())
 
 
 class CmdUnconnectedHelp(COMMAND_DEFAULT_CLASS):
@@ -491,7 +539,7 @@ def _create_character(session, new_account, typeclass, home, permissions):
             typeclass, key=new_account.key, home=home, permissions=permissions
         )
         # set playable character list
-        new_account.db._playable_characters.append(new_character)
+        new_account.playable.add(new_character)
 
         # allow only the character itself and the account to puppet this character (and Developers).
         new_character.locks.add(
@@ -26,7 +26,7 @@ own cmdsets by inheriting from them or directly from `evennia.CmdSet`.
 """
 
 from evennia import default_cmds
-from commands.default import general, help, unloggedin, account, building
+from commands.default import general, help, unloggedin, account, building, system
 
 
 class CharacterCmdSet(default_cmds.CharacterCmdSet):
@@ -139,6 +139,9 @@ class AccountCmdSet(default_cmds.AccountCmdSet):
         self.add(account.CmdQuell())
         self.add(account.CmdStyle())
 
+        self.add(system.CmdProfiler())
+        self.add(system.CmdStats())
+
 
 class UnloggedinCmdSet(default_cmds.UnloggedinCmdSet):
     """
@@ -1,29 +1,30 @@
 """
 Search and multimatch handling
 
-This module allows for overloading two functions used by Evennia's
-search functionality:
+This module overloads the hook Evennia calls with the result of an
+object search (`caller.search()`, also used for ambiguous commands):
 
     at_search_result:
-        This is called whenever a result is returned from an object
-        search (a common operation in commands).  It should (together
-        with at_multimatch_input below) define some way to present and
-        differentiate between multiple matches (by default these are
-        presented as 1-ball, 2-ball etc)
-    at_multimatch_input:
-        This is called with a search term and should be able to
-        identify if the user wants to separate a multimatch-result
-        (such as that from a previous search). By default, this
-        function understands input on the form 1-ball, 2-ball etc as
-        indicating that the 1st or 2nd match for "ball" should be
-        used.
-
-This module is not called by default, to use it, add the following
-line to your settings file:
+        Returns the single match, or tells the caller (in Russian) that
+        nothing or more than one thing was found. Multiple matches are
+        listed as `1-меч`, `2-меч` (`SEARCH_MULTIMATCH_TEMPLATE`), which
+        is the form `SEARCH_MULTIMATCH_REGEX` understands as input.
+
+It is enabled in the settings file with
 
     SEARCH_AT_RESULT = "server.conf.at_search.at_search_result"
 
 """
+from django.conf import settings
+
+_MULTIMATCH_TEMPLATE = settings.SEARCH_MULTIMATCH_TEMPLATE
+
+
+def _extra_info(result, caller):
+    if hasattr(result, "get_display_name"):
+        return " (у вас)" if result.location == caller else ""
+    # commands of objects around tell whose they are
+    return result.get_extra_info(caller) if hasattr(result, "get_extra_info") else ""
 
 
 def at_search_result(matches, caller, query="", quiet=False, **kwargs):
@@ -52,3 +53,34 @@ def at_search_result(matches, caller, query="", quiet=False, **kwargs):
             already have happened.
 
     """
+    error = ""
+    if not matches:
+        error = kwargs.get("nofound_string") or "Здесь нет '%s'." % query
+        matches = None
+    elif len(matches) > 1:
+        error = kwargs.get("multimatch_string") or "Под '%s' подходит несколько вариантов, уточните:" % query
+        error += "\n"
+        for num, result in enumerate(matches):
+            if hasattr(result.aliases, "all"):
+                # the plural forms from get_numbered_name are aliases too
+                aliases = [
+                    tag.db_key
+                    for tag in result.aliases.all(return_objs=True)
+                    if tag.db_category != "plural_key"
+                ]
+            else:
+                # commands have a plain list of aliases
+                aliases = result.aliases
+            error += _MULTIMATCH_TEMPLATE.format(
+                number=num + 1,
+                name=result.get_display_name(caller) if hasattr(result, "get_display_name") else query,
+                aliases=" [%s]" % ";".join(aliases) if aliases else "",
+                info=_extra_info(result, caller),
+            )
+        matches = None
+    else:
+        matches = matches[0]
+
+    if error and not quiet:
+        caller.msg(error.strip())
+    return matches
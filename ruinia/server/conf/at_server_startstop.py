@@ -22,7 +22,15 @@ def at_server_start():
     This is called every time the server starts up, regardless of
     how it was shut down.
     """
-    pass
+    from evennia import create_script, search_script
+    from world import cmdset_cache, snapshot, warmup
+
+    cmdset_cache.install()
+    # indexes saved by at_server_reload_stop make the warm-up stages cheap
+    snapshot.restore()
+    warmup.run()
+    if not search_script("map_export"):
+        create_script("typeclasses.scripts.MapExportScript")
 
 
 def at_server_stop():
@@ -44,7 +52,9 @@ def at_server_reload_stop():
     """
     This is called only time the server stops before a reload.
     """
-    pass
+    from world import snapshot
+
+    snapshot.save()
 
 
 def at_server_cold_start():
@@ -1,35 +1,113 @@
 """
-Changing the default command parser
+Command parser
 
-The cmdparser is responsible for parsing the raw text inserted by the
-user, identifying which command/commands match and return one or more
-matching command objects. It is called by Evennia's cmdhandler and
-must accept input and return results on the same form. The default
-handler is very generic so you usually don't need to overload this
-unless you have very exotic parsing needs; advanced parsing is best
-done at the Command.parse level.
+Evennia's default parser (`evennia.commands.cmdparser`) finds the
+commands matching the input by checking every key and alias of every
+command in the merged cmdset with `startswith`. Our cmdsets have many
+Russian aliases (`смотреть/см/смот/осмотреть`, the exit directions
+and so on), so that is a few hundred string comparisons per input.
 
-The default cmdparser understands the following command combinations
-(where [] marks optional parts.)
+This parser builds a prefix trie of all keys and aliases of the merged
+cmdset instead and finds the matching names by walking the input along
+it, which takes as many steps as the input has characters. The trie is
+kept in the `_parse_cache` of the merged cmdset, which all copies of one
+cached merge result share (`world/cmdset_cache.py` keys merge results by
+where they came from, so the same stack of cmdsets gives the same result
+command after command). Building a trie costs more than one linear scan,
+so it is only built the second time a merge result is parsed; a result
+seen once, or a cmdset without `_parse_cache` (the merge cache is off),
+is parsed the default way.
 
-[cmdname[ cmdname2 cmdname3 ...] [the rest]
+Everything else (`arg_regex`, `CMD_IGNORE_PREFIXES`, `1-cmd`/`cmd-1`
+differentiators and narrowing down multiple matches) works exactly as
+in the default parser.
 
-A command may consist of any number of space-separated words of any
-length, and contain any character. It may also be empty.
+Enabled in settings with
 
-The parser makes use of the cmdset to find command candidates. The
-parser return a list of matches. Each match is a tuple with its first
-three elements being the parsed cmdname (lower case), the remaining
-arguments, and the matched cmdobject from the cmdset.
+    COMMAND_PARSER = "server.conf.cmdparser.cmdparser"
 
+"""
+from django.conf import settings
+from evennia.commands.cmdparser import build_matches, create_match, try_num_differentiators
+from evennia.utils.logger import log_trace
 
-This module is not accessed by default. To tell Evennia to use it
-instead of the default command parser, add the following line to
-your settings file:
+_CMD_IGNORE_PREFIXES = settings.CMD_IGNORE_PREFIXES
+# trie node key holding the `(cmdname, cmdobj, raw_cmdname)` ending there
+_END = None
+# parses of a merge result before its trie is built
+_TRIE_AFTER = 2
 
-    COMMAND_PARSER = "server.conf.cmdparser.cmdparser"
 
-"""
+def _build_trie(cmdset, include_prefixes):
+    trie = {}
+    for cmd in cmdset:
+        # names equal after lower() or stripping the prefixes (`@desc` and
+        # `desc`, an exit alias equal to its key) go in once per command
+        seen = set()
+        for raw_cmdname in [cmd.key] + cmd.aliases:
+            cmdname = raw_cmdname
+            if not include_prefixes and len(raw_cmdname) > 1:
+                cmdname = raw_cmdname.lstrip(_CMD_IGNORE_PREFIXES)
+            l_cmdname = cmdname.lower()
+            if not cmdname or l_cmdname in seen:
+                continue
+            seen.add(l_cmdname)
+            node = trie
+            for char in l_cmdname:
+                node = node.setdefault(char, {})
+            node.setdefault(_END, []).append((cmdname, cmd, raw_cmdname))
+    return trie
+
+
+def _get_trie(cmdset, include_prefixes):
+    cache = cmdset.__dict__.get("_parse_cache")
+    if cache is None:
+        return None
+    trie = cache.get(include_prefixes)
+    if trie is None:
+        uses = cache[("uses", include_prefixes)] = cache.get(("uses", include_prefixes), 0) + 1
+        if uses < _TRIE_AFTER:
+            return None
+        trie = cache[include_prefixes] = _build_trie(cmdset, include_prefixes)
+    return trie
+
+
+def build_trie_matches(raw_string, cmdset, include_prefixes=False):
+    """
+    Same as `evennia.commands.cmdparser.build_matches`, using the trie of
+    the cmdset when it has one.
+
+    Args:
+        raw_string (str): The input.
+        cmdset (CmdSet): The merged cmdset.
+        include_prefixes (bool): Match the names as they are, otherwise
+            with `CMD_IGNORE_PREFIXES` stripped from input and names.
+
+    Returns:
+        matches (list): Tuples as returned by `create_match`.
+
+    """
+    trie = _get_trie(cmdset, include_prefixes)
+    if trie is None:
+        return build_matches(raw_string, cmdset, include_prefixes=include_prefixes)
+    # like Command.match, one match per command: the longest name, and
+    # the walk finds the names of a command from shortest to longest
+    matches = {}
+    try:
+        if not include_prefixes and len(raw_string) > 1:
+            raw_string = raw_string.lstrip(_CMD_IGNORE_PREFIXES)
+        l_raw_string = raw_string.lower()
+        node = trie
+        for char in l_raw_string:
+            node = node.get(char)
+            if node is None:
+                break
+            for cmdname, cmd, raw_cmdname in node.get(_END, ()):
+                if not cmd.arg_regex or cmd.arg_regex.match(l_raw_string[len(cmdname):]):
+                    matches[id(cmd)] = create_match(cmdname, raw_string, cmd, raw_cmdname)
+    except Exception:
+        log_trace("cmdhandler error. raw_input:%s" % raw_string)
+    return list(matches.values())
 
 
 def cmdparser(raw_string, cmdset, caller, match_index=None):
@@ -44,7 +122,7 @@ def cmdparser(raw_string, cmdset, caller, match_index=None):
                   list of same-named command matches.
 
     Returns:
-     list of tuples: [(cmdname, args, cmdobj, cmdlen, mratio), ...]
+     list of tuples: [(cmdname, args, cmdobj, cmdlen, mratio, raw_cmdname), ...]
             where cmdname is the matching command name and args is
             everything not included in the cmdname. Cmdobj is the actual
             command instance taken from the cmdset, cmdlen is the length
@@ -52,4 +130,39 @@ def cmdparser(raw_string, cmdset, caller, match_index=None):
             (possibly) separate multiple matches.
 
     """
-    # Your implementation here
+    if not raw_string:
+        return []
+
+    matches = build_trie_matches(raw_string, cmdset, include_prefixes=True)
+    if len(matches) != 1:
+        # no single match, try the numerical tags like 1-cmd or cmd-2
+        match_index, new_raw_string = try_num_differentiators(raw_string)
+        if match_index is not None:
+            matches.extend(build_trie_matches(new_raw_string, cmdset, include_prefixes=True))
+
+    if not matches and _CMD_IGNORE_PREFIXES:
+        if len(raw_string) > 1:
+            raw_string = raw_string.lstrip(_CMD_IGNORE_PREFIXES)
+        matches = build_trie_matches(raw_string, cmdset, include_prefixes=False)
+
+    # only the commands we are actually allowed to call
+    matches = [match for match in matches if match[2].access(caller, "cmd")]
+
+    if len(matches) > 1:
+        # prefer the matches with preserved case, if that leaves any
+        trimmed = [match for match in matches if raw_string.startswith(match[0])]
+        if trimmed:
+            matches = trimmed
+    if len(matches) > 1:
+        # the longest command names
+        matches = sorted(matches, key=lambda match: match[3])
+        quality = [match[3] for match in matches]
+        matches = matches[-quality.count(quality[-1]):]
+    if len(matches) > 1:
+        # the best ratio of name to input length
+        matches = sorted(matches, key=lambda match: match[4])
+        quality = [match[4] for match in matches]
+        matches = matches[-quality.count(quality[-1]):]
+    if len(matches) > 1 and match_index is not None and 0 < match_index <= len(matches):
+        matches = [matches[match_index - 1]]
+    return matches
@@ -14,6 +14,11 @@ To change the login screen in this module, do one of the following:
   with the connection string that should be displayed. If more than one such
   variable is given, Evennia will pick one of them at random.
 
+Strings may contain the fields `{online}` (number of accounts online) and
+`{gametime}` (current game time). They are filled in and refreshed every
+`settings.CONNECTION_SCREEN_REFRESH` seconds by `world.connection_screen`,
+which also caches the whole screen so that new connections are cheap.
+
 The commands available to the user when the connection screen is shown
 are defined in evennia.default_cmds.UnloggedinCmdSet. The parsing and display
 of the screen is done by the unlogged-in "look" command.
@@ -42,6 +47,8 @@ CONNECTION_SCREEN = """
       |wсоздать <логин> <пароль>|n
 
  Введите |wсправка|n для получения справки. |wсмотреть|n чтобы увидеть текущий экран еще раз.
+
+ Сейчас в игре: |w{{online}}|n. Игровое время: |w{{gametime}}|n.
 |204===========================================================================================|n""".format(
     settings.SERVERNAME, utils.get_evennia_version("short")
 )
@@ -50,3 +50,40 @@ as argument.
 #
 #     """
 #     pass
+
+
+def profiler(session, *args, **kwargs):
+    """
+    Control the command profiler (world/profiler.py) from a client, e.g.
+    a monitoring script talking OOB. Only Developers may use it.
+
+    Args:
+        session (Session): The active Session.
+        args (str): "start" (the default), "stop" or "report".
+
+    Keyword Args:
+        duration (float): How long to profile, for "start".
+
+    The reply is sent back as the `profiler` OOB command with the state
+    and the per-command rows of `Profiler.report()`.
+
+    """
+    from world.profiler import PROFILER
+
+    account = session.account
+    if not account or not account.check_permstring("Developer"):
+        session.msg(profiler=((), {"error": "permission denied"}))
+        return
+
+    action = args[0] if args else "start"
+    if action == "start":
+        duration = kwargs.get("duration")
+        PROFILER.start(float(duration) if duration else None)
+    elif action == "stop":
+        PROFILER.stop()
+    session.msg(
+        profiler=(
+            [list(row) for row in PROFILER.report()],
+            {"active": PROFILER.active, "dump": PROFILER.dump_path},
+        )
+    )
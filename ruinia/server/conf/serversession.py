@@ -21,7 +21,111 @@ settings file:
 
 """
 
+import re
+from collections import OrderedDict
+from django.conf import settings
+from twisted.internet import reactor
 from evennia.server.serversession import ServerSession as BaseServerSession
+from evennia.utils import ansi
+from world.metrics import METRICS
+from world.roster import ROSTER
+
+_BATCH_WINDOW = settings.SESSION_OUTPUT_BATCH_WINDOW
+_BATCH_MAX = settings.SESSION_OUTPUT_BATCH_MAX
+
+# options that must reach the portal exactly as given and so are never
+# glued together with other messages
+_UNBATCHED_OPTIONS = ("raw", "send_prompt", "prompt")
+
+# protocols that turn markup into terminal escape codes; text for these
+# can be rendered once here and shipped to the portal as raw
+_RENDER_PROTOCOLS = ("telnet", "telnet/ssl", "ssh")
+_RENDER_ENABLED = bool(settings.SESSION_RENDER_CACHE_SIZE) and not settings.INLINEFUNC_ENABLED
+_RE_N = re.compile(r"\|n$")
+_RE_SCREENREADER_REGEX = re.compile(
+    r"%s" % settings.SCREENREADER_REGEX_STRIP, re.DOTALL + re.MULTILINE
+)
+
+
+class RenderCache(object):
+    """
+    Bounded LRU cache of rendered outgoing text.
+
+    Maps `(markup, screenreader, xterm256, nocolor)` to the string the
+    telnet protocol would have produced from it, so the same room
+    description or daynight banner is parsed once and not once per
+    listening session.
+
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def render(self, text, screenreader=False, xterm256=False, nocolor=False):
+        """
+        Get the rendered version of a text, parsing it on a cache miss.
+
+        Args:
+            text (str): Text with markup.
+            screenreader (bool): Strip colors and decorations.
+            xterm256 (bool): Client understands xterm256 colors.
+            nocolor (bool): Strip all colors.
+
+        Returns:
+            rendered (str): The text ready to be sent to the client.
+
+        """
+        key = (text, screenreader, xterm256, nocolor)
+        try:
+            rendered = self._cache[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return rendered
+
+        # the same steps TelnetProtocol.send_text does on the portal side
+        rendered = text
+        if screenreader:
+            rendered = ansi.parse_ansi(rendered, strip_ansi=True, xterm256=False, mxp=False)
+            rendered = _RE_SCREENREADER_REGEX.sub("", rendered)
+        rendered = ansi.parse_ansi(
+            _RE_N.sub("", rendered) + ("||n" if rendered.endswith("|") else "|n"),
+            strip_ansi=nocolor,
+            xterm256=xterm256,
+            mxp=False,
+        )
+        self._cache[key] = rendered
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return rendered
+
+    def stats(self):
+        """
+        Returns:
+            stats (dict): Size and hit/miss counters of the cache.
+
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitrate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        """Empty the cache and reset the counters."""
+        self._cache.clear()
+        self.hits = self.misses = 0
+
+
+RENDER_CACHE = RenderCache(settings.SESSION_RENDER_CACHE_SIZE)
 
 
 class ServerSession(BaseServerSession):
@@ -32,6 +136,167 @@ class ServerSession(BaseServerSession):
     Each account gets one or more sessions assigned to them whenever they connect
     to the game server. All communication between game and account goes
     through their session(s).
+
+    Outgoing text is not handed to the portal right away. Messages sent
+    to the session within one reactor tick (or within
+    `settings.SESSION_OUTPUT_BATCH_WINDOW` seconds) are collected in a
+    per-session buffer and go out as a single frame, so a crowd walking
+    through a room produces one AMP send per listener instead of one per
+    announcement. Text for terminal protocols is also rendered here,
+    through the shared `RENDER_CACHE`, and passed on to the portal as raw.
     """
 
-    pass
+    def __init__(self):
+        super().__init__()
+        self._outbuf = []
+        self._outbuf_key = None
+        self._outbuf_call = None
+
+    @staticmethod
+    def _batchable(kwargs):
+        """
+        Check if the outgoing data is plain text that may be glued
+        together with other text.
+
+        Args:
+            kwargs (dict): The keywords given to `data_out`.
+
+        Returns:
+            batch (tuple or None): `(text, textkwargs, options, batchkey)`
+                or `None` if the data must be sent as-is.
+
+        """
+        if "text" not in kwargs or any(key not in ("text", "options") for key in kwargs):
+            return None
+        text, textkwargs = kwargs["text"], {}
+        if isinstance(text, (tuple, list)):
+            if not text or len(text) > 2:
+                return None
+            if len(text) == 2:
+                textkwargs = text[1]
+                if not isinstance(textkwargs, dict):
+                    return None
+            text = text[0]
+        if not isinstance(text, str):
+            return None
+        options = kwargs.get("options") or {}
+        if any(options.get(opt) for opt in _UNBATCHED_OPTIONS):
+            return None
+        batchkey = (repr(sorted(textkwargs.items())), repr(sorted(options.items())))
+        return text, textkwargs, options, batchkey
+
+    def data_out(self, **kwargs):
+        """
+        Send data to the client, batching plain text.
+
+        Keyword Args:
+            kwargs (any): Other data to the protocol.
+
+        """
+        METRICS.count_message()
+        batch = self._batchable(kwargs)
+        if batch is None:
+            # anything but plain text keeps its place in the output order
+            self.flush_output()
+            super().data_out(**kwargs)
+            return
+
+        text, textkwargs, options, batchkey = batch
+        if _BATCH_WINDOW is None:
+            self._send_text([text], textkwargs, options)
+            return
+
+        if self._outbuf and batchkey != self._outbuf_key:
+            self.flush_output()
+        self._outbuf.append((text, textkwargs, options))
+        self._outbuf_key = batchkey
+
+        if len(self._outbuf) >= _BATCH_MAX:
+            self.flush_output()
+        elif not self._outbuf_call:
+            self._outbuf_call = reactor.callLater(_BATCH_WINDOW, self.flush_output)
+
+    def flush_output(self):
+        """
+        Send everything collected in the output buffer as one frame.
+
+        """
+        if self._outbuf_call:
+            if self._outbuf_call.active():
+                self._outbuf_call.cancel()
+            self._outbuf_call = None
+        if not self._outbuf:
+            return
+        buf, self._outbuf, self._outbuf_key = self._outbuf, [], None
+
+        _, textkwargs, options = buf[0]
+        self._send_text([part[0] for part in buf], textkwargs, options)
+
+    def _send_text(self, texts, textkwargs, options):
+        """
+        Send one or more text messages to the portal as a single frame.
+
+        Args:
+            texts (list): Text messages, in order.
+            textkwargs (dict): Keywords of the text outputfunc.
+            options (dict): The options shared by the messages.
+
+        """
+        flags = self.protocol_flags
+        if (
+            _RENDER_ENABLED
+            and self.protocol_key in _RENDER_PROTOCOLS
+            and not options.get("mxp", flags.get("MXP", False))
+        ):
+            ttype = flags.get("TTYPE", False)
+            xterm256 = options.get("xterm256", flags.get("XTERM256", False) if ttype else True)
+            useansi = options.get("ansi", flags.get("ANSI", False) if ttype else True)
+            nocolor = options.get("nocolor", flags.get("NOCOLOR") or not (xterm256 or useansi))
+            screenreader = options.get("screenreader", flags.get("SCREENREADER", False))
+            text = "\n".join(
+                RENDER_CACHE.render(part, screenreader, xterm256, nocolor) for part in texts
+            )
+            options = dict(options, raw=True)
+        else:
+            # close colors between the glued messages, each of them would
+            # have been terminated by the protocol if sent on its own
+            text = "|n\n".join(texts)
+        kwargs = {"text": (text, textkwargs) if textkwargs else text}
+        if options:
+            kwargs["options"] = options
+        super().data_out(**kwargs)
+
+    def at_login(self, account):
+        """
+        Hook called by sessionhandler when the session becomes authenticated.
+
+        Args:
+            account (Account): The account associated with the session.
+
+        """
+        super().at_login(account)
+        ROSTER.add(self)
+
+    def at_sync(self):
+        """
+        This is called whenever a session has been resynced with the
+        portal, for example after a server reload.
+
+        """
+        super().at_sync()
+        if self.logged_in:
+            ROSTER.add(self)
+
+    def at_disconnect(self, reason=None):
+        """
+        Hook called by sessionhandler at disconnection. Makes sure
+        buffered output reaches the client before the connection is
+        closed.
+
+        Args:
+            reason (str): Reason for disconnecting.
+
+        """
+        self.flush_output()
+        ROSTER.remove(self)
+        super().at_disconnect(reason=reason)
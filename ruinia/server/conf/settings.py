@@ -25,6 +25,7 @@ put secret game- or server-specific settings in secret_settings.py.
 """
 
 # Use the defaults from Evennia unless explicitly overridden
+import os
 import time
 from datetime import datetime
 from evennia.settings_default import *
@@ -39,6 +40,66 @@ DEBUG = True
 SERVERNAME = "Ruinia"
 GAME_SLOGAN = "На стадии разработки"
 
+# Use the session class from server/conf/serversession.py
+SERVER_SESSION_CLASS = "server.conf.serversession.ServerSession"
+
+# Base class of all game commands. commands.command.MuxCommand is Evennia's
+# MuxCommand on top of our Command, so the profiler hooks see every command.
+COMMAND_DEFAULT_CLASS = "commands.command.MuxCommand"
+
+# Matches command names with a prefix trie per merged cmdset instead of
+# checking every key and alias (server/conf/cmdparser.py).
+COMMAND_PARSER = "server.conf.cmdparser.cmdparser"
+
+# Search results and multimatches in Russian (server/conf/at_search.py).
+# Several matches are listed and picked as "2-меч". Evennia's object_search
+# only reads the name group and the command parser adds name and args, so
+# name takes the whole rest ("2-ржавый меч") and args is always empty.
+SEARCH_AT_RESULT = "server.conf.at_search.at_search_result"
+SEARCH_MULTIMATCH_REGEX = r"(?P<number>[0-9]+)-(?P<name>.*)(?P<args>)"
+SEARCH_MULTIMATCH_TEMPLATE = " {number}-{name}{aliases}{info}\n"
+
+######################################################################
+# Session output
+######################################################################
+
+# Text sent to a session within this many seconds is glued into a single
+# frame before it goes to the portal. 0 batches everything produced during
+# one reactor tick, None turns batching off.
+SESSION_OUTPUT_BATCH_WINDOW = 0.0
+# Flush the batch right away when it holds this many messages.
+SESSION_OUTPUT_BATCH_MAX = 50
+# Number of rendered texts (keyed by markup and color/screenreader flags)
+# kept for telnet/ssh sessions. 0 leaves all rendering to the portal.
+SESSION_RENDER_CACHE_SIZE = 2000
+
+######################################################################
+# Login and account creation
+######################################################################
+
+# Password hashing for logins and account creation runs in a thread pool
+# of this size so that it does not block the game (world/auth.py). The
+# first hasher takes the results computed there; it writes and reads
+# the same pbkdf2_sha256 hashes as Django's default one, which must not
+# be listed as well.
+AUTH_POOL_SIZE = 4
+PASSWORD_HASHERS = [
+    "world.auth.PoolPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+# Attempts waiting in (or running on) the pool before new ones are refused.
+AUTH_QUEUE_MAX = 200
+# Token buckets for connect/create attempts: (attempts per minute, burst).
+# None disables the throttle. The load tests in benchmarks/ stay under
+# these by spreading clients over many loopback addresses and accounts.
+AUTH_THROTTLE_IP = (10, 20)
+AUTH_THROTTLE_ACCOUNT = (5, 5)
+# Connection screens with {online}/{gametime} fields (or built by a
+# connection_screen() function) are rebuilt at most this often, in seconds.
+CONNECTION_SCREEN_REFRESH = 10
+
 
 ######################################################################
 # Evennia WIKI
@@ -56,19 +117,33 @@ INSTALLED_APPS += (
     'wiki.plugins.macros.apps.MacrosConfig',
 )
 
+INSTALLED_APPS += ('web.wikicache',)
+MIDDLEWARE = list(MIDDLEWARE) + ['web.wikicache.middleware.RequestMemoMiddleware']
+
 # Disable wiki handling of login/signup
 WIKI_ACCOUNT_HANDLING = False
 WIKI_ACCOUNT_SIGNUP_ALLOWED = False
 
+# Rendered article content is cached per article revision; a new revision
+# gets a new cache key, so the timeout only bounds memory use.
+WIKI_CACHE_TIMEOUT = 24 * 3600
+# Create all image thumbnails right after an upload instead of on first view.
+WIKI_PREGENERATE_THUMBNAILS = True
+
 # In server/conf/settings.py
 # ...
+# The permission callbacks are memoised per user for the duration of a
+# request, see web/wikicache/memo.py.
+from web.wikicache.memo import per_request
 
 
+@per_request
 def is_superuser(article, user):
     """Return True if user is a superuser, False otherwise."""
     return not user.is_anonymous and user.is_superuser
 
 
+@per_request
 def is_builder(article, user):
     """Return True if user is a builder, False otherwise."""
     return not user.is_anonymous and user.locks.check_lockstring(user, "perm(Builders)")
@@ -96,9 +171,42 @@ WIKI_CAN_WRITE = is_builder
 # Who can read articles?
 WIKI_CAN_READ = is_anyone
 
+# Directories with org files of the world lore, searchable with
+# `справка/искать`, and how often, in seconds, a search checks them for
+# changed files.
+LORE_DIRS = [os.path.join(os.path.dirname(GAME_DIR), "info")]
+LORE_REFRESH_INTERVAL = 60
+
+# Static world map tiles for the website (served from MEDIA_URL) and how
+# often, in seconds, changed tiles are re-exported.
+WORLDMAP_EXPORT_DIR = os.path.join(MEDIA_ROOT, "worldmap")
+WORLDMAP_EXPORT_INTERVAL = 600
+
+# Cache warm-up at server start (world/warmup.py) preloads the rooms where
+# players were in the last WARMUP_RECENT_DAYS days, at most WARMUP_ROOM_LIMIT.
+WARMUP_RECENT_DAYS = 7
+WARMUP_ROOM_LIMIT = 2000
+
+# Where the command profiler (`профайлер`, world/profiler.py) writes its
+# folded stacks for flamegraph.pl/speedscope, and its default run length
+# and sampling period in seconds.
+PROFILER_DUMP_DIR = os.path.join(GAME_DIR, "server", "logs", "profiles")
+PROFILER_DEFAULT_DURATION = 60
+PROFILER_SAMPLE_INTERVAL = 0.005
+
+# Addresses allowed to scrape the command metrics at /metrics (Prometheus
+# text format, see world/metrics.py and server/conf/web_plugins.py).
+METRICS_ALLOWED_IPS = ("127.0.0.1", "::1")
+
+# How many merged cmdsets to keep (world/cmdset_cache.py); every command
+# merges the session, account, character, room and exit cmdsets again
+# and these rarely change between two commands. 0 turns the cache off.
+CMDSET_MERGE_CACHE_SIZE = 4096
+
 # Connect custom apps
 # INSTALLED_APPS.append('web.character')
 INSTALLED_APPS += ('web.character',)
+INSTALLED_APPS += ('web.api',)
 
 # Time
 start = datetime(4000, 1, 1)
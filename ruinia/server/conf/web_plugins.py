@@ -1,6 +1,37 @@
 """
 Web plugin hooks.
 """
+from django.conf import settings
+from twisted.web import resource
+
+
+class MetricsResource(resource.Resource):
+    """
+    Command metrics (world/metrics.py) in the Prometheus text format.
+    Only answers to the addresses in `settings.METRICS_ALLOWED_IPS`.
+    """
+
+    isLeaf = True
+
+    @staticmethod
+    def client_ip(request):
+        """
+        The address of the client, looking behind the portal's proxy.
+        """
+        host = request.getClientAddress().host
+        forwarded = request.getHeader(b"x-forwarded-for")
+        if forwarded and host in settings.UPSTREAM_IPS:
+            host = forwarded.decode("latin-1").split(",")[-1].strip()
+        return host
+
+    def render_GET(self, request):
+        if self.client_ip(request) not in settings.METRICS_ALLOWED_IPS:
+            request.setResponseCode(403)
+            return b""
+        from world.metrics import prometheus_text
+
+        request.setHeader(b"Content-Type", b"text/plain; version=0.0.4; charset=utf-8")
+        return prometheus_text().encode("utf-8")
 
 
 def at_webserver_root_creation(web_root):
@@ -25,6 +56,7 @@ def at_webserver_root_creation(web_root):
         web_root.putChild("mypage", my_page)
 
     """
+    web_root.putChild(b"metrics", MetricsResource())
     return web_root
 
 
@@ -0,0 +1,29 @@
+"""
+Settings for a synthetic test world
+
+The game's normal settings with their own SQLite database, so that a
+world generated by `world/worldgen.py` (possibly 100 000 rooms) never
+ends up in the game's database:
+
+    evennia --settings worldgen_settings.py migrate
+    evennia --settings worldgen_settings.py shell
+    >>> from world import worldgen
+    >>> worldgen.generate(320, 320, levels=2, seed=42)
+
+A test server for the load tools in benchmarks/ runs on the same
+database with `evennia --settings worldgen_settings.py start`.
+"""
+import os
+
+from server.conf.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(GAME_DIR, "server", "worldgen.db3"),  # noqa: F405
+        "USER": "",
+        "PASSWORD": "",
+        "HOST": "",
+        "PORT": "",
+    }
+}
@@ -23,6 +23,141 @@ several more options for customizing the Guest account system.
 """
 
 from evennia import DefaultAccount, DefaultGuest
+from evennia.utils import utils
+from evennia.utils.utils import lazy_property
+
+
+class PlayableCharacterHandler(object):
+    """
+    Cached access to an account's playable characters.
+
+    The list is stored in the `_playable_characters` Attribute as
+    before, but is only unpickled when it changes: the resolved list and
+    a `{lowercased key: [character, ...]}` map are kept in
+    `account.ndb._playable`. References to characters deleted behind
+    our back are skipped right away and scrubbed from the Attribute in
+    the background.
+
+    """
+
+    def __init__(self, account):
+        self.account = account
+
+    def _load(self):
+        """
+        Get the cached `(characters, keys, namemap)`, rebuilding what
+        is stale.
+
+        """
+        cache = self.account.ndb._playable
+        if cache is None:
+            stored = self.account.db._playable_characters or []
+            characters = [char for char in stored if char]
+            if len(characters) != len(stored):
+                utils.delay(0, self._cleanup)
+            cache = (characters, None, None)
+        characters, keys, namemap = cache
+        if any(not char.pk for char in characters):
+            characters = [char for char in characters if char.pk]
+            utils.delay(0, self._cleanup)
+        # keys are checked on every call so renames show up at once
+        current = tuple(char.db_key for char in characters)
+        if current != keys:
+            namemap = {}
+            for char in characters:
+                namemap.setdefault(utils.to_str(char.db_key.lower()), []).append(char)
+        cache = (characters, current, namemap)
+        self.account.ndb._playable = cache
+        return cache
+
+    def _cleanup(self):
+        """
+        Remove references to deleted characters from the Attribute.
+
+        """
+        stored = self.account.db._playable_characters
+        if stored and any(not char or not char.pk for char in stored):
+            self.account.db._playable_characters = [
+                char for char in stored if char and char.pk
+            ]
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Drop the cache, it is rebuilt on next access.
+
+        """
+        self.account.ndb._playable = None
+
+    def all(self):
+        """
+        Returns:
+            characters (list): The playable characters.
+
+        """
+        return list(self._load()[0])
+
+    def search(self, name):
+        """
+        Find playable characters by exact, case-insensitive key.
+
+        Args:
+            name (str): The character name.
+
+        Returns:
+            characters (list): All playable characters with that name.
+
+        """
+        return list(self._load()[2].get(name.lower(), ()))
+
+    def get(self, name):
+        """
+        Get a single playable character by exact, case-insensitive key.
+
+        Args:
+            name (str): The character name.
+
+        Returns:
+            character (Object or None): The character, the last one added
+                if there are several of the same name.
+
+        """
+        match = self._load()[2].get(name.lower())
+        return match[-1] if match else None
+
+    def add(self, character):
+        """
+        Add a character to the playable list.
+
+        Args:
+            character (Object): The character to add.
+
+        """
+        stored = self.account.db._playable_characters
+        if stored is None:
+            self.account.db._playable_characters = [character]
+        else:
+            stored.append(character)
+        self.invalidate()
+
+    def remove(self, character):
+        """
+        Remove a character from the playable list.
+
+        Args:
+            character (Object): The character to remove.
+
+        """
+        self.account.db._playable_characters = [
+            char for char in self.account.db._playable_characters or [] if char != character
+        ]
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._load()[0])
+
+    def __contains__(self, character):
+        return character in self._load()[0]
 
 
 class Account(DefaultAccount):
@@ -92,7 +227,9 @@ class Account(DefaultAccount):
 
     """
 
-    pass
+    @lazy_property
+    def playable(self):
+        return PlayableCharacterHandler(self)
 
 
 class Guest(DefaultGuest):
@@ -101,4 +238,6 @@ class Guest(DefaultGuest):
     characters are deleted after disconnection.
     """
 
-    pass
+    @lazy_property
+    def playable(self):
+        return PlayableCharacterHandler(self)
@@ -7,8 +7,13 @@ is setup to be the "default" character type created by the default
 creation commands.
 
 """
+from django.conf import settings
 from evennia import DefaultCharacter
-from evennia.utils.utils import make_iter
+from evennia.utils.utils import make_iter, variable_from_module
+from world import local_search
+from world.roster import ROSTER
+
+_AT_SEARCH_RESULT = variable_from_module(*settings.SEARCH_AT_RESULT.rsplit(".", 1))
 
 
 class Character(DefaultCharacter):
@@ -289,6 +294,91 @@ class Character(DefaultCharacter):
         destination.msg_contents(string, exclude=(
             self,), from_obj=self, mapping=mapping)
 
+    def search(
+        self,
+        searchdata,
+        global_search=False,
+        use_nicks=True,
+        typeclass=None,
+        location=None,
+        attribute_name=None,
+        quiet=False,
+        exact=False,
+        candidates=None,
+        nofound_string=None,
+        multimatch_string=None,
+        use_dbref=None,
+    ):
+        """
+        Search for an object. Plain name searches in the room and the
+        inventory (or the given `location`) are resolved from the
+        in-memory name index of `world.local_search` without querying
+        the database; everything else (global, typeclass, attribute,
+        custom candidates and #dbref searches) goes to Evennia.
+        """
+        if (
+            not global_search
+            and typeclass is None
+            and attribute_name is None
+            and candidates is None
+            and isinstance(searchdata, str)
+        ):
+            query = searchdata
+            if use_nicks:
+                query = self.nicks.nickreplace(
+                    query, categories=("object", "account"), include_account=True
+                )
+            plain = query.strip().lstrip("#")
+            if plain and not plain.isdigit() and plain.lower() not in ("here", "me", "self"):
+                if location:
+                    containers, extra = make_iter(location), ()
+                elif self.location:
+                    containers, extra = (self, self.location), (self.location,)
+                else:
+                    containers, extra = (self,), (self,)
+                results = local_search.search(query, containers, extra, exact=exact)
+                if quiet:
+                    return results
+                return _AT_SEARCH_RESULT(
+                    results,
+                    self,
+                    query=query,
+                    nofound_string=nofound_string,
+                    multimatch_string=multimatch_string,
+                )
+        return super().search(
+            searchdata,
+            global_search=global_search,
+            use_nicks=use_nicks,
+            typeclass=typeclass,
+            location=location,
+            attribute_name=attribute_name,
+            quiet=quiet,
+            exact=exact,
+            candidates=candidates,
+            nofound_string=nofound_string,
+            multimatch_string=multimatch_string,
+            use_dbref=use_dbref,
+        )
+
+    def at_post_puppet(self, **kwargs):
+        """
+        Called just after puppeting has been completed and all
+        Account<->Object links have been established. Updates the
+        online roster.
+        """
+        super().at_post_puppet(**kwargs)
+        for session in self.sessions.all():
+            ROSTER.update(session)
+
+    def at_post_unpuppet(self, account, session=None, **kwargs):
+        """
+        Called just after the Account successfully disconnected from
+        this object. Updates the online roster.
+        """
+        super().at_post_unpuppet(account, session=session, **kwargs)
+        ROSTER.update(session)
+
     #
     # FOR PORTAL
     #
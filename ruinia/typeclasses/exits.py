@@ -7,6 +7,7 @@ for allowing Characters to traverse the exit to its destination.
 
 """
 from evennia import DefaultExit
+from world import exit_cmdsets
 
 
 class Exit(DefaultExit):
@@ -33,6 +34,27 @@ class Exit(DefaultExit):
         at_failed_traverse(traveller) - called by at_traverse if traversal failed for some reason. Will
                                         not be called if the attribute `err_traverse` is
                                         defined, in which case that will simply be echoed.
+
+    In rooms that merge exit cmdsets (`Room.merges_exit_cmdsets`) the exit
+    does not get a cmdset of its own; its command is part of the room's
+    cached exit cmdset instead (see `world/exit_cmdsets.py`).
     """
 
-    pass
+    def at_cmdset_get(self, **kwargs):
+        """
+        Called by the command handler when the exit's cmdset is needed.
+
+        Keyword Args:
+            force_init (bool): The exit changed (e.g. new aliases), rebuild
+                its command.
+
+        """
+        location = self.location
+        if getattr(location, "merges_exit_cmdsets", False) and exit_cmdsets.mergeable(self):
+            if "force_init" in kwargs:
+                exit_cmdsets.invalidate(location.id)
+            if self.cmdset.has_cmdset("ExitCmdSet", must_be_default=True):
+                # left over from before the exit came to this room
+                self.cmdset.remove_default()
+            return
+        super().at_cmdset_get(**kwargs)
@@ -13,6 +13,7 @@ from evennia.utils.utils import list_to_string
 
 from collections import defaultdict
 
+from world import exit_cmdsets
 from world.map import Map
 
 
@@ -23,10 +24,27 @@ class Room(DefaultRoom):
     add locks so they cannot be puppeted or picked up.
     (to change that, use at_object_creation instead)
 
+    The commands of the room's exits are kept in one cached cmdset on
+    the room itself, see `world/exit_cmdsets.py`.
+
     See examples/object.py for a list of
     properties and methods available on all Objects.
     """
 
+    # exits in this room leave their commands to the room (see Exit)
+    merges_exit_cmdsets = True
+
+    def at_cmdset_get(self, **kwargs):
+        """
+        Called by the command handler before it reads the room's cmdsets.
+        Makes sure the merged exit cmdset is up to date.
+
+        Keyword Args:
+            force_init (bool): Rebuild the exit cmdset.
+
+        """
+        exit_cmdsets.ensure(self, force="force_init" in kwargs)
+
     def return_appearance(self, looker):
 
         # Получаем значение игрового времени
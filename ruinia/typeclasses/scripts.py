@@ -12,7 +12,11 @@ just overloads its hooks to have it perform its function.
 
 """
 
+from django.conf import settings
+from twisted.internet import threads
 from evennia import DefaultScript
+from evennia.utils import logger
+from world import mapexport
 
 
 class Script(DefaultScript):
@@ -90,3 +94,29 @@ class Script(DefaultScript):
     """
 
     pass
+
+
+class MapExportScript(Script):
+    """
+    Periodically exports the world map to static files for the website,
+    see `world.mapexport`. The export reads the database in a worker
+    thread so the game does not stall on large worlds.
+    """
+
+    def at_script_creation(self):
+        self.key = "map_export"
+        self.desc = "Exports the world map for the website"
+        self.interval = settings.WORLDMAP_EXPORT_INTERVAL
+        self.persistent = True
+
+    def at_repeat(self):
+        if self.ndb.running:
+            return
+        self.ndb.running = True
+        deferred = threads.deferToThread(mapexport.export)
+        deferred.addErrback(lambda failure: logger.log_err(str(failure)))
+        deferred.addBoth(self._done)
+
+    def _done(self, result):
+        self.ndb.running = False
+        return result
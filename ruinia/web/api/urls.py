@@ -0,0 +1,11 @@
+# URL patterns for the read-only world API
+
+from django.conf.urls import url
+from web.api import views
+
+urlpatterns = [
+    url(r'^characters/$', views.characters, name="api-characters"),
+    url(r'^characters/(?P<object_id>\d+)/$', views.character, name="api-character"),
+    url(r'^rooms/(?P<x>-?\d+)/(?P<y>-?\d+)/(?P<z>-?\d+)/$', views.room_at, name="api-room-at"),
+    url(r'^map/$', views.map_region, name="api-map"),
+]
@@ -0,0 +1,175 @@
+"""
+Read-only JSON API for external tools (map viewers, the wiki).
+
+All views answer GET only. Characters can be fetched one by one or in
+bulk with `?ids=1,2,3`; rooms are looked up by coordinates through the
+in-memory coordinate index, and map regions are streamed row by row so
+a large bounding box never has to be built in memory.
+"""
+import json
+
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from evennia.objects.models import ObjectDB
+from evennia.utils.utils import inherits_from
+
+from web.character.views import character_data
+from world import coords
+
+# most characters returned by one bulk request
+BULK_MAX = 100
+# widest map region (in rooms along each side) served by one request
+MAP_MAX_SIDE = 512
+# rooms fetched from the database per query while streaming a map region
+MAP_CHUNK = 500
+
+_JSON_PARAMS = {"ensure_ascii": False}
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=_JSON_PARAMS)
+
+
+def _character_json(character):
+    data = character_data(character)
+    data["characteristic"] = dict(data["characteristic"])
+    data["attainments"] = {
+        name: {"modifier": modifier, "proficient": proficient}
+        for name, modifier, proficient in data["attainments"]
+    }
+    return data
+
+
+def _fetch_characters(ids):
+    found = ObjectDB.objects.filter(id__in=ids).prefetch_related("db_attributes")
+    return {
+        obj.id: obj for obj in found if inherits_from(obj, settings.BASE_CHARACTER_TYPECLASS)
+    }
+
+
+def _sector_types(room_ids):
+    """Map room ids to their `sector_type` Attribute in one query."""
+    through = ObjectDB.db_attributes.through
+    return dict(
+        through.objects.filter(
+            objectdb_id__in=room_ids,
+            attribute__db_key="sector_type",
+            attribute__db_category__isnull=True,
+        ).values_list("objectdb_id", "attribute__db_value")
+    )
+
+
+@require_GET
+def character(request, object_id):
+    found = _fetch_characters([int(object_id)])
+    if not found:
+        raise Http404(f"Персонаж с индентификатором #{object_id} не найден.")
+    return _json(_character_json(found[int(object_id)]))
+
+
+@require_GET
+def characters(request):
+    """
+    Bulk character lookup: `?ids=1,2,3`.
+    """
+    try:
+        ids = [int(part) for part in request.GET.get("ids", "").split(",") if part.strip()]
+    except ValueError:
+        return _json({"error": "ids должен быть списком чисел через запятую."}, status=400)
+    if not ids:
+        return _json({"error": "Не указан параметр ids."}, status=400)
+    if len(ids) > BULK_MAX:
+        return _json({"error": f"Не больше {BULK_MAX} персонажей за запрос."}, status=400)
+
+    found = _fetch_characters(ids)
+    return _json(
+        {
+            "characters": [_character_json(found[obj_id]) for obj_id in ids if obj_id in found],
+            "missing": [obj_id for obj_id in ids if obj_id not in found],
+        }
+    )
+
+
+@require_GET
+def room_at(request, x, y, z):
+    x, y, z = int(x), int(y), int(z)
+    room_id = coords.room_id_at(x, y, z)
+    room = ObjectDB.objects.filter(id=room_id).first() if room_id else None
+    if not room:
+        raise Http404(f"Нет локации в точке ({x}, {y}, {z}).")
+
+    exits = ObjectDB.objects.filter(
+        db_location_id=room.id, db_destination__isnull=False
+    ).values_list("db_key", "db_destination_id")
+    return _json(
+        {
+            "id": room.id,
+            "key": room.db_key,
+            "desc": room.attributes.get("desc") or "",
+            "coords": [x, y, z],
+            "sector_type": room.attributes.get("sector_type"),
+            "exits": [
+                {
+                    "key": key,
+                    "destination": dest_id,
+                    "coords": list(coords.coords_of(dest_id) or ()) or None,
+                }
+                for key, dest_id in exits
+            ],
+        }
+    )
+
+
+def _stream_map(tiles, box):
+    yield '{"box": %s, "tiles": [' % json.dumps(box)
+    first = True
+    for start in range(0, len(tiles), MAP_CHUNK):
+        chunk = tiles[start : start + MAP_CHUNK]
+        room_ids = [room_id for _, room_id in chunk]
+        names = dict(ObjectDB.objects.filter(id__in=room_ids).values_list("id", "db_key"))
+        sectors = _sector_types(room_ids)
+        parts = []
+        for (x, y, _), room_id in chunk:
+            if room_id not in names:
+                continue
+            parts.append(
+                json.dumps(
+                    {
+                        "x": x,
+                        "y": y,
+                        "id": room_id,
+                        "key": names[room_id],
+                        "sector_type": sectors.get(room_id),
+                    },
+                    **_JSON_PARAMS,
+                )
+            )
+        if parts:
+            yield ("" if first else ",") + ",".join(parts)
+            first = False
+    yield "]}"
+
+
+@require_GET
+def map_region(request):
+    """
+    Map tiles in a bounding box: `?x0=&y0=&x1=&y1=&z=`.
+
+    Tiles come ordered north to south, west to east, and the response
+    is streamed in chunks of `MAP_CHUNK` rooms.
+    """
+    try:
+        x0, y0, x1, y1 = (int(request.GET[key]) for key in ("x0", "y0", "x1", "y1"))
+        z = int(request.GET.get("z", 0))
+    except (KeyError, ValueError):
+        return _json({"error": "Нужны целые параметры x0, y0, x1, y1 и z."}, status=400)
+    if abs(x1 - x0) >= MAP_MAX_SIDE or abs(y1 - y0) >= MAP_MAX_SIDE:
+        return _json({"error": f"Сторона области не больше {MAP_MAX_SIDE}."}, status=400)
+
+    box = {"x0": min(x0, x1), "y0": min(y0, y1), "x1": max(x0, x1), "y1": max(y0, y1), "z": z}
+    tiles = coords.rooms_in_box(x0, y0, x1, y1, z)
+    return StreamingHttpResponse(
+        _stream_map(tiles, box), content_type="application/json; charset=utf-8"
+    )
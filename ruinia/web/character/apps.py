@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CharacterConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'web.character'
+
+    def ready(self):
+        # connects the signals that keep the cached character sheets fresh
+        from web.character import views  # noqa: F401
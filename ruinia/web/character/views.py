@@ -1,18 +1,150 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
 from django.http import Http404
 from django.shortcuts import render
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.template.loader import render_to_string
+from django.views.decorators.http import condition
 
-from evennia.utils.search import object_search
+from evennia.objects.models import ObjectDB
+from evennia.typeclasses.attributes import Attribute
 from evennia.utils.utils import inherits_from
 
+# the sheet of a character (data, rendered body, ETag and modification
+# time) is kept this long (seconds) in the Django cache; the signal
+# handlers below drop it as soon as anything it shows changes, so
+# requests for an unchanged sheet never touch the game database
+SHEET_CACHE_TIMEOUT = 3600
+# Attributes the sheet shows
+SHEET_ATTRIBUTES = ("desc", "level", "characteristic", "attainments")
+
+
+def _cache_key(object_id):
+    return "character_sheet:%s" % object_id
+
+
+def character_data(character):
+    """
+    Everything the character sheet shows, as plain data.
+
+    Args:
+        character (Character): The character, best fetched with its
+            `db_attributes` prefetched.
+
+    Returns:
+        sheet (dict): `id`, `name`, `desc`, `level`, `characteristic` as a
+            sorted list of `(name, value)` and `attainments` as a sorted
+            list of `(name, modifier, proficient)`.
+
+    """
+    attrs = {
+        attr.db_key: attr.value for attr in character.db_attributes.all() if not attr.db_category
+    }
+    return {
+        "id": character.id,
+        "name": character.db_key,
+        "desc": attrs.get("desc") or "",
+        "level": attrs.get("level"),
+        "characteristic": sorted((attrs.get("characteristic") or {}).items()),
+        "attainments": sorted(
+            (name, values.get("модификатор", 0), values.get("владение", False))
+            for name, values in (attrs.get("attainments") or {}).items()
+        ),
+    }
+
+
+def _sheet_data(request, object_id):
+    """
+    Get the cached sheet of a character, building it on a miss.
+
+    A miss costs a single pk query with the Attributes prefetched and
+    one template render; the entry then serves both the
+    conditional-request checks and the view until the character
+    changes. It is stashed on the request since those need it too.
+    """
+    data = getattr(request, "_character_sheet", None)
+    if data is not None:
+        return data
+
+    cache_key = _cache_key(object_id)
+    data = cache.get(cache_key)
+    if data is None:
+        try:
+            character = ObjectDB.objects.prefetch_related("db_attributes").get(id=object_id)
+        except ObjectDB.DoesNotExist:
+            raise Http404(f"Персонаж с индентификатором #{object_id} не найден.")
+        if not inherits_from(character, settings.BASE_CHARACTER_TYPECLASS):
+            raise Http404(f"Персонаж с индентификатором #{object_id} не найден."
+                          "Найден другой объект с указанным идентификатором.")
+
+        sheet = character_data(character)
+        data = {
+            "sheet": sheet,
+            "fingerprint": hashlib.sha1(repr(sorted(sheet.items())).encode("utf-8")).hexdigest(),
+            "modified": time.time(),
+            "body": render_to_string('character/sheet_body.html', {'sheet': sheet}),
+        }
+        cache.set(cache_key, data, SHEET_CACHE_TIMEOUT)
+
+    request._character_sheet = data
+    return data
+
 
+def _sheet_etag(request, object_id):
+    # the page around the sheet depends on who is logged in
+    data = _sheet_data(request, object_id)
+    return "%s-%s" % (data["fingerprint"], request.user.pk or 0)
+
+
+def _sheet_last_modified(request, object_id):
+    return datetime.fromtimestamp(int(_sheet_data(request, object_id)["modified"]), timezone.utc)
+
+
+@condition(etag_func=_sheet_etag, last_modified_func=_sheet_last_modified)
 def sheet(request, object_id):
-    object_id = '#' + object_id
-    try:
-        character = object_search(object_id)[0]
-    except IndexError:
-        raise Http404(f"Персонаж с индентификатором {object_id} не найден.")
-    if not inherits_from(character, settings.BASE_CHARACTER_TYPECLASS):
-        raise Http404(f"Персонаж с индентификатором {object_id} не найден."
-                      "Найден другой объект с указанным идентификатором.")
-    return render(request, 'character/sheet.html', {'character': character})
+    data = _sheet_data(request, object_id)
+    return render(request, 'character/sheet.html', {'sheet': data["sheet"], 'sheet_body': data["body"]})
+
+
+def _invalidate(object_ids):
+    cache.delete_many([_cache_key(object_id) for object_id in object_ids])
+
+
+def _object_changed(sender, instance, update_fields=None, **kwargs):
+    # renamed, retyped or deleted; moves only save db_location
+    if isinstance(instance, ObjectDB) and not (
+        update_fields and not {"db_key", "db_typeclass_path"} & set(update_fields)
+    ):
+        _invalidate([instance.id])
+
+
+def _attribute_changed(sender, instance, **kwargs):
+    # the owner is only known through the m2m table, so look it up only
+    # for the Attributes the sheet shows; before a delete, since the
+    # link is gone afterwards
+    if instance.db_key in SHEET_ATTRIBUTES and not instance.db_category:
+        _invalidate(instance.objectdb_set.values_list("id", flat=True))
+
+
+def _attributes_linked(sender, instance, action, reverse, pk_set, **kwargs):
+    # a new Attribute is saved before it is added to its object
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        _invalidate([instance.id])
+    elif isinstance(instance, Attribute) and instance.db_key in SHEET_ATTRIBUTES:
+        _invalidate(pk_set or instance.objectdb_set.values_list("id", flat=True))
+
+
+# typeclass senders are proxy classes, so no sender for the ObjectDB ones
+post_save.connect(_object_changed, dispatch_uid="character_sheet_object_save")
+post_delete.connect(_object_changed, dispatch_uid="character_sheet_object_delete")
+post_save.connect(_attribute_changed, sender=Attribute, dispatch_uid="character_sheet_attr_save")
+pre_delete.connect(_attribute_changed, sender=Attribute, dispatch_uid="character_sheet_attr_delete")
+m2m_changed.connect(
+    _attributes_linked, sender=ObjectDB.db_attributes.through, dispatch_uid="character_sheet_attr_link"
+)
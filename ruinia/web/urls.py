@@ -14,6 +14,7 @@ from evennia.web.urls import urlpatterns
 custom_patterns = [
     # url(r'/desired/url/', view, name='example'),
     url(r'^character/', include('web.character.urls')),
+    url(r'^api/world/', include('web.api.urls')),
     url('notifications/', include('django_nyt.urls')),
     url('wiki/', include('wiki.urls'), name='wiki')
 ]
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class WikicacheConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'web.wikicache'
+
+    def ready(self):
+        from web.wikicache import thumbnails
+
+        thumbnails.connect()
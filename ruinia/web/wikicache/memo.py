@@ -0,0 +1,43 @@
+"""
+Per-request memo for the wiki permission callbacks.
+
+django-wiki calls the `WIKI_CAN_*` callbacks from settings for every
+article and every permission check while rendering a page, and
+`is_builder` runs a lock check each time. The answer only depends on the
+user, so it is remembered for the rest of the request. The memo lives
+in a thread-local and is emptied by `RequestMemoMiddleware` when a
+request starts and ends, since the webserver reuses its threads.
+
+This module is imported from the settings file and so must not import
+anything from Django.
+"""
+import threading
+from functools import wraps
+
+_LOCAL = threading.local()
+
+
+def clear():
+    """Forget everything memoised in this thread."""
+    _LOCAL.memo = {}
+
+
+def per_request(func):
+    """
+    Decorator for `WIKI_CAN_*` callbacks taking `(article, user)`,
+    memoising the result per user for the current request.
+    """
+
+    @wraps(func)
+    def wrapper(article, user):
+        memo = getattr(_LOCAL, "memo", None)
+        if memo is None:
+            memo = _LOCAL.memo = {}
+        key = (func.__name__, None if user.is_anonymous else user.pk)
+        try:
+            return memo[key]
+        except KeyError:
+            result = memo[key] = func(article, user)
+            return result
+
+    return wrapper
@@ -0,0 +1,17 @@
+from web.wikicache import memo
+
+
+class RequestMemoMiddleware:
+    """
+    Empty the wiki permission memo around every request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        memo.clear()
+        try:
+            return self.get_response(request)
+        finally:
+            memo.clear()
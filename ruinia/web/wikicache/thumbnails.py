@@ -0,0 +1,66 @@
+"""
+Thumbnail pregeneration for wiki images.
+
+sorl.thumbnail creates a thumbnail the first time a page asks for it,
+so after a content release the first readers of every lore page wait
+for image resizing. Here all thumbnail sizes of the images plugin are
+generated as soon as an image revision is saved, in a worker thread of
+the webserver process.
+"""
+from django.conf import settings
+from django.db import transaction
+from twisted.internet import reactor, threads
+from evennia.utils import logger
+
+# the options the images plugin passes to {% thumbnail %}; they are part
+# of sorl's cache key, so they must match for the pregenerated files to
+# be found
+THUMBNAIL_OPTIONS = {"upscale": False}
+
+
+def _sizes():
+    from wiki.plugins.images import settings as images_settings
+
+    return [size for size in images_settings.THUMBNAIL_SIZES.values() if size]
+
+
+def pregenerate(revision_id):
+    """
+    Create all thumbnails of one image revision.
+
+    Args:
+        revision_id (int): Id of the `ImageRevision`.
+
+    """
+    from sorl.thumbnail import get_thumbnail
+    from wiki.plugins.images.models import ImageRevision
+
+    revision = ImageRevision.objects.filter(id=revision_id).first()
+    if not revision or not revision.image:
+        return
+    for size in _sizes():
+        try:
+            get_thumbnail(revision.image, size, **THUMBNAIL_OPTIONS)
+        except Exception:
+            logger.log_trace("Could not pregenerate %s thumbnail of %s." % (size, revision.image))
+
+
+def _start(revision_id):
+    deferred = threads.deferToThread(pregenerate, revision_id)
+    deferred.addErrback(lambda failure: logger.log_err(str(failure)))
+
+
+def _revision_saved(sender, instance, created, **kwargs):
+    if not settings.WIKI_PREGENERATE_THUMBNAILS:
+        return
+    revision_id = instance.id
+    # wait for the upload to be committed, then resize off the request thread
+    transaction.on_commit(lambda: reactor.callFromThread(_start, revision_id))
+
+
+def connect():
+    """Hook pregeneration up to image uploads."""
+    from django.db.models.signals import post_save
+    from wiki.plugins.images.models import ImageRevision
+
+    post_save.connect(_revision_saved, sender=ImageRevision, dispatch_uid="wiki_thumbnails")
@@ -0,0 +1,225 @@
+"""
+Вход и регистрация без хеширования пароля в потоке реактора
+
+Хеширование пароля (PBKDF2) занимает десятки миллисекунд, и пока
+`Account.authenticate` или `Account.create` считают его в потоке
+реактора, игра стоит для всех. Сами эти методы работают с базой,
+кешем idmapper, каналами и хуками тайпклассов, и выполнять их вне
+реактора нельзя. Поэтому в отдельный ограниченный пул потоков уходит
+только хеширование: проверка пароля по хешу из базы
+(`check_password`) или новый хеш (`make_password`). Когда результат
+готов, `authenticate`/`create` вызываются в реакторе как обычно, а
+хешер `PoolPBKDF2PasswordHasher` (первый в `PASSWORD_HASHERS`) на
+время этого вызова отдаёт посчитанный в пуле результат вместо того,
+чтобы считать заново.
+
+Перед тем как поставить задачу в пул, попытка проходит через два
+ограничителя (token bucket): по IP и по имени аккаунта. Если очередь
+пула переполнена, попытка сразу отклоняется, чтобы при наплыве
+ботов не копить задачи без конца.
+
+Настройки:
+    AUTH_POOL_SIZE - число потоков пула;
+    AUTH_QUEUE_MAX - сколько попыток может ждать или выполняться сразу;
+    AUTH_THROTTLE_IP, AUTH_THROTTLE_ACCOUNT - пары (попыток в минуту,
+        запас) или None, чтобы отключить ограничитель.
+"""
+import time
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
+from twisted.internet import reactor
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+from evennia.utils import logger
+
+_POOL = None
+_PENDING = 0
+# результаты из пула на время вызова в реакторе:
+# {(пароль, хеш): верен ли пароль} и {пароль: новый хеш}
+_CHECKED = {}
+_HASHED = {}
+# корзины, которые не трогали дольше этого, выбрасываются
+_BUCKET_IDLE = 3600
+
+
+class TokenBucket(object):
+    """
+    Набор корзин токенов, по одной на ключ (IP или имя аккаунта).
+
+    Каждая попытка забирает токен; токены восстанавливаются со
+    скоростью `rate` в минуту, но не больше `burst`.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate / 60.0
+        self.burst = burst
+        self._buckets = {}
+        self._last_cleanup = time.time()
+
+    def consume(self, key):
+        """
+        Забрать токен для ключа.
+
+        Аргументы:
+            key (str): IP или имя аккаунта.
+
+        Возвращает:
+            0, если попытка разрешена, иначе сколько секунд ждать
+            следующего токена.
+        """
+        now = time.time()
+        if now - self._last_cleanup > _BUCKET_IDLE:
+            self._cleanup(now)
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[key] = (tokens - 1, now)
+        return 0
+
+    def _cleanup(self, now):
+        self._buckets = {
+            key: (tokens, last)
+            for key, (tokens, last) in self._buckets.items()
+            if now - last < _BUCKET_IDLE
+        }
+        self._last_cleanup = now
+
+
+def _make_bucket(setting):
+    return TokenBucket(*setting) if setting else None
+
+
+IP_THROTTLE = _make_bucket(settings.AUTH_THROTTLE_IP)
+ACCOUNT_THROTTLE = _make_bucket(settings.AUTH_THROTTLE_ACCOUNT)
+
+
+def throttled(address, name=None):
+    """
+    Проверить ограничители для попытки входа или регистрации.
+
+    Аргументы:
+        address (str or tuple): адрес сессии.
+        name (str, optional): имя аккаунта.
+
+    Возвращает:
+        сколько секунд ждать (округлено вверх), или 0, если можно.
+    """
+    ip = address[0] if isinstance(address, tuple) else str(address)
+    wait = 0
+    if IP_THROTTLE:
+        wait = IP_THROTTLE.consume(ip)
+    if not wait and name and ACCOUNT_THROTTLE:
+        wait = ACCOUNT_THROTTLE.consume(name.lower())
+    return int(wait) + 1 if wait else 0
+
+
+def _get_pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = ThreadPool(minthreads=1, maxthreads=settings.AUTH_POOL_SIZE, name="auth")
+        _POOL.start()
+        reactor.addSystemEventTrigger("before", "shutdown", _POOL.stop)
+    return _POOL
+
+
+def _done(result):
+    global _PENDING
+    _PENDING -= 1
+    return result
+
+
+class PoolPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Обычный PBKDF2, который отдаёт уже посчитанный в пуле результат,
+    если он есть. Алгоритм и формат хеша те же, так что хеши в базе
+    остаются совместимыми.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        encoded = _HASHED.get(password)
+        if encoded is None:
+            return super().encode(password, salt, iterations)
+        return encoded
+
+    def verify(self, password, encoded):
+        valid = _CHECKED.get((password, encoded))
+        if valid is None:
+            return super().verify(password, encoded)
+        return valid
+
+
+def password_hash(username):
+    """
+    Хеш пароля аккаунта (без учёта регистра имени, как у бэкенда
+    авторизации Evennia).
+
+    Аргументы:
+        username (str): имя аккаунта.
+
+    Возвращает:
+        хеш или None, если такого аккаунта нет.
+    """
+    from evennia.accounts.models import AccountDB
+
+    return (
+        AccountDB.objects.filter(username__iexact=username)
+        .values_list("password", flat=True)
+        .first()
+    )
+
+
+def _hash(password, encoded):
+    # в пуле: проверить пароль по хешу, а если хеша нет - посчитать новый
+    # (для регистрации, и для входа под несуществующим именем Django
+    # тоже хеширует пароль, чтобы по времени ответа нельзя было это понять)
+    if encoded:
+        return check_password(password, encoded)
+    return make_password(password)
+
+
+def _call_prepared(result, func, password, encoded, kwargs):
+    if encoded:
+        _CHECKED[(password, encoded)] = result
+    else:
+        _HASHED[password] = result
+    try:
+        return func(password=password, **kwargs)
+    finally:
+        _CHECKED.pop((password, encoded), None)
+        _HASHED.pop(password, None)
+
+
+def run_auth(func, password, encoded=None, **kwargs):
+    """
+    Посчитать хеш пароля в пуле потоков авторизации, а потом вызвать
+    `func` в реакторе.
+
+    Аргументы:
+        func (callable): `Account.authenticate` или `Account.create`.
+        password (str): пароль, передаётся в `func` как `password`.
+        encoded (str, optional): хеш пароля аккаунта из `password_hash`,
+            чтобы проверить пароль; без него в пуле считается новый хеш.
+        **kwargs: остальные аргументы для `func`.
+
+    Возвращает:
+        Deferred с результатом `func` или None, если очередь переполнена.
+    """
+    global _PENDING
+    if _PENDING >= settings.AUTH_QUEUE_MAX:
+        logger.log_warn("Auth queue full (%i pending), rejecting attempt." % _PENDING)
+        return None
+    _PENDING += 1
+    deferred = deferToThreadPool(reactor, _get_pool(), _hash, password, encoded)
+    deferred.addBoth(_done)
+    deferred.addCallback(_call_prepared, func, password, encoded, kwargs)
+    return deferred
+
+
+def pending():
+    """
+    Возвращает:
+        число попыток в очереди и в работе.
+    """
+    return _PENDING
@@ -0,0 +1,136 @@
+"""
+Индекс имён персонажей
+
+`CmdCharCreate` проверял, свободно ли имя, запросом
+`db_key__iexact` по всей таблице объектов, а такой запрос не может
+использовать индекс. Здесь имена всех персонажей базового класса
+(`settings.BASE_CHARACTER_TYPECLASS`) хранятся в памяти в виде
+`casefold()`, так что проверка имени - это поиск в словаре.
+
+Индекс загружается одним запросом при первом обращении и дальше
+обновляется сигналами Django при создании, переименовании, смене
+класса и удалении объектов.
+
+Использование:
+
+    from world import charnames
+    if charnames.name_taken("Асуш"):
+        ...
+    ids = charnames.character_ids("асуш")
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from evennia.objects.models import ObjectDB
+
+_TYPECLASS = settings.BASE_CHARACTER_TYPECLASS
+
+# {имя в casefold: {id, ...}} и обратное {id: имя в casefold}
+_NAMES = None
+_BY_ID = {}
+
+
+def normalize(name):
+    """
+    Привести имя к виду, в котором оно хранится в индексе.
+    """
+    return name.strip().casefold()
+
+
+def _load():
+    global _NAMES
+    if _NAMES is None:
+        names = defaultdict(set)
+        _BY_ID.clear()
+        for objid, key in ObjectDB.objects.filter(db_typeclass_path=_TYPECLASS).values_list(
+            "id", "db_key"
+        ):
+            name = normalize(key)
+            names[name].add(objid)
+            _BY_ID[objid] = name
+        _NAMES = names
+    return _NAMES
+
+
+def _discard(objid):
+    name = _BY_ID.pop(objid, None)
+    if name is not None:
+        ids = _NAMES[name]
+        ids.discard(objid)
+        if not ids:
+            del _NAMES[name]
+
+
+def name_taken(name):
+    """
+    Проверить, есть ли уже персонаж с таким именем (без учёта регистра).
+
+    Аргументы:
+        name (str): имя персонажа.
+
+    Возвращает:
+        True, если имя занято.
+    """
+    return normalize(name) in _load()
+
+
+def character_ids(name):
+    """
+    Найти персонажей по точному имени без учёта регистра.
+
+    Аргументы:
+        name (str): имя персонажа.
+
+    Возвращает:
+        список id персонажей с этим именем.
+    """
+    return sorted(_load().get(normalize(name), ()))
+
+
+def reset():
+    """
+    Сбросить индекс, он будет заново загружен при следующем обращении.
+    """
+    global _NAMES
+    _NAMES = None
+    _BY_ID.clear()
+
+
+def dump_state():
+    """
+    Возвращает:
+        состояние индекса для снимка (`world.snapshot`) или None, если
+        индекс не загружен.
+    """
+    return None if _NAMES is None else (dict(_NAMES), dict(_BY_ID))
+
+
+def restore_state(state):
+    """
+    Восстановить индекс из снимка.
+    """
+    global _NAMES
+    names, by_id = state
+    _NAMES = defaultdict(set, names)
+    _BY_ID.clear()
+    _BY_ID.update(by_id)
+
+
+def _object_saved(sender, instance, **kwargs):
+    if _NAMES is None or not isinstance(instance, ObjectDB):
+        return
+    _discard(instance.id)
+    if instance.db_typeclass_path == _TYPECLASS:
+        name = normalize(instance.db_key)
+        _NAMES[name].add(instance.id)
+        _BY_ID[instance.id] = name
+
+
+def _object_deleted(sender, instance, **kwargs):
+    if _NAMES is not None and isinstance(instance, ObjectDB):
+        _discard(instance.id)
+
+
+# у тайпклассов отправитель сигнала - прокси-класс, поэтому без sender
+post_save.connect(_object_saved, dispatch_uid="charnames_save")
+post_delete.connect(_object_deleted, dispatch_uid="charnames_delete")
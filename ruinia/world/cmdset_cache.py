@@ -0,0 +1,150 @@
+"""
+Кеш слияния наборов команд
+
+Перед каждой командой обработчик команд сливает наборы сессии,
+аккаунта, персонажа, комнаты и предметов вокруг (`CmdSet.__add__`), а
+наборы самого объекта сливаются в `CmdSetHandler.update`. Каждое
+слияние сравнивает команды двух наборов попарно, а наборы персонажа и
+аккаунта - это сотня команд после `remove()`/`add()` в
+`commands/default_cmdsets.py`. При этом от команды к команде наборы
+почти всегда одни и те же.
+
+`install()` оборачивает `CmdSet.__add__`: результат слияния запоминается
+по паре (набор, версия) обоих операндов. Версия набора - счётчик
+вызовов его `add()`/`remove()` плюс настройки, влияющие на слияние
+(`mergetype`, `priority`, `duplicates`, `no_exits` и т.д.), так что
+изменившийся набор даёт новый ключ. Обычный набор опознаётся по номеру
+`_merge_token`, который выдаётся ему при первом слиянии и никогда не
+повторяется (в отличие от `id()`, который после сборки мусора может
+достаться другому набору). Результат слияния каждый раз новый объект,
+поэтому он опознаётся по тому, из чего получен: ключ его слияния лежит
+в `_merge_key`. Так цепочка слияний обработчика команд (сессия +
+аккаунт + персонаж + комната + выходы) целиком попадает в кеш, а не
+только её первый шаг, и ссылки на сами операнды кешу не нужны.
+Записей не больше `settings.CMDSET_MERGE_CACHE_SIZE`, 0 выключает кеш.
+
+Свой кеш `_CMDSET_MERGE_CACHE` в `evennia.commands.cmdhandler` хранит
+результаты только по `id()` наборов и в `WeakValueDictionary`, то есть
+лишь пока результат кому-то нужен, и потому почти не срабатывает.
+
+Вызывающему отдаётся копия результата со своим списком команд: его
+иногда меняют на месте (например `make_unique` в `справка`). Все копии
+одного результата делят словарь `_parse_cache`, где разборщик команд
+(`server/conf/cmdparser.py`) держит построенное по набору дерево имён.
+"""
+import copy
+from collections import OrderedDict
+from itertools import count
+from weakref import WeakKeyDictionary
+from django.conf import settings
+from evennia.commands.cmdset import CmdSet
+
+_ORIGINALS = {}
+_CACHE = OrderedDict()
+# настройки набора, от которых зависит результат слияния
+_MERGE_FIELDS = (
+    "key", "mergetype", "priority", "duplicates", "no_exits", "no_objs", "no_channels",
+)
+STATS = {"hits": 0, "misses": 0}
+_TOKENS = count(1)
+
+
+def _signature(cmdset):
+    origin = cmdset.__dict__.get("_merge_key")
+    if origin is None:
+        origin = cmdset.__dict__.get("_merge_token")
+        if origin is None:
+            origin = cmdset._merge_token = next(_TOKENS)
+    return (
+        origin,
+        cmdset.__dict__.get("_merge_version", 0),
+        tuple(getattr(cmdset, field, None) for field in _MERGE_FIELDS),
+        tuple(sorted(cmdset.key_mergetypes.items())) if cmdset.key_mergetypes else (),
+    )
+
+
+def _copy(cmdset):
+    result = copy.copy(cmdset)
+    result.commands = list(cmdset.commands)
+    result.system_commands = list(cmdset.system_commands)
+    if "_contains_cache" in cmdset.__dict__:
+        result._contains_cache = WeakKeyDictionary()
+    return result
+
+
+def _cached_add(self, cmdset_a):
+    if not isinstance(cmdset_a, CmdSet):
+        return _ORIGINALS["__add__"](self, cmdset_a)
+    key = (_signature(self), _signature(cmdset_a))
+    entry = _CACHE.get(key)
+    if entry is not None:
+        _CACHE.move_to_end(key)
+        STATS["hits"] += 1
+        return _copy(entry)
+    STATS["misses"] += 1
+    result = _ORIGINALS["__add__"](self, cmdset_a)
+    result._merge_key = key
+    result._parse_cache = {}
+    _CACHE[key] = _copy(result)
+    if len(_CACHE) > settings.CMDSET_MERGE_CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return result
+
+
+def _versioned(name):
+    original = _ORIGINALS[name]
+
+    def method(self, *args, **kwargs):
+        self._merge_version = self.__dict__.get("_merge_version", 0) + 1
+        # a changed cmdset is no longer what was merged before
+        self.__dict__.pop("_merge_key", None)
+        self.__dict__.pop("_merge_token", None)
+        self.__dict__.pop("_parse_cache", None)
+        return original(self, *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = original.__doc__
+    return method
+
+
+def install():
+    """
+    Включить кеш. Вызывается из `at_server_start`.
+    """
+    if _ORIGINALS or not settings.CMDSET_MERGE_CACHE_SIZE:
+        return
+    for name in ("__add__", "add", "remove"):
+        _ORIGINALS[name] = getattr(CmdSet, name)
+    CmdSet.add = _versioned("add")
+    CmdSet.remove = _versioned("remove")
+    CmdSet.__add__ = _cached_add
+
+
+def uninstall():
+    """
+    Выключить кеш и вернуть исходные методы `CmdSet`.
+    """
+    for name, method in _ORIGINALS.items():
+        setattr(CmdSet, name, method)
+    _ORIGINALS.clear()
+    clear()
+
+
+def clear():
+    _CACHE.clear()
+
+
+def stats():
+    """
+    Возвращает:
+        размер кеша и счётчики попаданий в том же виде, что
+        `RenderCache.stats()` в `server/conf/serversession.py`.
+    """
+    total = STATS["hits"] + STATS["misses"]
+    return {
+        "size": len(_CACHE),
+        "maxsize": settings.CMDSET_MERGE_CACHE_SIZE,
+        "hits": STATS["hits"],
+        "misses": STATS["misses"],
+        "hitrate": STATS["hits"] / total if total else 0.0,
+    }
@@ -0,0 +1,111 @@
+"""
+Кеш экрана подключения
+
+`CmdUnconnectedLook` при каждом новом подключении заново разбирал
+модуль `settings.CONNECTION_SCREEN_MODULE`, а при отсутствии функции
+`connection_screen()` ещё раз перебирал его ради случайной строки.
+Любой сканер портов, постучавшийся в telnet, оплачивал это целиком.
+
+Здесь экраны читаются из модуля один раз. Строки без полей отдаются
+как есть. В строках можно использовать поля `{online}` (игроков в
+сети) и `{gametime}` (игровое время); такие экраны, как и результат
+функции `connection_screen()`, пересчитываются не чаще, чем раз в
+`settings.CONNECTION_SCREEN_REFRESH` секунд.
+
+Отрисовка цветов для разных клиентов (xterm256, ansi, без цвета,
+читалка с экрана) делается один раз на вариант в общем кеше отрисовки
+сессий (`server.conf.serversession.RENDER_CACHE`), так как текст экрана
+для всех подключений одинаковый.
+"""
+import random
+import re
+import time
+from django.conf import settings
+from evennia.utils import gametime, utils
+
+_REFRESH = settings.CONNECTION_SCREEN_REFRESH
+_RE_FIELD = re.compile(r"\{(online|gametime)\}")
+_MISSING = "No connection screen found. Please contact an admin."
+
+# [(строка или функция, готовый текст, когда пересчитать), ...]
+_SCREENS = None
+
+
+def _load():
+    global _SCREENS
+    if _SCREENS is None:
+        module = settings.CONNECTION_SCREEN_MODULE
+        callables = utils.callables_from_module(module)
+        if "connection_screen" in callables:
+            sources = [callables["connection_screen"]]
+        else:
+            sources = [
+                value for value in utils.all_from_module(module).values() if isinstance(value, str)
+            ]
+        _SCREENS = [
+            [source, source, 0 if callable(source) or _RE_FIELD.search(source) else None]
+            for source in sources
+        ]
+    return _SCREENS
+
+
+def _fields():
+    from evennia.server.sessionhandler import SESSIONS
+
+    seconds = int(gametime.gametime())
+    days, seconds = divmod(seconds, 86400)
+    return {
+        "online": str(SESSIONS.account_count()),
+        "gametime": "день %i, %02i:%02i" % (days + 1, seconds // 3600, seconds % 3600 // 60),
+    }
+
+
+def _render(source):
+    text = source() if callable(source) else source
+    if _RE_FIELD.search(text):
+        fields = _fields()
+        text = _RE_FIELD.sub(lambda match: fields[match.group(1)], text)
+    return text
+
+
+def get_screen():
+    """
+    Возвращает:
+        текст экрана подключения; если в модуле их несколько, случайный.
+    """
+    screens = _load()
+    if not screens:
+        return _MISSING
+    screen = random.choice(screens)
+    expires = screen[2]
+    if expires is not None and expires <= time.time():
+        screen[1] = _render(screen[0])
+        screen[2] = time.time() + _REFRESH
+    return screen[1]
+
+
+def precompute():
+    """
+    Прочитать модуль экранов и отрисовать экраны заранее, включая все
+    варианты цветов в кеше отрисовки сессий. Вызывается при старте
+    сервера.
+    """
+    from server.conf.serversession import RENDER_CACHE
+
+    for screen in _load():
+        if screen[2] is not None:
+            screen[1] = _render(screen[0])
+            screen[2] = time.time() + _REFRESH
+        if RENDER_CACHE.maxsize:
+            # (screenreader, xterm256, nocolor) для обычных клиентов
+            for flags in ((False, True, False), (False, False, False), (False, False, True),
+                          (True, False, True)):
+                RENDER_CACHE.render(screen[1], *flags)
+
+
+def reload():
+    """
+    Перечитать модуль экранов при следующем обращении.
+    """
+    global _SCREENS
+    _SCREENS = None
@@ -0,0 +1,162 @@
+"""
+Индекс координат
+
+Координаты комнат хранятся тегами категорий `coord_x`, `coord_y` и
+`coord_z`, и поиск комнаты по координатам - это три соединения с
+таблицей тегов. Здесь все координаты загружаются одним запросом в
+словари `{(x, y, z): id комнаты}` и `{id комнаты: (x, y, z)}`.
+
+Индекс сбрасывается, когда у комнаты меняются теги или комната
+удаляется, и строится заново при следующем обращении.
+
+Использование:
+
+    from world import coords
+    room_id = coords.room_id_at(0, 0, 0)
+    for (x, y, z), room_id in coords.rooms_in_box(-10, -10, 10, 10, 0):
+        ...
+"""
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete
+from evennia.objects.models import ObjectDB
+from evennia.typeclasses.tags import Tag
+
+_CATEGORIES = ("coord_x", "coord_y", "coord_z")
+
+_BY_COORDS = None
+_BY_ID = None
+
+
+def _load():
+    global _BY_COORDS, _BY_ID
+    if _BY_COORDS is None:
+        parts = {}
+        for room_id, category, key in Tag.objects.filter(
+            db_category__in=_CATEGORIES, db_tagtype=None, objectdb__isnull=False
+        ).values_list("objectdb__id", "db_category", "db_key"):
+            try:
+                parts.setdefault(room_id, [None, None, None])[_CATEGORIES.index(category)] = int(key)
+            except ValueError:
+                continue
+        by_id = {room_id: tuple(xyz) for room_id, xyz in parts.items() if None not in xyz}
+        by_coords = {}
+        for room_id, xyz in sorted(by_id.items()):
+            by_coords.setdefault(xyz, room_id)
+        _BY_COORDS, _BY_ID = by_coords, by_id
+    return _BY_COORDS
+
+
+def preload():
+    """
+    Построить индекс заранее (при старте сервера).
+
+    Возвращает:
+        число комнат с координатами.
+    """
+    _load()
+    return len(_BY_ID)
+
+
+def invalidate(*args, **kwargs):
+    """
+    Сбросить индекс. Принимает любые аргументы, чтобы подходить как
+    обработчик сигналов Django.
+    """
+    global _BY_COORDS, _BY_ID
+    _BY_COORDS = _BY_ID = None
+
+
+def room_id_at(x, y, z):
+    """
+    Аргументы:
+        x (int), y (int), z (int): координаты.
+
+    Возвращает:
+        id комнаты по координатам или None. Если комнат несколько, та, что
+        создана раньше.
+    """
+    return _load().get((x, y, z))
+
+
+def coords_of(room_id):
+    """
+    Возвращает:
+        координаты (x, y, z) комнаты или None.
+    """
+    _load()
+    return _BY_ID.get(room_id)
+
+
+def rooms_in_box(x0, y0, x1, y1, z):
+    """
+    Комнаты в прямоугольнике на одном уровне.
+
+    Аргументы:
+        x0 (int), y0 (int): один угол (включительно).
+        x1 (int), y1 (int): противоположный угол (включительно).
+        z (int): уровень.
+
+    Возвращает:
+        список пар ((x, y, z), id комнаты), по строкам сверху вниз и
+        слева направо.
+    """
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0, y1 = min(y0, y1), max(y0, y1)
+    index = _load()
+    if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(index):
+        found = [
+            ((x, y, z), index[(x, y, z)])
+            for y in range(y1, y0 - 1, -1)
+            for x in range(x0, x1 + 1)
+            if (x, y, z) in index
+        ]
+    else:
+        found = [
+            (xyz, room_id)
+            for xyz, room_id in index.items()
+            if xyz[2] == z and x0 <= xyz[0] <= x1 and y0 <= xyz[1] <= y1
+        ]
+        found.sort(key=lambda item: (-item[0][1], item[0][0]))
+    return found
+
+
+def levels():
+    """
+    Возвращает:
+        отсортированный список уровней z, на которых есть комнаты.
+    """
+    return sorted({xyz[2] for xyz in _load()})
+
+
+def dump_state():
+    """
+    Возвращает:
+        состояние индекса для снимка (`world.snapshot`) или None, если
+        индекс не построен.
+    """
+    return None if _BY_COORDS is None else (_BY_COORDS, _BY_ID)
+
+
+def restore_state(state):
+    """
+    Восстановить индекс из снимка.
+    """
+    global _BY_COORDS, _BY_ID
+    _BY_COORDS, _BY_ID = state
+
+
+def _tags_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    # с обратной стороны (тег.objectdb_set) теги почти не меняют
+    if reverse or instance.is_typeclass(settings.BASE_ROOM_TYPECLASS, exact=False):
+        invalidate()
+
+
+def _object_deleted(sender, instance, **kwargs):
+    if _BY_ID is not None and isinstance(instance, ObjectDB) and instance.id in _BY_ID:
+        invalidate()
+
+
+m2m_changed.connect(_tags_changed, sender=ObjectDB.db_tags.through, dispatch_uid="coords_tags")
+post_delete.connect(_object_deleted, dispatch_uid="coords_delete")
@@ -0,0 +1,120 @@
+"""
+Общий набор команд выходов комнаты
+
+Обычно каждый выход (`DefaultExit`) держит свой набор команд
+`ExitCmdSet` с одной командой, и обработчик команд на каждый ввод
+вызывает `at_cmdset_get` всех выходов в комнате, проверяет на каждом
+блокировку `call` и сливает их наборы с остальными по одному. В
+комнатах, построенных `tunnel`, выходов бывает до 12.
+
+Здесь команды всех выходов комнаты собираются в один `ExitCmdSet`,
+который лежит на самой комнате (`Room.at_cmdset_get`), а выходы своих
+наборов не заводят (`Exit.at_cmdset_get`). Набор строится заново только
+после того, как выход появился в комнате, ушёл из неё, был удалён,
+переименован или получил другие псевдонимы или блокировки: для этого
+у каждой комнаты есть номер версии, который увеличивают сигналы
+Django.
+
+Выходы с собственной блокировкой `call` (видимые не всем) в общий
+набор не попадают и работают по-старому.
+"""
+from collections import defaultdict
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from evennia import CmdSet
+from evennia.objects.models import ObjectDB
+
+_KEY = "ExitCmdSet"
+# блокировки `call`, при которых команда выхода доступна всем
+_OPEN_CALL_LOCKS = ("", "call:true()", "call:all()")
+
+# {id комнаты: версия набора}
+_VERSIONS = defaultdict(int)
+# {id выхода: id комнаты, в чей набор он вошёл}
+_EXIT_ROOM = {}
+
+
+def mergeable(exit_obj):
+    """
+    Проверить, может ли команда выхода лежать в общем наборе комнаты.
+    """
+    return exit_obj.locks.get("call") in _OPEN_CALL_LOCKS
+
+
+def invalidate(room_id):
+    """
+    Пометить набор команд выходов комнаты устаревшим.
+    """
+    _VERSIONS[room_id] += 1
+
+
+def _build(room):
+    exits = [obj for obj in room.exits if mergeable(obj)]
+    if not exits:
+        return None
+    cmdset = CmdSet(None)
+    cmdset.key = _KEY
+    cmdset.priority = exits[0].priority
+    cmdset.duplicates = True
+    seen = set()
+    for exit_obj in exits:
+        _EXIT_ROOM[exit_obj.id] = room.id
+        for cmd in exit_obj.create_exit_cmdset(exit_obj).commands:
+            if cmd.key in seen:
+                # два выхода с одним именем: add() заменил бы первый,
+                # а игроку надо предложить выбор, как раньше
+                cmdset.commands.append(cmd)
+            else:
+                cmdset.add(cmd)
+                seen.add(cmd.key)
+    return cmdset
+
+
+def ensure(room, force=False):
+    """
+    Положить на комнату актуальный набор команд её выходов. Вызывается из
+    `Room.at_cmdset_get`, то есть на каждую команду в комнате.
+
+    Аргументы:
+        room (Room): комната.
+        force (bool): собрать набор заново.
+    """
+    version = _VERSIONS[room.id]
+    if not force and room.ndb._exit_cmdset_version == version:
+        return
+    room.cmdset.remove(_KEY)
+    cmdset = _build(room)
+    if cmdset:
+        room.cmdset.add(cmdset, persistent=False)
+    room.ndb._exit_cmdset_version = version
+
+
+def _object_saved(sender, instance, **kwargs):
+    if not isinstance(instance, ObjectDB):
+        return
+    room_id = _EXIT_ROOM.pop(instance.id, None)
+    if room_id:
+        invalidate(room_id)
+    if instance.db_destination_id and instance.db_location_id:
+        # новый или перенесённый выход
+        invalidate(instance.db_location_id)
+
+
+def _object_deleted(sender, instance, **kwargs):
+    if isinstance(instance, ObjectDB):
+        room_id = _EXIT_ROOM.pop(instance.id, None)
+        if room_id:
+            invalidate(room_id)
+
+
+def _tags_changed(sender, instance, action, reverse, **kwargs):
+    # псевдонимы выходов - это теги
+    if action in ("post_add", "post_remove", "post_clear") and not reverse:
+        room_id = _EXIT_ROOM.get(instance.id)
+        if room_id:
+            invalidate(room_id)
+
+
+# у тайпклассов отправитель сигнала - прокси-класс, поэтому без sender
+post_save.connect(_object_saved, dispatch_uid="exit_cmdsets_save")
+post_delete.connect(_object_deleted, dispatch_uid="exit_cmdsets_delete")
+m2m_changed.connect(_tags_changed, sender=ObjectDB.db_tags.through, dispatch_uid="exit_cmdsets_tags")
@@ -0,0 +1,236 @@
+"""
+Индекс справки
+
+`CmdHelp` при каждом вызове перебирал все записи `HelpEntry`, проверял
+доступ к каждой теме, заново собирал словарь и категории и гонял
+difflib по всему словарю. Этот модуль держит всё это готовым.
+
+Индекс строится один раз на пару (сигнатура набора команд, профиль
+доступа вызывающего) и хранит только строки: ключи команд и тем,
+категории, словарь подсказок, триграммный индекс по нему и уже
+отрисованные списки справки для каждой ширины экрана. Сами объекты
+команд берутся из текущего набора команд по ключу.
+
+Профиль доступа - это права персонажа и его аккаунта плюс флаги
+суперпользователя и quell. Блокировки команд и тем, которые зависят от
+чего-то кроме прав (например `id()`), индекс не различает.
+
+Любое изменение `HelpEntry` (и правка через `sethelp`) сбрасывает индекс
+целиком.
+"""
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from django.db.models.signals import post_delete, post_save
+from evennia.help.models import HelpEntry
+from evennia.utils.utils import string_suggestions
+
+# сколько индексов для разных профилей держать одновременно
+_MAX_INDEXES = 64
+# сколько кандидатов с общими триграммами отдавать difflib
+_MAX_CANDIDATES = 50
+
+_TOPICS = None
+_VERSION = 0
+_INDEXES = OrderedDict()
+
+
+def invalidate(*args, **kwargs):
+    """
+    Сбросить кешированные темы и все индексы. Принимает любые аргументы,
+    чтобы подходить как обработчик сигналов Django.
+    """
+    global _TOPICS, _VERSION
+    _TOPICS = None
+    _VERSION += 1
+    _INDEXES.clear()
+
+
+post_save.connect(invalidate, sender=HelpEntry, dispatch_uid="help_index_save")
+post_delete.connect(invalidate, sender=HelpEntry, dispatch_uid="help_index_delete")
+
+
+def get_topics():
+    """
+    Возвращает:
+        список кортежей (запись, псевдонимы) для всех `HelpEntry`. Псевдонимы
+        загружаются одним запросом для всех записей.
+    """
+    global _TOPICS
+    if _TOPICS is None:
+        aliases = defaultdict(list)
+        through = HelpEntry.db_tags.through
+        for entry_id, alias in through.objects.filter(tag__db_tagtype="alias").values_list(
+            "helpentry_id", "tag__db_key"
+        ):
+            aliases[entry_id].append(alias)
+        _TOPICS = [(entry, aliases[entry.id]) for entry in HelpEntry.objects.all()]
+    return _TOPICS
+
+
+def cmdset_signature(cmdset):
+    """
+    Сигнатура набора команд для справки. Команды без автосправки (например,
+    выходы) в неё не входят, так что переход в соседнюю комнату индекс не
+    сбрасывает.
+    """
+    return frozenset((cmd.key, type(cmd)) for cmd in cmdset if cmd.auto_help)
+
+
+def lock_profile(caller):
+    """
+    Профиль доступа вызывающего: всё, от чего зависят обычные блокировки
+    вида `perm()`/`pperm()`.
+    """
+    account = caller.account if hasattr(caller, "db_account") else caller
+    perms = tuple(sorted(caller.permissions.all()))
+    account_perms = tuple(sorted(account.permissions.all())) if account else ()
+    quelled = bool(account and account.attributes.has("_quell"))
+    return (type(caller), caller.is_superuser, quelled, perms, account_perms)
+
+
+def _trigrams(word):
+    word = "  %s " % word.lower()
+    return {word[i : i + 3] for i in range(len(word) - 2)}
+
+
+class HelpIndex(object):
+    """
+    Всё, что нужно `CmdHelp` для одного профиля доступа.
+
+    Атрибуты:
+        commands (set): ключи команд, справку по которым можно смотреть.
+        cmd_names (dict): `{имя или псевдоним: {ключ команды, ...}}`, имена
+            без игнорируемых префиксов тоже включены.
+        cmd_listing (dict): `{категория: [ключ для показа, ...]}` команд,
+            которые показываются в списке.
+        topics (dict): `{ключ или псевдоним в нижнем регистре: запись}`.
+        topic_listing (dict): `{категория: [ключ темы, ...]}`.
+        categories (set): все категории в нижнем регистре.
+        vocabulary (list): отсортированный словарь для подсказок.
+        listings (dict): `{ширина экрана: готовый список справки}`.
+    """
+
+    def __init__(self, helpcmd, caller, cmdset, ignore_prefixes=""):
+        self.commands = set()
+        self.cmd_names = defaultdict(set)
+        self.cmd_listing = defaultdict(list)
+        self.topics = {}
+        self.topic_listing = defaultdict(list)
+        self.categories = set()
+        self.listings = {}
+
+        vocabulary = set()
+        for cmd in cmdset:
+            if not helpcmd.check_show_help(cmd, caller):
+                continue
+            self.commands.add(cmd.key)
+            self.categories.add(cmd.help_category.lower())
+            vocabulary.add(cmd.key)
+            vocabulary.update(cmd.aliases)
+            for name in cmd._matchset:
+                self.cmd_names[name].add(cmd.key)
+                if len(name) > 1 and name[0] in ignore_prefixes:
+                    self.cmd_names[name[1:]].add(cmd.key)
+            if helpcmd.should_list_cmd(cmd, caller):
+                self.cmd_listing[cmd.help_category].append(
+                    getattr(cmd, "auto_help_display_key", cmd.key)
+                )
+
+        for entry, aliases in get_topics():
+            if not entry.access(caller, "view", default=True):
+                continue
+            self.topic_listing[entry.help_category].append(entry.key)
+            self.categories.add(entry.help_category.lower())
+            vocabulary.add(entry.key)
+            for name in [entry.key] + aliases:
+                self.topics.setdefault(name.lower(), entry)
+
+        vocabulary.update(self.categories)
+        self.vocabulary = sorted(vocabulary)
+        self._trigram_index = defaultdict(set)
+        for word in self.vocabulary:
+            for trigram in _trigrams(word):
+                self._trigram_index[trigram].add(word)
+
+    def suggest(self, query, cutoff=0.6, maxnum=5):
+        """
+        Подсказки для запроса, похожие на результат `string_suggestions`
+        по всему словарю, но difflib видит только слова с общими
+        триграммами.
+
+        Аргументы:
+            query (str): запрос.
+            cutoff (float): порог похожести от 0 до 1.
+            maxnum (int): максимум подсказок.
+
+        Возвращает:
+            список подсказок, не включающий сам запрос.
+        """
+        counts = defaultdict(int)
+        for trigram in _trigrams(query):
+            for word in self._trigram_index.get(trigram, ()):
+                counts[word] += 1
+        candidates = sorted(counts, key=counts.get, reverse=True)[:_MAX_CANDIDATES]
+        suggestions = [
+            sugg
+            for sugg in string_suggestions(query, candidates, cutoff=cutoff, maxnum=maxnum)
+            if sugg != query
+        ]
+        if not suggestions:
+            suggestions = [sugg for sugg in self.prefixed(query) if sugg != query]
+        return suggestions
+
+    def get_listing(self, width, render):
+        """
+        Готовый список всей справки для заданной ширины экрана.
+
+        Аргументы:
+            width (int): ширина экрана клиента.
+            render (callable): строит текст списка, вызывается без
+                аргументов, только если для этой ширины списка ещё нет.
+
+        Возвращает:
+            текст списка.
+        """
+        try:
+            return self.listings[width]
+        except KeyError:
+            listing = self.listings[width] = render()
+            return listing
+
+    def prefixed(self, prefix):
+        """
+        Возвращает слова словаря, начинающиеся с `prefix`.
+        """
+        words = []
+        for word in self.vocabulary[bisect_left(self.vocabulary, prefix) :]:
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+        return words
+
+
+def get_help_index(helpcmd, caller, cmdset, ignore_prefixes=""):
+    """
+    Получить индекс справки для вызывающего, построив его при необходимости.
+
+    Аргументы:
+        helpcmd (Command): команда справки; её `check_show_help` и
+            `should_list_cmd` решают, какие команды попадут в индекс.
+        caller (Object or Account): тот, кто смотрит справку.
+        cmdset (CmdSet): объединённый набор команд вызывающего.
+        ignore_prefixes (str): префиксы команд, которые можно опускать.
+
+    Возвращает:
+        HelpIndex.
+    """
+    key = (_VERSION, type(helpcmd), cmdset_signature(cmdset), lock_profile(caller))
+    index = _INDEXES.get(key)
+    if index is None:
+        index = HelpIndex(helpcmd, caller, cmdset, ignore_prefixes=ignore_prefixes)
+        _INDEXES[key] = index
+        if len(_INDEXES) > _MAX_INDEXES:
+            _INDEXES.popitem(last=False)
+    else:
+        _INDEXES.move_to_end(key)
+    return index
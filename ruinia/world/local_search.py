@@ -0,0 +1,186 @@
+"""
+Локальный поиск объектов по индексу имён
+
+`caller.search()` в командах `смотреть`, `взять`, `выбросить`, `дать`
+ищет среди содержимого комнаты и инвентаря запросами к базе: по ключу
+(`db_key__iexact`, потом `istartswith`) и отдельно по псевдонимам-тегам,
+а вариант вида `2-меч` - это ещё один такой же запрос. В людной комнате
+это несколько запросов на каждую команду с предметами.
+
+Здесь у каждого контейнера (комнаты или персонажа) в `ndb` лежит индекс
+его содержимого: ключи и псевдонимы в `casefold()`, так что поиск -
+это поиск в словаре или проход по списку в памяти. Индекс строится при
+первом поиске и заново после того, как что-то попало в контейнер,
+ушло из него, было удалено, переименовано или получило другие
+псевдонимы: для этого у контейнера есть номер версии, который
+увеличивают сигналы Django, как в `world.exit_cmdsets`.
+
+Порядок поиска: сначала точное совпадение ключа или псевдонима со
+всей строкой; если его нет, от строки отделяется номер вида `2-меч`
+(`settings.SEARCH_MULTIMATCH_REGEX`), и имя ищется снова - точно, а
+если не нашлось и не задан `exact`, то по началу слов
+(`string_partial_matching`), сначала по ключам, потом по псевдонимам.
+С `exact=True` поиск только точный, и с номером тоже: `2-север` найдёт
+второй выход `север`, но не `северо-восток`.
+
+Использование:
+
+    from world import local_search
+    matches = local_search.search("2-меч", [caller.location, caller])
+"""
+import re
+from collections import defaultdict
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from evennia.objects.models import ObjectDB
+from evennia.utils.utils import string_partial_matching
+
+_MULTIMATCH_REGEX = re.compile(settings.SEARCH_MULTIMATCH_REGEX, re.I + re.U)
+
+# {id контейнера: версия индекса}
+_VERSIONS = defaultdict(int)
+# {id объекта: id контейнера, в чей индекс он вошёл}
+_INDEXED = {}
+
+
+def normalize(name):
+    """
+    Привести имя к виду, в котором оно хранится в индексе.
+    """
+    return name.strip().casefold()
+
+
+def invalidate(container_id):
+    """
+    Пометить индекс контейнера устаревшим.
+    """
+    _VERSIONS[container_id] += 1
+
+
+def _entry(obj):
+    return obj, normalize(obj.key), tuple(normalize(alias) for alias in obj.aliases.all())
+
+
+def index(container):
+    """
+    Получить актуальный индекс содержимого контейнера.
+
+    Аргументы:
+        container (Object): комната или персонаж.
+
+    Возвращает:
+        список `(объект, ключ, псевдонимы)` в порядке id объектов и
+        словарь {ключ или псевдоним: [объект, ...]}.
+    """
+    version = _VERSIONS[container.id]
+    cached = container.ndb._search_index
+    if cached and cached[0] == version:
+        return cached[1], cached[2]
+    entries = [_entry(obj) for obj in sorted(container.contents, key=lambda obj: obj.id)]
+    names = defaultdict(list)
+    for obj, key, aliases in entries:
+        _INDEXED[obj.id] = container.id
+        for name in dict.fromkeys((key,) + aliases):
+            names[name].append(obj)
+    container.ndb._search_index = (version, entries, dict(names))
+    return entries, names
+
+
+def _exact(query, indexes, extra):
+    matches = {}
+    for entries, names in indexes:
+        for obj in names.get(query, ()):
+            matches[obj.id] = obj
+    for obj, key, aliases in extra:
+        if query == key or query in aliases:
+            matches[obj.id] = obj
+    return [matches[objid] for objid in sorted(matches)]
+
+
+def _partial(query, indexes, extra):
+    entries = {}
+    for index_entries, names in indexes:
+        entries.update((entry[0].id, entry) for entry in index_entries)
+    entries.update((entry[0].id, entry) for entry in extra)
+    entries = [entries[objid] for objid in sorted(entries)]
+
+    found = string_partial_matching([key for obj, key, aliases in entries], query, ret_index=True)
+    if found:
+        return [entries[ind][0] for ind in sorted(found)]
+    alias_owners = [(obj, alias) for obj, key, aliases in entries for alias in aliases]
+    found = string_partial_matching([alias for obj, alias in alias_owners], query, ret_index=True)
+    matches = {}
+    for ind in sorted(found):
+        obj = alias_owners[ind][0]
+        matches[obj.id] = obj
+    return [matches[objid] for objid in sorted(matches)]
+
+
+def search(searchdata, containers, extra=(), exact=False):
+    """
+    Найти объекты по имени среди содержимого контейнеров.
+
+    Аргументы:
+        searchdata (str): имя, его начало или `2-меч`.
+        containers (list): комнаты и персонажи, в которых искать.
+        extra (list): отдельные объекты, которые тоже подходят (например
+            сама комната).
+        exact (bool): только точное совпадение имени, в том числе после
+            отделения номера.
+
+    Возвращает:
+        список найденных объектов в порядке id.
+    """
+    indexes = [index(container) for container in containers if container]
+    extra = [_entry(obj) for obj in extra if obj]
+    query = normalize(searchdata)
+    matches = _exact(query, indexes, extra)
+    if matches:
+        return matches
+
+    number = None
+    match = _MULTIMATCH_REGEX.match(searchdata)
+    if match:
+        groups = match.groupdict()
+        number = int(groups["number"]) - 1
+        query = normalize(groups["name"] + (groups.get("args") or ""))
+    if number is None and exact:
+        return []
+    matches = _exact(query, indexes, extra) if exact else (
+        _exact(query, indexes, extra) or _partial(query, indexes, extra)
+    )
+    if number is not None:
+        # `2-меч`, когда меч один, - это не найдено
+        matches = matches[number:number + 1] if number >= 0 else []
+    return matches
+
+
+def _object_saved(sender, instance, **kwargs):
+    if not isinstance(instance, ObjectDB):
+        return
+    container_id = _INDEXED.pop(instance.id, None)
+    if container_id:
+        invalidate(container_id)
+    if instance.db_location_id:
+        invalidate(instance.db_location_id)
+
+
+def _object_deleted(sender, instance, **kwargs):
+    if isinstance(instance, ObjectDB):
+        container_id = _INDEXED.pop(instance.id, None)
+        if container_id:
+            invalidate(container_id)
+
+
+def _tags_changed(sender, instance, action, reverse, **kwargs):
+    # псевдонимы - это теги
+    if action in ("post_add", "post_remove", "post_clear") and not reverse:
+        container_id = _INDEXED.get(instance.id)
+        if container_id:
+            invalidate(container_id)
+
+
+# у тайпклассов отправитель сигнала - прокси-класс, поэтому без sender
+post_save.connect(_object_saved, dispatch_uid="local_search_save")
+post_delete.connect(_object_deleted, dispatch_uid="local_search_delete")
+m2m_changed.connect(_tags_changed, sender=ObjectDB.db_tags.through, dispatch_uid="local_search_tags")
@@ -0,0 +1,362 @@
+"""
+Полнотекстовый поиск по справке и лору
+
+Локальный поисковый движок на обратном индексе. Текст разбивается на
+слова, слова приводятся к основе стеммером Портера для русского языка,
+результаты ранжируются по TF-IDF.
+
+Индексируются:
+ - записи `HelpEntry` (каждая запись - один документ);
+ - org-файлы лора из каталогов `settings.LORE_DIRS` (каждый абзац -
+   отдельный документ, заголовок берётся из ближайшего org-заголовка).
+
+Индекс строится при первом поиске и дальше обновляется по одному
+документу: сохранение или удаление `HelpEntry` (в том числе через
+`sethelp`) переиндексирует только эту запись. Лор перечитывается
+`refresh_lore()`, причём только изменившиеся файлы; поиск вызывает её
+сам, не чаще раза в `settings.LORE_REFRESH_INTERVAL` секунд.
+
+Использование:
+
+    from world.lore_search import SEARCH_INDEX
+    for hit in SEARCH_INDEX.search("королевство асуш"):
+        print(hit.title, hit.score)
+"""
+import os
+import re
+import time
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+from math import log, sqrt
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from evennia.help.models import HelpEntry
+from evennia.utils import logger
+
+# ------------------------------------------------------------
+# Стеммер Портера для русского языка (snowball)
+# ------------------------------------------------------------
+
+_RE_RV = re.compile(r"^(.*?[аеиоуыэюя])(.*)$")
+_RE_PERFECTIVE_GERUND = re.compile(r"((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$")
+_RE_REFLEXIVE = re.compile(r"(с[яь])$")
+_RE_ADJECTIVE = re.compile(
+    r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$"
+)
+_RE_PARTICIPLE = re.compile(r"((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$")
+_RE_VERB = re.compile(
+    r"((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|"
+    r"ены|ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$"
+)
+_RE_NOUN = re.compile(
+    r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|"
+    r"ы|ь|ию|ью|ю|ия|ья|я)$"
+)
+_RE_I = re.compile(r"и$")
+_RE_DERIVATIONAL = re.compile(r".*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$")
+_RE_DER = re.compile(r"ость?$")
+_RE_SUPERLATIVE = re.compile(r"(ейше|ейш)$")
+_RE_SOFT_SIGN = re.compile(r"ь$")
+_RE_NN = re.compile(r"нн$")
+
+_RE_WORD = re.compile(r"[0-9a-zа-яё]+")
+# слова запросов приходят от игроков, поэтому кеш основ ограничен
+_STEM_CACHE_SIZE = 50000
+
+
+def stem(word):
+    """
+    Привести русское слово к основе. Слова на других языках и числа
+    возвращаются в нижнем регистре как есть.
+
+    Аргументы:
+        word (str): слово.
+
+    Возвращает:
+        основа слова.
+    """
+    return _stem(word.lower().replace("ё", "е"))
+
+
+@lru_cache(maxsize=_STEM_CACHE_SIZE)
+def _stem(word):
+    match = _RE_RV.match(word)
+    if not match:
+        return word
+    start, rv = match.groups()
+
+    temp = _RE_PERFECTIVE_GERUND.sub("", rv, 1)
+    if temp == rv:
+        rv = _RE_REFLEXIVE.sub("", rv, 1)
+        temp = _RE_ADJECTIVE.sub("", rv, 1)
+        if temp != rv:
+            rv = _RE_PARTICIPLE.sub("", temp, 1)
+        else:
+            temp = _RE_VERB.sub("", rv, 1)
+            rv = _RE_NOUN.sub("", rv, 1) if temp == rv else temp
+    else:
+        rv = temp
+
+    rv = _RE_I.sub("", rv, 1)
+    if _RE_DERIVATIONAL.match(rv):
+        rv = _RE_DER.sub("", rv, 1)
+    temp = _RE_SOFT_SIGN.sub("", rv, 1)
+    if temp == rv:
+        rv = _RE_SUPERLATIVE.sub("", rv, 1)
+        rv = _RE_NN.sub("н", rv, 1)
+    else:
+        rv = temp
+
+    return start + rv
+
+
+def tokenize(text):
+    """
+    Разбить текст на основы слов.
+
+    Аргументы:
+        text (str): текст.
+
+    Возвращает:
+        список основ в порядке следования в тексте.
+    """
+    return [stem(word) for word in _RE_WORD.findall(text.lower())]
+
+
+# ------------------------------------------------------------
+# Обратный индекс
+# ------------------------------------------------------------
+
+SearchHit = namedtuple("SearchHit", ("docid", "title", "text", "score", "entry"))
+
+
+class SearchIndex(object):
+    """
+    Обратный индекс документов с ранжированием по TF-IDF.
+
+    Документ определяется строковым `docid`; повторное добавление
+    документа с тем же `docid` заменяет старую версию.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._docs = {}
+        self._lore_mtimes = {}
+        self._lore_checked = 0
+        self._loaded = False
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, docid, title, text, entry=None):
+        """
+        Добавить или заменить документ.
+
+        Аргументы:
+            docid (str): уникальный идентификатор документа.
+            title (str): заголовок, показываемый в результатах.
+            text (str): текст документа.
+            entry (HelpEntry, optional): запись справки, если документ из неё.
+        """
+        self.remove(docid)
+        terms = defaultdict(int)
+        for term in tokenize(title) + tokenize(text):
+            terms[term] += 1
+        if not terms:
+            return
+        for term, count in terms.items():
+            self._postings[term][docid] = count
+        norm = sqrt(sum((1 + log(count)) ** 2 for count in terms.values()))
+        self._docs[docid] = (title, text, entry, tuple(terms), norm)
+
+    def remove(self, docid):
+        """
+        Убрать документ из индекса, если он там есть.
+        """
+        doc = self._docs.pop(docid, None)
+        if not doc:
+            return
+        for term in doc[3]:
+            postings = self._postings[term]
+            postings.pop(docid, None)
+            if not postings:
+                del self._postings[term]
+
+    def remove_prefix(self, prefix):
+        """
+        Убрать все документы, чей `docid` начинается с `prefix`.
+        """
+        for docid in [docid for docid in self._docs if docid.startswith(prefix)]:
+            self.remove(docid)
+
+    def search(self, query, caller=None, limit=10):
+        """
+        Найти документы по запросу.
+
+        Аргументы:
+            query (str): поисковый запрос.
+            caller (Object, optional): если задан, записи справки, которые
+                ему не видны, отбрасываются.
+            limit (int): максимум результатов.
+
+        Возвращает:
+            список `SearchHit`, лучшие совпадения первыми.
+        """
+        self.load()
+        if time.monotonic() - self._lore_checked >= settings.LORE_REFRESH_INTERVAL:
+            self.refresh_lore()
+        ndocs = len(self._docs)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = log(1 + ndocs / len(postings))
+            for docid, count in postings.items():
+                scores[docid] += (1 + log(count)) * idf
+
+        hits = []
+        for docid in sorted(scores, key=lambda docid: scores[docid] / self._docs[docid][4], reverse=True):
+            title, text, entry, _, norm = self._docs[docid]
+            if caller and entry and not entry.access(caller, "view", default=True):
+                continue
+            hits.append(SearchHit(docid, title, text, scores[docid] / norm, entry))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    # снимок для перезагрузки (world.snapshot)
+
+    def dump_state(self):
+        """
+        Возвращает:
+            состояние индекса без объектов базы (записи справки заменены
+            их id) или None, если индекс не построен.
+        """
+        if not self._loaded:
+            return None
+        docs = {
+            docid: (title, text, entry.id if entry else None, terms, norm)
+            for docid, (title, text, entry, terms, norm) in self._docs.items()
+        }
+        return dict(self._postings), docs, self._lore_mtimes
+
+    def restore_state(self, state):
+        """
+        Восстановить индекс из снимка. Записи справки загружаются одним
+        запросом.
+        """
+        postings, docs, lore_mtimes = state
+        entries = HelpEntry.objects.in_bulk([doc[2] for doc in docs.values() if doc[2]])
+        self._docs = {}
+        for docid, (title, text, entry_id, terms, norm) in docs.items():
+            if entry_id and entry_id not in entries:
+                # запись удалена, пока сервер перезагружался
+                continue
+            self._docs[docid] = (title, text, entries.get(entry_id), terms, norm)
+        self._postings = defaultdict(dict)
+        for term, docids in postings.items():
+            kept = {docid: count for docid, count in docids.items() if docid in self._docs}
+            if kept:
+                self._postings[term] = kept
+        self._lore_mtimes = lore_mtimes
+        self._loaded = True
+        # файлы лора могли поменяться, пока сервер перезагружался
+        self.refresh_lore()
+
+    # заполнение индекса
+
+    def load(self):
+        """
+        Построить индекс при первом обращении.
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        for entry in HelpEntry.objects.all():
+            self.add_help_entry(entry)
+        self.refresh_lore()
+
+    def add_help_entry(self, entry):
+        """
+        Проиндексировать (или переиндексировать) запись справки.
+        """
+        self.add("help:%s" % entry.id, entry.key, entry.entrytext, entry=entry)
+
+    def refresh_lore(self):
+        """
+        Переиндексировать изменившиеся, новые и удалённые файлы лора.
+
+        Возвращает:
+            число переиндексированных файлов.
+        """
+        self._lore_checked = time.monotonic()
+        found = {}
+        for lore_dir in settings.LORE_DIRS:
+            for root, _, filenames in os.walk(lore_dir):
+                for filename in filenames:
+                    if filename.endswith(".org"):
+                        path = os.path.join(root, filename)
+                        found[path] = os.path.getmtime(path)
+
+        changed = 0
+        for path in set(self._lore_mtimes) - set(found):
+            self.remove_prefix("lore:%s#" % path)
+            changed += 1
+        for path, mtime in found.items():
+            if self._lore_mtimes.get(path) == mtime:
+                continue
+            self.remove_prefix("lore:%s#" % path)
+            try:
+                self._add_org_file(path)
+            except (OSError, UnicodeDecodeError):
+                logger.log_trace("Could not index lore file %s." % path)
+            changed += 1
+        self._lore_mtimes = found
+        return changed
+
+    def _add_org_file(self, path):
+        """
+        Разбить org-файл на абзацы и проиндексировать каждый отдельно.
+        """
+        name = os.path.splitext(os.path.basename(path))[0]
+        heading = name
+        paragraph = []
+        num = 0
+
+        def _flush():
+            text = " ".join(paragraph).strip()
+            if text:
+                self.add("lore:%s#%i" % (path, num), heading, text)
+
+        with open(path, encoding="utf-8") as fil:
+            for line in fil:
+                line = line.strip()
+                if line.startswith("*"):
+                    _flush()
+                    num += 1
+                    paragraph = []
+                    heading = "%s: %s" % (name, line.lstrip("* ").strip())
+                elif not line or line.startswith("#+"):
+                    _flush()
+                    num += 1
+                    paragraph = []
+                else:
+                    paragraph.append(line)
+        _flush()
+
+
+SEARCH_INDEX = SearchIndex()
+
+
+def _help_entry_saved(sender, instance, **kwargs):
+    if SEARCH_INDEX._loaded:
+        SEARCH_INDEX.add_help_entry(instance)
+
+
+def _help_entry_deleted(sender, instance, **kwargs):
+    SEARCH_INDEX.remove("help:%s" % instance.id)
+
+
+post_save.connect(_help_entry_saved, sender=HelpEntry, dispatch_uid="lore_search_save")
+post_delete.connect(_help_entry_deleted, sender=HelpEntry, dispatch_uid="lore_search_delete")
@@ -0,0 +1,247 @@
+"""
+Выгрузка карты мира для сайта
+
+`world.map.Map` рисует только окно 13x13 вокруг смотрящего. Здесь вся
+сетка координат выгружается в статические файлы, которые веб-сервер
+отдаёт сам, без запросов к базе игры:
+
+    <WORLDMAP_EXPORT_DIR>/z<уровень>/<tx>_<ty>.svg  - плитки по TILE_SIZE
+                                                     комнат на сторону
+    <WORLDMAP_EXPORT_DIR>/z<уровень>/index.html     - страница уровня
+    <WORLDMAP_EXPORT_DIR>/index.html                - список уровней
+    <WORLDMAP_EXPORT_DIR>/manifest.json             - хеши плиток
+
+Цвета и значки берутся из легенды `world/map_legend.py` по атрибуту
+комнаты `sector_type`. Для каждой плитки считается хеш её комнат
+(координаты, id, имя, тип местности); при следующей выгрузке заново
+пишутся только плитки с изменившимся хешем, а пропавшие удаляются.
+
+Выгрузку периодически запускает скрипт `typeclasses.scripts.MapExportScript`;
+вручную (например из `evennia shell`):
+
+    from world import mapexport
+    mapexport.export(force=True)
+"""
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from html import escape
+from django.conf import settings
+from evennia.objects.models import ObjectDB
+from evennia.utils import logger
+from world import coords
+from world.map_legend import SYMBOLS
+
+# комнат на сторону плитки и пикселей на комнату
+TILE_SIZE = 32
+CELL = 16
+# сколько комнат загружать из базы за один запрос
+_CHUNK = 1000
+
+_BACKGROUND = "#111111"
+_DEFAULT_FG = "#c0c0c0"
+
+_ANSI_COLORS = {
+    "x": "#000000", "r": "#800000", "g": "#008000", "y": "#808000",
+    "b": "#000080", "m": "#800080", "c": "#008080", "w": "#c0c0c0",
+    "X": "#808080", "R": "#ff0000", "G": "#00ff00", "Y": "#ffff00",
+    "B": "#0000ff", "M": "#ff00ff", "C": "#00ffff", "W": "#ffffff",
+}
+_RE_MARKUP = re.compile(r"\|(\[?)(=[a-z]|[0-5]{3}|[xrgybmcwXRGYBMCW])|\|n")
+_RE_STRIP = re.compile(r"\|\[?(=[a-z]|[0-5]{3}|[a-zA-Z])")
+
+
+def _xterm_rgb(code):
+    if code.startswith("="):
+        level = int(round(255 * (ord(code[1]) - ord("a")) / 25.0))
+        return "#%02x%02x%02x" % (level, level, level)
+    if code in _ANSI_COLORS:
+        return _ANSI_COLORS[code]
+    return "#%02x%02x%02x" % tuple(0 if int(d) == 0 else 55 + 40 * int(d) for d in code)
+
+
+def parse_symbol(symbol):
+    """
+    Разобрать символ легенды в цвета и значок для картинки.
+
+    Аргументы:
+        symbol (str): значение из `SYMBOLS`, например `"|g[φ]|n"`.
+
+    Возвращает:
+        кортеж (цвет значка, цвет фона, значок), цвета в виде `#rrggbb`.
+    """
+    fg = bg = None
+    for is_bg, code in _RE_MARKUP.findall(symbol):
+        if not code:
+            continue
+        if is_bg:
+            bg = bg or _xterm_rgb(code)
+        else:
+            fg = fg or _xterm_rgb(code)
+    text = _RE_STRIP.sub("", symbol).replace("|n", "")
+    glyph = text[1:-1] if text.startswith("[") and text.endswith("]") else text
+    return fg or _DEFAULT_FG, bg or _BACKGROUND, glyph.strip() or "."
+
+
+_STYLES = {key: parse_symbol(symbol) for key, symbol in SYMBOLS.items() if key != "you"}
+
+
+def _load_rooms():
+    """
+    Возвращает:
+        `{z: {(tx, ty): [(x, y, id, имя, тип местности), ...]}}`.
+    """
+    # одна ссылка на индекс: функция работает в потоке, и сигнал может
+    # сбросить индекс в `coords` посреди выгрузки
+    positions = {room_id: xyz for xyz, room_id in coords._load().items()}
+    room_ids = sorted(positions)
+    through = ObjectDB.db_attributes.through
+    tiles = defaultdict(lambda: defaultdict(list))
+    for start in range(0, len(room_ids), _CHUNK):
+        chunk = room_ids[start : start + _CHUNK]
+        names = dict(ObjectDB.objects.filter(id__in=chunk).values_list("id", "db_key"))
+        sectors = dict(
+            through.objects.filter(
+                objectdb_id__in=chunk,
+                attribute__db_key="sector_type",
+                attribute__db_category__isnull=True,
+            ).values_list("objectdb_id", "attribute__db_value")
+        )
+        for room_id in chunk:
+            if room_id not in names:
+                continue
+            x, y, z = positions[room_id]
+            tiles[z][(x // TILE_SIZE, y // TILE_SIZE)].append(
+                (x, y, room_id, names[room_id], sectors.get(room_id))
+            )
+    return tiles
+
+
+def _tile_hash(rooms):
+    return hashlib.sha1(repr(sorted(rooms)).encode("utf-8")).hexdigest()
+
+
+def render_tile(tx, ty, rooms):
+    """
+    Нарисовать плитку в SVG. Север сверху.
+
+    Аргументы:
+        tx (int), ty (int): номер плитки.
+        rooms (list): комнаты плитки, как их возвращает `_load_rooms`.
+
+    Возвращает:
+        текст SVG.
+    """
+    side = TILE_SIZE * CELL
+    parts = [
+        '<svg xmlns="http://www.w3.org/2000/svg" width="%i" height="%i" '
+        'font-family="monospace" font-size="%i" text-anchor="middle">' % (side, side, CELL - 4),
+        '<rect width="100%" height="100%" fill="#000000"/>',
+    ]
+    for x, y, room_id, name, sector in sorted(rooms):
+        fg, bg, glyph = _STYLES.get(sector if isinstance(sector, str) else None, _STYLES[None])
+        left = (x - tx * TILE_SIZE) * CELL
+        top = (TILE_SIZE - 1 - (y - ty * TILE_SIZE)) * CELL
+        parts.append(
+            '<g><title>%s (%i, %i) #%i</title>'
+            '<rect x="%i" y="%i" width="%i" height="%i" fill="%s"/>'
+            '<text x="%i" y="%i" fill="%s">%s</text></g>'
+            % (
+                escape(name), x, y, room_id,
+                left, top, CELL, CELL, bg,
+                left + CELL // 2, top + CELL - 4, fg, escape(glyph),
+            )
+        )
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def _render_level(z, tile_keys):
+    txs = [tx for tx, _ in tile_keys]
+    tys = [ty for _, ty in tile_keys]
+    side = TILE_SIZE * CELL
+    rows = []
+    for ty in range(max(tys), min(tys) - 1, -1):
+        cells = []
+        for tx in range(min(txs), max(txs) + 1):
+            if (tx, ty) in tile_keys:
+                cells.append('<img src="%i_%i.svg" width="%i" height="%i" alt="">' % (tx, ty, side, side))
+            else:
+                cells.append('<span style="display:inline-block;width:%ipx;height:%ipx"></span>' % (side, side))
+        rows.append('<div style="white-space:nowrap;line-height:0">%s</div>' % "".join(cells))
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>%s - уровень %i</title></head>'
+        '<body style="background:#000;margin:0">\n%s\n</body></html>'
+        % (escape(settings.SERVERNAME), z, "\n".join(rows))
+    )
+
+
+def _write(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fil:
+        fil.write(text)
+    os.replace(tmp, path)
+
+
+def export(force=False):
+    """
+    Выгрузить карту, перерисовав только изменившиеся плитки.
+
+    Аргументы:
+        force (bool): перерисовать все плитки.
+
+    Возвращает:
+        словарь со счётчиками `written`, `removed` и `unchanged`.
+    """
+    outdir = settings.WORLDMAP_EXPORT_DIR
+    manifest_path = os.path.join(outdir, "manifest.json")
+    try:
+        with open(manifest_path, encoding="utf-8") as fil:
+            manifest = json.load(fil)
+    except (OSError, ValueError):
+        manifest = {}
+
+    stats = {"written": 0, "removed": 0, "unchanged": 0}
+    new_manifest = {}
+    levels = _load_rooms()
+    for z, tiles in levels.items():
+        leveldir = os.path.join(outdir, "z%i" % z)
+        os.makedirs(leveldir, exist_ok=True)
+        level_changed = force
+        for (tx, ty), rooms in tiles.items():
+            name = "z%i/%i_%i.svg" % (z, tx, ty)
+            digest = new_manifest[name] = _tile_hash(rooms)
+            if not force and manifest.get(name) == digest:
+                stats["unchanged"] += 1
+                continue
+            _write(os.path.join(outdir, name), render_tile(tx, ty, rooms))
+            stats["written"] += 1
+            level_changed = True
+        if level_changed or not os.path.exists(os.path.join(leveldir, "index.html")):
+            _write(os.path.join(leveldir, "index.html"), _render_level(z, set(tiles)))
+
+    for name in set(manifest) - set(new_manifest):
+        try:
+            os.remove(os.path.join(outdir, name))
+        except OSError:
+            pass
+        stats["removed"] += 1
+
+    os.makedirs(outdir, exist_ok=True)
+    _write(
+        os.path.join(outdir, "index.html"),
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>%s - карта</title></head><body>'
+        "<ul>%s</ul></body></html>"
+        % (
+            escape(settings.SERVERNAME),
+            "".join('<li><a href="z%i/index.html">Уровень %i</a></li>' % (z, z) for z in sorted(levels)),
+        ),
+    )
+    _write(manifest_path, json.dumps(new_manifest, indent=1, sort_keys=True))
+    logger.log_info(
+        "World map export: %(written)i tiles written, %(removed)i removed, "
+        "%(unchanged)i unchanged." % stats
+    )
+    return stats
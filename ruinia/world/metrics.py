@@ -0,0 +1,238 @@
+"""
+Метрики команд
+
+Для каждой команды (по `key`) копятся:
+
+ - гистограммы времени `parse()` и `func()`, из которых считаются
+   p50/p95/p99;
+ - число запросов к базе, сделанных командой (через
+   `connection.execute_wrappers`);
+ - число сообщений, отправленных сессиям, пока команда выполнялась
+   (считает `ServerSession.data_out`);
+ - число вызовов.
+
+Замеры ставит `commands.command.Command`, который оборачивает `parse` и
+`func` всех команд-наследников. Смотреть метрики можно командой
+`статистика` или в формате Prometheus по адресу `/metrics` веб-сервера
+игры (`server/conf/web_plugins.py`). Там же показываются счётчики
+попаданий кешей (`cache_stats()`).
+
+Команды выполняются и метрики пишутся только в потоке реактора, поэтому
+реестр обходится без блокировок: гистограмма - это список счётчиков по
+фиксированным корзинам, и запись в неё - одно сложение. Читатели
+получают копию через `snapshot()`.
+"""
+import time
+from bisect import bisect_left
+from django.db import connection
+
+# верхние границы корзин гистограммы в секундах
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+PHASES = ("parse", "func")
+
+
+class Histogram(object):
+    """
+    Гистограмма времени с фиксированными корзинами `BUCKETS`.
+    """
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        # последняя корзина - всё, что дольше BUCKETS[-1]
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Оценить квантиль по корзинам, линейно внутри корзины.
+
+        Аргументы:
+            q (float): квантиль от 0 до 1.
+
+        Возвращает:
+            время в секундах или None, если замеров нет.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                if index == len(BUCKETS):
+                    return lower
+                return lower + (BUCKETS[index] - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+    def copy(self):
+        other = Histogram()
+        other.counts = list(self.counts)
+        other.count = self.count
+        other.sum = self.sum
+        return other
+
+
+class CommandMetrics(object):
+    """
+    Метрики одной команды.
+    """
+
+    __slots__ = ("calls", "queries", "messages", "phases")
+
+    def __init__(self):
+        self.calls = 0
+        self.queries = 0
+        self.messages = 0
+        self.phases = {phase: Histogram() for phase in PHASES}
+
+    def copy(self):
+        other = CommandMetrics()
+        other.calls, other.queries, other.messages = self.calls, self.queries, self.messages
+        other.phases = {phase: hist.copy() for phase, hist in self.phases.items()}
+        return other
+
+
+class MetricsRegistry(object):
+    """
+    Реестр метрик команд процесса сервера.
+    """
+
+    def __init__(self):
+        self.commands = {}
+        self.started = time.time()
+        # метрики выполняемой сейчас команды, для подсчёта сообщений
+        self.current = None
+
+    def get(self, key):
+        metrics = self.commands.get(key)
+        if metrics is None:
+            metrics = self.commands[key] = CommandMetrics()
+        return metrics
+
+    def measure(self, key, phase, method, *args, **kwargs):
+        """
+        Выполнить фазу команды с замером времени и запросов к базе.
+
+        Аргументы:
+            key (str): ключ команды.
+            phase (str): "parse" или "func".
+            method (callable): что выполнить.
+
+        Возвращает:
+            результат `method`.
+        """
+        metrics = self.get(key)
+        if phase == "parse":
+            metrics.calls += 1
+        previous, self.current = self.current, metrics
+
+        def count_query(execute, sql, params, many, context):
+            metrics.queries += 1
+            return execute(sql, params, many, context)
+
+        # not connection.execute_wrapper(): it pops the last wrapper on exit,
+        # which is someone else's if the command installed one (`профайлер`)
+        connection.execute_wrappers.append(count_query)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.phases[phase].observe(time.perf_counter() - start)
+            self.current = previous
+            connection.execute_wrappers.remove(count_query)
+
+    def count_message(self):
+        """
+        Учесть сообщение, отправленное сессии. Вызывается из
+        `ServerSession.data_out`.
+        """
+        if self.current is not None:
+            self.current.messages += 1
+
+    def snapshot(self):
+        """
+        Возвращает:
+            копию метрик `{ключ команды: CommandMetrics}`.
+        """
+        return {key: metrics.copy() for key, metrics in list(self.commands.items())}
+
+    def reset(self):
+        self.commands = {}
+        self.started = time.time()
+
+
+METRICS = MetricsRegistry()
+
+
+def cache_stats():
+    """
+    Размер и попадания кешей, которые стоят на пути каждой команды.
+
+    Возвращает:
+        {имя кеша: словарь `stats()` кеша}.
+    """
+    from server.conf.serversession import RENDER_CACHE
+    from world import cmdset_cache
+
+    return {"render": RENDER_CACHE.stats(), "cmdset_merge": cmdset_cache.stats()}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """
+    Метрики в текстовом формате Prometheus.
+
+    Возвращает:
+        текст для ответа на `/metrics`.
+    """
+    snapshot = METRICS.snapshot()
+    lines = [
+        "# HELP ruinia_command_seconds Time spent in command parse() and func().",
+        "# TYPE ruinia_command_seconds histogram",
+    ]
+    for key in sorted(snapshot):
+        for phase, hist in sorted(snapshot[key].phases.items()):
+            labels = 'command="%s",phase="%s"' % (_escape(key), phase)
+            total = 0
+            for bound, count in zip(BUCKETS, hist.counts):
+                total += count
+                lines.append('ruinia_command_seconds_bucket{%s,le="%s"} %i' % (labels, bound, total))
+            lines.append('ruinia_command_seconds_bucket{%s,le="+Inf"} %i' % (labels, hist.count))
+            lines.append("ruinia_command_seconds_sum{%s} %r" % (labels, hist.sum))
+            lines.append("ruinia_command_seconds_count{%s} %i" % (labels, hist.count))
+    for name, attr, text in (
+        ("ruinia_command_calls_total", "calls", "Commands executed."),
+        ("ruinia_command_queries_total", "queries", "Database queries issued by commands."),
+        ("ruinia_command_messages_total", "messages", "Messages sent to sessions by commands."),
+    ):
+        lines.append("# HELP %s %s" % (name, text))
+        lines.append("# TYPE %s counter" % name)
+        for key in sorted(snapshot):
+            lines.append(
+                '%s{command="%s"} %i' % (name, _escape(key), getattr(snapshot[key], attr))
+            )
+    caches = cache_stats()
+    for name, field, kind, text in (
+        ("ruinia_cache_hits_total", "hits", "counter", "Cache hits."),
+        ("ruinia_cache_misses_total", "misses", "counter", "Cache misses."),
+        ("ruinia_cache_entries", "size", "gauge", "Entries in the cache."),
+    ):
+        lines.append("# HELP %s %s" % (name, text))
+        lines.append("# TYPE %s %s" % (name, kind))
+        for cache in sorted(caches):
+            lines.append('%s{cache="%s"} %i' % (name, cache, caches[cache][field]))
+    return "\n".join(lines) + "\n"
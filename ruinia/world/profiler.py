@@ -0,0 +1,286 @@
+"""
+Профилировщик команд
+
+Включается на заданное время командой `профайлер` (или inputfunc
+`profiler` из `server/conf/inputfuncs.py`). Пока он работает:
+
+ - хуки `at_pre_cmd`/`at_post_cmd` класса `commands.command.Command`
+   подменены обёртками, которые считают для каждой команды число
+   вызовов, время выполнения, число запросов к базе и объём
+   отправленного текста;
+ - запросы к базе считаются через `connection.execute_wrapper`,
+   отправленный текст - обёрткой `ServerSession.data_out`;
+ - отдельный поток раз в `interval` секунд снимает стек потока реактора,
+   если в нём выполняется команда, и копит свёрнутые стеки
+   (`команда;модуль:функция;... число`), которые понимают flamegraph.pl
+   и speedscope.
+
+Если `func` команды падает, `at_post_cmd` не вызывается. Поэтому
+выполняемая команда сбрасывается и в начале следующей, и вызовом
+`reactor.callLater(0)` из `at_pre_cmd`: он срабатывает, когда реактор
+вернулся к своему циклу, то есть команда закончилась, упала или ждёт
+(`yield` в `func`). Иначе сэмплы всего, что реактор делает потом,
+доставались бы упавшей команде.
+
+При остановке стеки пишутся в `settings.PROFILER_DUMP_DIR`, а все
+обёртки снимаются, так что выключенный профилировщик ничего не стоит.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connection
+from twisted.internet import reactor
+from evennia.utils import logger
+
+# сколько кадров стека хранить в одном сэмпле
+_MAX_DEPTH = 64
+
+
+class CommandStats(object):
+    """
+    Сводка по одной команде.
+    """
+
+    __slots__ = ("calls", "wall", "wall_max", "queries", "bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.wall_max = 0.0
+        self.queries = 0
+        self.bytes = 0
+
+
+class Profiler(object):
+    """
+    Сэмплирующий профилировщик выполнения команд.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.started = None
+        self.stopped = None
+        self.stats = defaultdict(CommandStats)
+        self.samples = Counter()
+        self.dump_path = None
+        self.queries = 0
+        self.bytes = 0
+        self._current = None
+        self._originals = None
+        self._stop_call = None
+        self._thread = None
+        self._reactor_thread = None
+        self._callback = None
+
+    # включение и выключение
+
+    def start(self, duration=None, interval=None, callback=None):
+        """
+        Запустить профилирование.
+
+        Аргументы:
+            duration (float): через сколько секунд остановиться, по
+                умолчанию `settings.PROFILER_DEFAULT_DURATION`.
+            interval (float): период снятия стека в секундах, по
+                умолчанию `settings.PROFILER_SAMPLE_INTERVAL`.
+            callback (callable): вызывается с профилировщиком после
+                остановки, например чтобы показать отчёт.
+
+        Возвращает:
+            False, если профилировщик уже работает.
+        """
+        if self.active:
+            return False
+        from commands.command import Command
+        from server.conf.serversession import ServerSession
+
+        self.stats = defaultdict(CommandStats)
+        self.samples = Counter()
+        self.queries = self.bytes = 0
+        self.started, self.stopped, self.dump_path = time.time(), None, None
+        self._reactor_thread = threading.get_ident()
+        duration = duration or settings.PROFILER_DEFAULT_DURATION
+        interval = interval or settings.PROFILER_SAMPLE_INTERVAL
+
+        self._originals = (Command.at_pre_cmd, Command.at_post_cmd, ServerSession.data_out)
+        Command.at_pre_cmd = self._wrap_pre(Command.at_pre_cmd)
+        Command.at_post_cmd = self._wrap_post(Command.at_post_cmd)
+        ServerSession.data_out = self._wrap_data_out(ServerSession.data_out)
+        connection.execute_wrappers.append(self._count_query)
+
+        self.active = True
+        self._thread = threading.Thread(
+            target=self._sample, args=(interval,), name="profiler", daemon=True
+        )
+        self._thread.start()
+        self._callback = callback
+        self._stop_call = reactor.callLater(duration, self.stop)
+        return True
+
+    def stop(self):
+        """
+        Остановить профилирование, снять обёртки и записать стеки на диск.
+
+        Возвращает:
+            путь к файлу со стеками или None.
+        """
+        if not self.active:
+            return None
+        from commands.command import Command
+        from server.conf.serversession import ServerSession
+
+        self.active = False
+        if self._stop_call and self._stop_call.active():
+            self._stop_call.cancel()
+        self._stop_call = None
+        Command.at_pre_cmd, Command.at_post_cmd, ServerSession.data_out = self._originals
+        self._originals = None
+        if self._count_query in connection.execute_wrappers:
+            connection.execute_wrappers.remove(self._count_query)
+        self._current = None
+        self._thread.join(1.0)
+        self.stopped = time.time()
+        self.dump_path = self.dump()
+        callback, self._callback = self._callback, None
+        if callback:
+            try:
+                callback(self)
+            except Exception:
+                logger.log_trace("Profiler stop callback failed.")
+        return self.dump_path
+
+    # обёртки
+
+    def _wrap_pre(self, original):
+        profiler = self
+
+        def at_pre_cmd(cmd):
+            # предыдущая команда могла упасть, не дойдя до at_post_cmd
+            profiler._current = None
+            result = original(cmd)
+            if not result:
+                cmd._profile_start = (time.perf_counter(), profiler.queries, profiler.bytes)
+                current = profiler._current = (cmd.key, cmd._profile_start)
+                reactor.callLater(0, profiler._leave, current)
+            return result
+
+        return at_pre_cmd
+
+    def _wrap_post(self, original):
+        profiler = self
+
+        def at_post_cmd(cmd):
+            result = original(cmd)
+            start = getattr(cmd, "_profile_start", None)
+            if start:
+                wall = time.perf_counter() - start[0]
+                stats = profiler.stats[cmd.key]
+                stats.calls += 1
+                stats.wall += wall
+                stats.wall_max = max(stats.wall_max, wall)
+                stats.queries += profiler.queries - start[1]
+                stats.bytes += profiler.bytes - start[2]
+                del cmd._profile_start
+            profiler._current = None
+            return result
+
+        return at_post_cmd
+
+    def _leave(self, current):
+        # реактор вернулся к циклу, команда уже не выполняется
+        if self._current is current:
+            self._current = None
+
+    def _wrap_data_out(self, original):
+        profiler = self
+
+        def data_out(session, **kwargs):
+            text = kwargs.get("text")
+            if isinstance(text, (tuple, list)) and text:
+                text = text[0]
+            if isinstance(text, str):
+                profiler.bytes += len(text.encode("utf-8"))
+            return original(session, **kwargs)
+
+        return data_out
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    # сэмплирование
+
+    def _sample(self, interval):
+        while self.active:
+            time.sleep(interval)
+            current = self._current
+            if not current:
+                continue
+            frame = sys._current_frames().get(self._reactor_thread)
+            stack = []
+            while frame is not None and len(stack) < _MAX_DEPTH:
+                code = frame.f_code
+                stack.append(
+                    "%s:%s" % (os.path.splitext(os.path.basename(code.co_filename))[0], code.co_name)
+                )
+                frame = frame.f_back
+            if self._current is not current:
+                # команда закончилась, пока снимался стек
+                continue
+            stack.append(current[0].replace(";", ":").replace(" ", "_"))
+            self.samples[";".join(reversed(stack))] += 1
+
+    # результаты
+
+    def dump(self):
+        """
+        Записать свёрнутые стеки в файл.
+
+        Возвращает:
+            путь к файлу или None, если сэмплов нет.
+        """
+        if not self.samples:
+            return None
+        os.makedirs(settings.PROFILER_DUMP_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.PROFILER_DUMP_DIR,
+            "profile-%s.folded" % time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started)),
+        )
+        try:
+            with open(path, "w", encoding="utf-8") as fil:
+                for stack, count in self.samples.most_common():
+                    fil.write("%s %i\n" % (stack, count))
+        except OSError:
+            logger.log_trace("Could not write profiler dump %s." % path)
+            return None
+        return path
+
+    def report(self):
+        """
+        Возвращает:
+            список кортежей (команда, вызовы, всего сек, среднее мс,
+            максимум мс, запросов на вызов, байт на вызов), самые
+            затратные по общему времени первыми.
+        """
+        rows = []
+        for key, stats in self.stats.items():
+            calls = stats.calls or 1
+            rows.append(
+                (
+                    key,
+                    stats.calls,
+                    stats.wall,
+                    stats.wall / calls * 1000,
+                    stats.wall_max * 1000,
+                    stats.queries / calls,
+                    stats.bytes / calls,
+                )
+            )
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+
+PROFILER = Profiler()
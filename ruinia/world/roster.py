@@ -0,0 +1,140 @@
+"""
+Список игроков онлайн
+
+`CmdWho` раньше на каждый вызов забирал все сессии, сортировал их по
+имени аккаунта и для каждой строки заново вызывал `get_account()`,
+`get_puppet()` и `puppet.location.key`. Здесь хранится уже
+отсортированный список сессий вошедших игроков с подготовленными
+данными для каждой строки.
+
+Список обновляется при входе и выходе (`ServerSession.at_login`,
+`at_sync` и `at_disconnect`) и при смене персонажа
+(`Character.at_post_puppet`/`at_post_unpuppet`). Колонки для админов
+(персонаж, комната, число команд) обновляются не чаще раза в секунду.
+"""
+import time
+from bisect import bisect_left, insort
+from evennia.utils import utils
+
+# как часто (в секундах) обновлять колонки для админов
+_ADMIN_REFRESH = 1.0
+_CROP_WIDTH = 25
+
+
+class RosterRow(object):
+    """
+    Строка списка: одна сессия вошедшего игрока.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.update()
+
+    def update(self):
+        """
+        Перечитать имя аккаунта и персонажа сессии.
+        """
+        session = self.session
+        account = session.get_account()
+        self.sortkey = (account.key.lower(), session.sessid) if account else ("", session.sessid)
+        self.name = utils.crop(account.key, width=_CROP_WIDTH) if account else "None"
+        self.builder_name = (
+            utils.crop("%s(#%s)" % (account.key, account.id), width=_CROP_WIDTH)
+            if account
+            else "None"
+        )
+        self.host = (
+            isinstance(session.address, tuple) and session.address[0] or session.address
+        )
+        self._admin_columns = None
+        self._admin_time = 0
+
+    def display_name(self, looker_is_builder):
+        """
+        Имя аккаунта так, как его показал бы `get_display_name`.
+        """
+        return self.builder_name if looker_is_builder else self.name
+
+    def admin_columns(self):
+        """
+        Возвращает:
+            кортеж (персонаж, комната, число команд) не старше секунды.
+            Эти колонки видят только админы, поэтому персонаж показан с
+            номером, как его видят строители.
+        """
+        now = time.time()
+        if self._admin_columns is None or now - self._admin_time > _ADMIN_REFRESH:
+            puppet = self.session.get_puppet()
+            location = puppet.location.key if puppet and puppet.location else "None"
+            self._admin_columns = (
+                utils.crop("%s(#%s)" % (puppet.key, puppet.id) if puppet else "None", width=_CROP_WIDTH),
+                utils.crop(location, width=_CROP_WIDTH),
+                self.session.cmd_total,
+            )
+            self._admin_time = now
+        return self._admin_columns
+
+
+class Roster(object):
+    """
+    Отсортированный по имени аккаунта список сессий вошедших игроков.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._rows = {}
+        self._synced = False
+
+    def add(self, session):
+        """
+        Добавить сессию или обновить её строку.
+        """
+        self.remove(session)
+        row = RosterRow(session)
+        self._rows[session.sessid] = row
+        insort(self._keys, row.sortkey)
+
+    def update(self, session):
+        """
+        Обновить строку сессии после смены персонажа.
+        """
+        if session and session.sessid in self._rows:
+            self.add(session)
+
+    def remove(self, session):
+        """
+        Убрать сессию из списка.
+        """
+        row = self._rows.pop(session.sessid, None)
+        if row:
+            index = bisect_left(self._keys, row.sortkey)
+            if index < len(self._keys) and self._keys[index] == row.sortkey:
+                del self._keys[index]
+
+    def sync(self):
+        """
+        Заполнить список из обработчика сессий. Нужно после перезагрузки
+        сервера, если сессии ещё не успели добавить себя сами.
+        """
+        from evennia.server.sessionhandler import SESSIONS
+
+        self._keys, self._rows = [], {}
+        for session in SESSIONS.get_sessions():
+            if session.logged_in:
+                self.add(session)
+        self._synced = True
+
+    def rows(self):
+        """
+        Возвращает:
+            строки списка в порядке имён аккаунтов.
+        """
+        if not self._synced:
+            self.sync()
+        return [self._rows[sortkey[1]] for sortkey in self._keys]
+
+    def __len__(self):
+        return len(self._rows)
+
+
+ROSTER = Roster()
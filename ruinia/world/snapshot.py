@@ -0,0 +1,159 @@
+"""
+Снимок индексов на время перезагрузки
+
+`evennia reload` перезапускает процесс сервера, и все индексы в памяти
+(координаты, имена персонажей, полнотекстовый поиск) строятся заново.
+Здесь они сохраняются в двоичный файл в `server/` при остановке перед
+перезагрузкой (`at_server_reload_stop`) и читаются при старте
+(`pickle.load` прямо из файла, без промежуточной копии всего файла).
+
+Формат файла: магическая строка, номер версии формата и длина, затем
+pickle со словарём `{"fingerprint": ..., "states": {имя: состояние}}`.
+
+Свежесть снимка проверяется счётчиком изменений базы: для таблиц, из
+которых строятся индексы, берутся число строк и наибольший id (один
+запрос на таблицу). Если за время перезагрузки что-то создали или
+удалили, снимок отбрасывается целиком и индексы строятся как обычно.
+Правки существующих строк другим процессом (например `evennia shell`)
+этим не ловятся; изменения из самого сервера до снимка в нём уже учтены.
+Снимок удаляется сразу после чтения, так что используется один раз.
+
+Новый индекс добавляется в `_providers()` парой функций
+`dump_state()`/`restore_state(state)`.
+"""
+import os
+import pickle
+import struct
+import time
+from django.conf import settings
+from django.db.models import Count, Max
+from evennia.utils import logger
+
+SNAPSHOT_PATH = os.path.join(settings.GAME_DIR, "server", "indexes.snapshot")
+# увеличить при несовместимом изменении состояния любого индекса
+FORMAT_VERSION = 1
+_MAGIC = b"RUINSNAP"
+_HEADER = struct.Struct("<8sIQ")
+
+
+def _providers():
+    from world import charnames, coords
+    from world.lore_search import SEARCH_INDEX
+
+    return {
+        "coords": (coords.dump_state, coords.restore_state),
+        "charnames": (charnames.dump_state, charnames.restore_state),
+        "lore_search": (SEARCH_INDEX.dump_state, SEARCH_INDEX.restore_state),
+    }
+
+
+def fingerprint():
+    """
+    Счётчик изменений базы для проверки свежести снимка.
+
+    Возвращает:
+        кортеж (число строк, наибольший id) для каждой таблицы, из
+        которой строятся индексы.
+    """
+    from evennia.help.models import HelpEntry
+    from evennia.objects.models import ObjectDB
+    from evennia.typeclasses.tags import Tag
+
+    result = []
+    for model in (ObjectDB, ObjectDB.db_tags.through, Tag, HelpEntry):
+        stats = model.objects.aggregate(count=Count("id"), last=Max("id"))
+        result.append((model._meta.db_table, stats["count"], stats["last"]))
+    return tuple(result)
+
+
+def save():
+    """
+    Записать снимок построенных индексов.
+
+    Возвращает:
+        имена сохранённых индексов.
+    """
+    start = time.time()
+    states = {}
+    for name, (dump, _) in _providers().items():
+        try:
+            state = dump()
+        except Exception:
+            logger.log_trace("Could not snapshot index '%s'." % name)
+            continue
+        if state is not None:
+            states[name] = state
+    if not states:
+        return []
+
+    payload = pickle.dumps(
+        {"fingerprint": fingerprint(), "states": states}, protocol=pickle.HIGHEST_PROTOCOL
+    )
+    tmp = SNAPSHOT_PATH + ".tmp"
+    with open(tmp, "wb") as fil:
+        fil.write(_HEADER.pack(_MAGIC, FORMAT_VERSION, len(payload)))
+        fil.write(payload)
+    os.replace(tmp, SNAPSHOT_PATH)
+    logger.log_info(
+        "Index snapshot: saved %s (%i bytes) in %.3fs."
+        % (", ".join(sorted(states)), len(payload), time.time() - start)
+    )
+    return sorted(states)
+
+
+def _read():
+    with open(SNAPSHOT_PATH, "rb") as fil:
+        header = fil.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        magic, version, length = _HEADER.unpack(header)
+        if magic != _MAGIC or version != FORMAT_VERSION:
+            return None
+        if os.fstat(fil.fileno()).st_size < _HEADER.size + length:
+            return None
+        return pickle.load(fil)
+
+
+def restore():
+    """
+    Загрузить индексы из снимка, если он есть и свежий. Файл снимка
+    удаляется в любом случае.
+
+    Возвращает:
+        имена восстановленных индексов.
+    """
+    if not os.path.exists(SNAPSHOT_PATH):
+        return []
+    start = time.time()
+    try:
+        data = _read()
+    except Exception:
+        logger.log_trace("Could not read index snapshot.")
+        data = None
+    finally:
+        try:
+            os.remove(SNAPSHOT_PATH)
+        except OSError:
+            pass
+
+    if not data:
+        logger.log_info("Index snapshot: unknown format, ignored.")
+        return []
+    if data["fingerprint"] != fingerprint():
+        logger.log_info("Index snapshot: database changed since the snapshot, ignored.")
+        return []
+
+    restored = []
+    for name, (_, restore_state) in _providers().items():
+        if name not in data["states"]:
+            continue
+        try:
+            restore_state(data["states"][name])
+        except Exception:
+            logger.log_trace("Could not restore index '%s' from snapshot." % name)
+            continue
+        restored.append(name)
+    logger.log_info(
+        "Index snapshot: restored %s in %.3fs." % (", ".join(restored), time.time() - start)
+    )
+    return restored
@@ -0,0 +1,205 @@
+"""
+Прогрев кешей при старте сервера
+
+После перезагрузки первые `смотреть`, `справка` и карты натыкаются на
+пустые кеши, и все разом идут в базу. `run()` вызывается из
+`at_server_start` и заранее заполняет то, что понадобится первым.
+
+Прогрев разбит на этапы. Важные этапы (индекс координат, экран
+подключения, легенда карты) выполняются сразу, остальные - в фоне после
+старта через кооператор Twisted: этап-генератор отдаёт управление
+реактору после каждой порции, так что игра отвечает и во время
+прогрева. Время каждого этапа пишется в лог и сохраняется в `TIMINGS`.
+
+Новый этап добавляется декоратором:
+
+    @stage("мой кеш", background=True)
+    def _warm_my_cache():
+        for chunk in ...:
+            ...
+            yield
+"""
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from twisted.internet import task
+from evennia.utils import logger
+
+_STAGES = []
+# {имя этапа: секунд}
+TIMINGS = {}
+
+# сколько комнат грузить за одну порцию фонового этапа
+_CHUNK = 50
+
+
+def stage(name, background=False):
+    """
+    Зарегистрировать этап прогрева.
+
+    Аргументы:
+        name (str): имя этапа для лога.
+        background (bool): выполнять в фоне после старта. Функция фонового
+            этапа может быть генератором, тогда между `yield` реактор
+            обрабатывает другие события.
+    """
+
+    def _decorator(func):
+        _STAGES.append((name, func, background))
+        return func
+
+    return _decorator
+
+
+def _exhaust(result):
+    if hasattr(result, "__next__"):
+        for _ in result:
+            pass
+
+
+def _run_stage(name, func):
+    start = time.time()
+    try:
+        _exhaust(func())
+    except Exception:
+        logger.log_trace("Warm-up stage '%s' failed." % name)
+    TIMINGS[name] = time.time() - start
+    logger.log_info("Warm-up: %s took %.3fs." % (name, TIMINGS[name]))
+
+
+def _background(stages):
+    for name, func in stages:
+        start = time.time()
+        try:
+            result = func()
+            if hasattr(result, "__next__"):
+                for _ in result:
+                    yield
+        except Exception:
+            logger.log_trace("Warm-up stage '%s' failed." % name)
+        TIMINGS[name] = time.time() - start
+        logger.log_info("Warm-up: %s took %.3fs (background)." % (name, TIMINGS[name]))
+        yield
+
+
+def run():
+    """
+    Выполнить важные этапы сразу и запустить фоновые.
+
+    Возвращает:
+        Deferred, срабатывающий по окончании фоновых этапов.
+    """
+    start = time.time()
+    for name, func, background in _STAGES:
+        if not background:
+            _run_stage(name, func)
+    logger.log_info("Warm-up: blocking stages took %.3fs." % (time.time() - start))
+    background = [(name, func) for name, func, bg in _STAGES if bg]
+    return task.cooperate(_background(background)).whenDone()
+
+
+# ------------------------------------------------------------
+# Этапы
+# ------------------------------------------------------------
+
+
+@stage("coordinate index")
+def _warm_coords():
+    from world import coords
+
+    coords.preload()
+
+
+@stage("connection screen")
+def _warm_connection_screen():
+    from world import connection_screen
+
+    connection_screen.precompute()
+
+
+@stage("map legend")
+def _warm_map_legend():
+    from evennia.utils import ansi
+    from world.map_legend import SYMBOLS
+
+    for symbol in SYMBOLS.values():
+        for xterm256 in (True, False):
+            ansi.parse_ansi(symbol, xterm256=xterm256)
+
+
+@stage("help topics", background=True)
+def _warm_help():
+    from world import help_index
+
+    help_index.get_topics()
+
+
+@stage("lore search index", background=True)
+def _warm_lore_search():
+    from world.lore_search import SEARCH_INDEX
+
+    SEARCH_INDEX.load()
+
+
+def _recent_room_ids(room_ids):
+    """
+    Собрать в `room_ids` комнаты, где недавно были игроки, от самых
+    нужных к менее нужным: сначала комнаты, где сейчас больше всего
+    персонажей (любого класса-наследника `BASE_CHARACTER_TYPECLASS`), затем
+    места, где вышли из игры персонажи аккаунтов, заходивших за последние
+    `settings.WARMUP_RECENT_DAYS` дней, начиная с последних зашедших.
+
+    Генератор: отдаёт управление реактору после каждой порции аккаунтов.
+
+    Аргументы:
+        room_ids (dict): id комнат в ключах, в порядке важности.
+    """
+    from django.db.models import Count
+    from evennia.accounts.models import AccountDB
+    from evennia.objects.models import ObjectDB
+
+    occupied = (
+        ObjectDB.objects.typeclass_search(settings.BASE_CHARACTER_TYPECLASS, include_children=True)
+        .filter(db_location__isnull=False)
+        .values("db_location_id")
+        .annotate(occupants=Count("id"))
+        .order_by("-occupants")
+    )
+    for row in occupied[: settings.WARMUP_ROOM_LIMIT]:
+        room_ids.setdefault(row["db_location_id"])
+    yield
+
+    cutoff = timezone.now() - timedelta(days=settings.WARMUP_RECENT_DAYS)
+    recent = AccountDB.objects.filter(last_login__gte=cutoff).order_by("-last_login")
+    for num, account in enumerate(recent.iterator(), 1):
+        if len(room_ids) >= settings.WARMUP_ROOM_LIMIT:
+            break
+        puppet = account.db._last_puppet
+        location = puppet and (puppet.location or puppet.db.prelogout_location)
+        if location:
+            room_ids.setdefault(location.id)
+        if not num % _CHUNK:
+            yield
+
+
+@stage("recent rooms", background=True)
+def _warm_rooms():
+    from evennia.objects.models import ObjectDB
+
+    room_ids = {}
+    yield from _recent_room_ids(room_ids)
+    room_ids = list(room_ids)[: settings.WARMUP_ROOM_LIMIT]
+    yield
+    for start in range(0, len(room_ids), _CHUNK):
+        chunk = room_ids[start : start + _CHUNK]
+        # загруженные комнаты остаются в кеше idmapper; атрибуты и теги
+        # обработчики грузят в свои кеши сами, prefetch_related их не заполняет
+        rooms = list(ObjectDB.objects.filter(id__in=chunk))
+        for room in rooms:
+            room.attributes.all()
+            room.tags.all()
+            # выходы и их цели - то, что трогают смотреть и карта
+            for exit_obj in room.exits:
+                exit_obj.destination
+        yield
@@ -0,0 +1,352 @@
+"""
+Генератор синтетического мира
+
+Строит сетку комнат заданного размера для нагрузочных тестов и
+профилирования. `tunnel`/`dig` создают объекты по одному через
+`create_object`, а здесь все строки пишутся пачками через
+`bulk_create`, так что мир в 100 тысяч комнат создаётся за минуты.
+
+Что получается:
+
+ - `levels` уровней сетки `width` x `height` с тегами координат
+   `coord_x`/`coord_y`/`coord_z`, как у комнат из `tunnel`;
+ - выходы `север`/`юг`/`восток`/`запад` с псевдонимами `с`/`ю`/`в`/`з`,
+   всегда парами туда и обратно. Каждый уровень связен (сначала
+   строится случайное остовное дерево), а остальные пары соседей
+   соединяются с вероятностью `exit_density`;
+ - выходы `вверх`/`вниз` между уровнями с вероятностью
+   `vertical_density` на клетку, но хотя бы один на уровень;
+ - атрибут `sector_type` по заданным весам из ключей
+   `world.map_legend.SYMBOLS`;
+ - предметы и NPC в комнатах, их число на комнату выбирается равномерно
+   из диапазонов `items` и `npcs`.
+
+Результат полностью определяется `seed` и содержимым базы до запуска
+(номера объектов продолжают существующие). Хуки тайпклассов
+(`at_object_creation` и т.п.) при массовой вставке не вызываются, блокировки
+записываются такие же, как ставит `basetype_setup`.
+
+Генерировать лучше в отдельную базу, пока сервер не запущен. Для этого
+есть `server/conf/worldgen_settings.py` - обычные настройки игры с
+отдельной базой SQLite `server/worldgen.db3`:
+
+    evennia --settings worldgen_settings.py migrate
+    evennia --settings worldgen_settings.py shell
+    >>> from world import worldgen
+    >>> worldgen.generate(320, 320, levels=2, seed=42)
+
+Микробенчмарки (`benchmarks/run.py`) строят мир этим же генератором во
+временной тестовой базе (`benchmarks/harness.py`, `create_db()`), и
+отдельная база им не нужна.
+"""
+import random
+import time
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from evennia.objects.models import ObjectDB
+from evennia.typeclasses.attributes import Attribute
+from evennia.typeclasses.tags import Tag
+from evennia.utils import logger
+from world import charnames, coords
+from world.map_legend import SYMBOLS
+
+_BATCH = 2000
+
+_BASE_LOCKS = (
+    "control:perm(Developer);examine:perm(Builder);view:all();edit:perm(Admin);"
+    "delete:perm(Admin);drop:holds();call:true();tell:perm(Admin);"
+)
+_LOCKS = {
+    "room": _BASE_LOCKS
+    + "get:false();puppet:false();teleport:false();teleport_here:true()",
+    "exit": _BASE_LOCKS
+    + "puppet:false();traverse:all();get:false();teleport:false();teleport_here:false()",
+    "item": _BASE_LOCKS + "get:all();puppet:pperm(Developer);teleport:true();teleport_here:true()",
+    "npc": _BASE_LOCKS
+    + "get:false();puppet:pperm(Developer);teleport:true();teleport_here:true()",
+}
+
+# (имя, псевдоним, dx, dy, dz) и обратное направление
+_DIRECTIONS = {
+    "север": ("с", 0, 1, 0, "юг"),
+    "юг": ("ю", 0, -1, 0, "север"),
+    "восток": ("в", 1, 0, 0, "запад"),
+    "запад": ("з", -1, 0, 0, "восток"),
+    "вверх": ("вв", 0, 0, 1, "вниз"),
+    "вниз": ("вз", 0, 0, -1, "вверх"),
+}
+
+ITEM_NAMES = ("меч", "щит", "факел", "верёвка", "фляга", "котелок", "лопата", "свиток")
+NPC_NAMES = ("Стражник", "Торговец", "Путник", "Рыбак", "Охотник", "Монах", "Бродяга")
+
+
+def default_sectors():
+    """
+    Возвращает:
+        равные веса для всех типов местности легенды карты.
+    """
+    return {key: 1 for key in SYMBOLS if key != "you"}
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+def _spanning_edges(cells, rng):
+    """
+    Случайное остовное дерево сетки (алгоритм Краскала) и остальные
+    пары соседей.
+    """
+    parent = {cell: cell for cell in cells}
+
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    edges = []
+    for x, y in cells:
+        for dx, dy in ((1, 0), (0, 1)):
+            if (x + dx, y + dy) in parent:
+                edges.append(((x, y), (x + dx, y + dy)))
+    rng.shuffle(edges)
+    tree, rest = [], []
+    for one, two in edges:
+        root1, root2 = find(one), find(two)
+        if root1 == root2:
+            rest.append((one, two))
+        else:
+            parent[root1] = root2
+            tree.append((one, two))
+    return tree, rest
+
+
+def _direction(one, two):
+    dx, dy, dz = (b - a for a, b in zip(one, two))
+    for name, (_, ddx, ddy, ddz, _) in _DIRECTIONS.items():
+        if (dx, dy, dz) == (ddx, ddy, ddz):
+            return name
+    raise ValueError("cells %s and %s are not neighbours" % (one, two))
+
+
+def _shared_tags(keys, category, tagtype=None):
+    """
+    Найти или создать общие теги.
+
+    Возвращает:
+        {ключ: id тега}.
+    """
+    found = dict(
+        Tag.objects.filter(
+            db_key__in=keys, db_category=category, db_tagtype=tagtype, db_model="objectdb"
+        ).values_list("db_key", "id")
+    )
+    missing = [key for key in keys if key not in found]
+    if missing:
+        tag_id = _next_id(Tag)
+        new = []
+        for key in missing:
+            new.append(
+                Tag(id=tag_id, db_key=key, db_category=category, db_tagtype=tagtype, db_model="objectdb")
+            )
+            found[key] = tag_id
+            tag_id += 1
+        Tag.objects.bulk_create(new, batch_size=_BATCH)
+    return found
+
+
+def generate(
+    width,
+    height,
+    levels=1,
+    exit_density=0.5,
+    vertical_density=0.02,
+    sectors=None,
+    items=(0, 2),
+    npcs=(0, 1),
+    seed=0,
+    origin=(0, 0, 0),
+):
+    """
+    Создать синтетический мир в текущей базе.
+
+    Аргументы:
+        width (int), height (int): размер уровня в комнатах.
+        levels (int): число уровней (z).
+        exit_density (float): доля пар соседних комнат, соединённых
+            выходами сверх остовного дерева, от 0 до 1.
+        vertical_density (float): доля клеток с лестницей на уровень выше.
+        sectors (dict): веса типов местности `{ключ SYMBOLS: вес}`, по
+            умолчанию все поровну. Ключ None - комната без `sector_type`.
+        items (tuple): наименьшее и наибольшее число предметов в комнате.
+        npcs (tuple): наименьшее и наибольшее число NPC в комнате.
+        seed (int): зерно генератора случайных чисел.
+        origin (tuple): координаты (x, y, z) юго-западного угла нижнего
+            уровня.
+
+    Возвращает:
+        словарь с числом созданных `rooms`, `exits`, `items`, `npcs` и
+        временем `seconds`.
+
+    Исключения:
+        ValueError: при неизвестном типе местности или если место под
+            мир уже занято комнатами.
+    """
+    start = time.time()
+    rng = random.Random(seed)
+    sectors = default_sectors() if sectors is None else sectors
+    unknown = [key for key in sectors if key not in SYMBOLS or key == "you"]
+    if unknown:
+        raise ValueError("Unknown sector types: %s" % ", ".join(map(str, unknown)))
+    sector_keys = sorted(sectors, key=lambda key: (key is not None, key or ""))
+    sector_weights = [sectors[key] for key in sector_keys]
+
+    x0, y0, z0 = origin
+    cells = [
+        (x0 + x, y0 + y, z0 + z)
+        for z in range(levels)
+        for x in range(width)
+        for y in range(height)
+    ]
+    for cell in cells:
+        if coords.room_id_at(*cell):
+            raise ValueError("There is already a room at %s." % (cell,))
+
+    with transaction.atomic():
+        stats = _generate(
+            cells, levels, exit_density, vertical_density, sector_keys, sector_weights,
+            items, npcs, rng, origin[2],
+        )
+        if connection.vendor == "postgresql":
+            # номера заданы явно, последовательности надо догнать
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [ObjectDB, Tag, Attribute]):
+                    cursor.execute(sql)
+
+    coords.invalidate()
+    charnames.reset()
+    stats["seconds"] = time.time() - start
+    logger.log_info(
+        "World generator: %(rooms)i rooms, %(exits)i exits, %(items)i items and "
+        "%(npcs)i NPCs in %(seconds).1fs." % stats
+    )
+    return stats
+
+
+def _generate(
+    cells, levels, exit_density, vertical_density, sector_keys, sector_weights,
+    items, npcs, rng, z0,
+):
+    obj_id = _next_id(ObjectDB)
+    room_ids = {}
+    sector_of = {}
+    objects = []
+
+    def add_object(key, typeclass, locks, location=None, destination=None):
+        nonlocal obj_id
+        objects.append(
+            ObjectDB(
+                id=obj_id,
+                db_key=key,
+                db_typeclass_path=typeclass,
+                db_lock_storage=locks,
+                db_location_id=location,
+                db_home_id=location,
+                db_destination_id=destination,
+            )
+        )
+        obj_id += 1
+        return obj_id - 1
+
+    # комнаты
+    for cell in cells:
+        sector = rng.choices(sector_keys, sector_weights)[0]
+        sector_of[cell] = sector
+        room_ids[cell] = add_object(
+            "%s (%i, %i, %i)" % (sector or "Пустошь", cell[0], cell[1], cell[2]),
+            settings.BASE_ROOM_TYPECLASS,
+            _LOCKS["room"],
+        )
+        # у комнат нет дома, add_object ставит домом местоположение
+        objects[-1].db_home_id = None
+
+    # связи: остовное дерево каждого уровня, лишние пары по exit_density,
+    # лестницы между уровнями
+    links = []
+    for z in range(z0, z0 + levels):
+        tree, rest = _spanning_edges([(x, y) for x, y, cz in cells if cz == z], rng)
+        pairs = tree + [pair for pair in rest if rng.random() < exit_density]
+        links.extend(((a[0], a[1], z), (b[0], b[1], z)) for a, b in pairs)
+    for z in range(z0, z0 + levels - 1):
+        level = [cell for cell in cells if cell[2] == z]
+        stairs = [cell for cell in level if rng.random() < vertical_density]
+        if not stairs:
+            stairs = [rng.choice(level)]
+        links.extend((cell, (cell[0], cell[1], z + 1)) for cell in stairs)
+
+    exit_aliases = []
+    for one, two in links:
+        for source, target in ((one, two), (two, one)):
+            name = _direction(source, target)
+            exit_id = add_object(
+                name,
+                settings.BASE_EXIT_TYPECLASS,
+                _LOCKS["exit"],
+                location=room_ids[source],
+                destination=room_ids[target],
+            )
+            exit_aliases.append((exit_id, _DIRECTIONS[name][0]))
+
+    # предметы и NPC
+    nitems = nnpcs = 0
+    for cell in cells:
+        room = room_ids[cell]
+        for _ in range(rng.randint(*items)):
+            add_object(rng.choice(ITEM_NAMES), settings.BASE_OBJECT_TYPECLASS, _LOCKS["item"], room)
+            nitems += 1
+        for _ in range(rng.randint(*npcs)):
+            add_object(
+                "%s %i" % (rng.choice(NPC_NAMES), nnpcs + 1),
+                settings.BASE_CHARACTER_TYPECLASS,
+                _LOCKS["npc"],
+                room,
+            )
+            nnpcs += 1
+
+    ObjectDB.objects.bulk_create(objects, batch_size=_BATCH)
+
+    # теги: координаты и псевдонимы выходов
+    through = ObjectDB.db_tags.through
+    tag_ids = {
+        category: _shared_tags(
+            sorted({str(cell[index]) for cell in cells}), category
+        )
+        for index, category in enumerate(("coord_x", "coord_y", "coord_z"))
+    }
+    alias_ids = _shared_tags(sorted({alias for _, alias in exit_aliases}), None, tagtype="alias")
+    rows = []
+    for cell, room in room_ids.items():
+        for index, category in enumerate(("coord_x", "coord_y", "coord_z")):
+            rows.append(through(objectdb_id=room, tag_id=tag_ids[category][str(cell[index])]))
+    rows.extend(through(objectdb_id=exit_id, tag_id=alias_ids[alias]) for exit_id, alias in exit_aliases)
+    through.objects.bulk_create(rows, batch_size=_BATCH)
+
+    # типы местности
+    attr_id = _next_id(Attribute)
+    attributes, rows = [], []
+    through = ObjectDB.db_attributes.through
+    for cell, room in room_ids.items():
+        if sector_of[cell] is None:
+            continue
+        attributes.append(
+            Attribute(id=attr_id, db_key="sector_type", db_value=sector_of[cell], db_model="objectdb")
+        )
+        rows.append(through(objectdb_id=room, attribute_id=attr_id))
+        attr_id += 1
+    Attribute.objects.bulk_create(attributes, batch_size=_BATCH)
+    through.objects.bulk_create(rows, batch_size=_BATCH)
+
+    return {"rooms": len(room_ids), "exits": len(exit_aliases), "items": nitems, "npcs": nnpcs}